@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TFServer.settings')
+# lets settings pick ASGI defaults (see SERVER_MODE there)
+os.environ.setdefault('SERVER_MODE', 'asgi')
 
 application = get_asgi_application()
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from decouple import config, Csv
 from datetime import timedelta
+import copy
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -35,7 +36,6 @@ INSTALLED_APPS = [
     # third party 
     'rest_framework',
     'rest_framework_simplejwt',
-    # 'rest_framework_simplejwt.token_blacklist',  # required for logout blacklist
     'drf_spectacular',
     'corsheaders',
     'django_filters',
@@ -43,12 +43,14 @@ INSTALLED_APPS = [
     'account',
     'product',
     'order',
+    'cart',
+    'utils',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'account.authentication.RevocableJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'utils.pagination.CustomPagination',
     'PAGE_SIZE': 10,
@@ -57,12 +59,33 @@ REST_FRAMEWORK = {
     ],
     # add for show json formate in web 
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'utils.renderers.ORJSONRenderer',
     ),
     # for custom exception handle 
-    'EXCEPTION_HANDLER': 'utils.exceptions.custom_exception_handler'
+    'EXCEPTION_HANDLER': 'utils.exceptions.custom_exception_handler',
+    # rate limiting (see utils/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': (
+        'utils.throttling.IPRateThrottle',
+        'utils.throttling.UserRateThrottle',
+        'utils.throttling.ScopedRateThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'ip': config('THROTTLE_RATE_IP', default='600/min'),
+        'user': config('THROTTLE_RATE_USER', default='1200/min'),
+        'auth': config('THROTTLE_RATE_AUTH', default='10/min'),
+        'checkout': config('THROTTLE_RATE_CHECKOUT', default='20/min'),
+    },
+    'NUM_PROXIES': config('NUM_PROXIES', default=None, cast=lambda v: int(v) if v else None),
 }
 
+# set to False to disable all rate limiting (e.g. for load tests)
+THROTTLE_ENABLED = config('THROTTLE_ENABLED', default=True, cast=bool)
+# throttle store: 'locmem', 'cache', 'database' or a dotted path to a store class
+THROTTLE_STORE = config('THROTTLE_STORE', default='locmem')
+THROTTLE_CACHE_ALIAS = config('THROTTLE_CACHE_ALIAS', default='default')
+# 'token_bucket' or 'sliding_window'
+THROTTLE_ALGORITHM = config('THROTTLE_ALGORITHM', default='token_bucket')
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Tradi Foodi API',
     'DESCRIPTION': 'Production-ready backend for Tradi Foodi e-commerce platform.',
@@ -75,6 +98,7 @@ SPECTACULAR_SETTINGS = {
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # for production static file basically use for render 
+    'utils.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,8 +106,58 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.db_router.ReplicaPinMiddleware',
 ]
 
+# per-request instrumentation (Server-Timing for staff, slow request / N+1 log)
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=True, cast=bool)
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=500, cast=int)
+DUPLICATE_QUERY_THRESHOLD = config('DUPLICATE_QUERY_THRESHOLD', default=10, cast=int)
+if INSTRUMENTATION_ENABLED:
+    MIDDLEWARE.insert(0, 'utils.instrumentation.InstrumentationMiddleware')
+
+# Prometheus metrics at /metrics, recorded by the instrumentation middleware
+METRICS_ENABLED = INSTRUMENTATION_ENABLED and config('METRICS_ENABLED', default=True, cast=bool)
+# shared directory for per-worker snapshots under gunicorn; empty keeps metrics per process
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=1.0, cast=float)
+# scrapers send `Authorization: Bearer <token>`; without a token only these addresses may scrape
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+
+# superuser-only ?_profile=1 profiling, browsed under Utils > Request profiles in the admin
+PROFILING_ENABLED = INSTRUMENTATION_ENABLED and config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILE_RATE_LIMIT = config('PROFILE_RATE_LIMIT', default=10, cast=int)  # per minute, all workers
+PROFILE_KEEP = config('PROFILE_KEEP', default=100, cast=int)
+if PROFILING_ENABLED:
+    # innermost, so the profile covers the view rather than the middleware
+    MIDDLEWARE.append('utils.profiling.ProfilingMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'verbose': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+        # instrumentation messages are already JSON
+        'json_line': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'verbose'},
+        'requests': {'class': 'logging.StreamHandler', 'formatter': 'json_line'},
+    },
+    'loggers': {
+        'utils.instrumentation': {'handlers': ['requests'], 'level': 'WARNING', 'propagate': False},
+        'utils.exceptions': {'handlers': ['console'], 'level': config('LOG_LEVEL', default='WARNING'), 'propagate': False},
+    },
+}
+
+# response compression (zstd / brotli are used when zstandard / brotli are installed)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_ENCODINGS = config('COMPRESSION_ENCODINGS', default='zstd,br,gzip', cast=Csv())
+COMPRESSION_CONTENT_TYPES = ['application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript']
+# seconds a compressed body is kept in the cache, 0 compresses on every response
+COMPRESSION_CACHE_TIMEOUT = config('COMPRESSION_CACHE_TIMEOUT', default=300, cast=int)
+
 ROOT_URLCONF = 'TFServer.urls'
 
 TEMPLATES = [
@@ -107,6 +181,9 @@ WSGI_APPLICATION = 'TFServer.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# 'wsgi' or 'asgi'; TFServer/asgi.py sets 'asgi' unless the environment says otherwise
+SERVER_MODE = config('SERVER_MODE', default='wsgi')
+
 DATABASES = {
     'default': {
         'ENGINE': config('DB_ENGINE'),
@@ -115,11 +192,60 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # keep connections open between requests; health checks drop ones the
+        # server closed instead of failing the next request. Under ASGI every
+        # request runs in its own context and would open (and keep) its own
+        # connection, so they are closed per request there unless DB_CONN_MAX_AGE
+        # says otherwise; set DB_POOL=True to reuse them through the pool instead.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0 if SERVER_MODE == 'asgi' else 60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {},
     }
 }
 
+# End sessions left idle inside a transaction after this many seconds (0 = never).
+# Besides holding locks, an open transaction holds back the order change feed,
+# which only serves events older than every running transaction.
+DB_IDLE_IN_TRANSACTION_TIMEOUT = config('DB_IDLE_IN_TRANSACTION_TIMEOUT', default=60, cast=int)
+if 'postgresql' in DATABASES['default']['ENGINE'] and DB_IDLE_IN_TRANSACTION_TIMEOUT:
+    DATABASES['default']['OPTIONS']['options'] = (
+        f'-c idle_in_transaction_session_timeout={DB_IDLE_IN_TRANSACTION_TIMEOUT * 1000}'
+    )
+
+# Optional psycopg (v3) connection pool shared by the threads of a process.
+# Requires `pip install "psycopg[binary,pool]"`; replaces persistent connections.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+if DB_POOL:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+    }
 
 
+# Read replicas: comma separated `host[:port][/name]` entries, each becoming a
+# `replicaN` alias that shares credentials and options with `default`.
+# utils.db_router.ReplicaRouter sends catalog reads to them.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(config('DB_REPLICAS', default='', cast=Csv()), start=1):
+    address, _, name = replica.partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **copy.deepcopy(DATABASES['default']),
+        'HOST': host or DATABASES['default']['HOST'],
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        # tests read replica data straight from the test database
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['utils.db_router.ReplicaRouter']
+# how long a user's reads stay on the primary after they write (read-your-writes)
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -139,6 +265,40 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# 'pbkdf2_sha256' (default) or 'scrypt'; hashes made with other parameters are
+# upgraded transparently on the next successful login.
+PASSWORD_HASH_ALGORITHM = config('PASSWORD_HASH_ALGORITHM', default='pbkdf2_sha256')
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=1_000_000, cast=int)
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2**14, cast=int)
+# size of the thread pool the async auth views hash passwords in
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=4, cast=int)
+
+PASSWORD_HASHERS = [
+    'account.hashers.ConfigurablePBKDF2PasswordHasher',
+    'account.hashers.ConfigurableScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+if PASSWORD_HASH_ALGORITHM == 'scrypt':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+
+# serve the async (ASGI) variants of views that have one
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# serialize product, review and order lists straight from values() rows
+FAST_SERIALIZERS = config('FAST_SERIALIZERS', default=True, cast=bool)
+
+# live order stream (GET /api/orders/stream/, ASGI only): 'postgres' listens for
+# the event NOTIFYs with one connection per process; 'local' delivers events
+# saved in this process, for tests
+ORDER_STREAM_BROKER = config('ORDER_STREAM_BROKER', default='postgres')
+ORDER_STREAM_HEARTBEAT = config('ORDER_STREAM_HEARTBEAT', default=15, cast=int)  # seconds
+# lifetime of the stream-only tokens browsers pass as ?token= (POST /api/orders/stream/token/)
+ORDER_STREAM_TOKEN_LIFETIME = config('ORDER_STREAM_TOKEN_LIFETIME', default=60, cast=int)  # seconds
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -176,6 +336,10 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# logout / token revocation (see account/revocation.py)
+TOKEN_REVOCATION_REFRESH_SECONDS = config('TOKEN_REVOCATION_REFRESH_SECONDS', default=5, cast=int)
+TOKEN_REVOCATION_SYNC_GRACE_SECONDS = config('TOKEN_REVOCATION_SYNC_GRACE_SECONDS', default=30, cast=int)
+
 
 # reset password token life time
 PASSWORD_RESET_TIMEOUT=900 # 900 sec = 15 M
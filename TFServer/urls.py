@@ -2,12 +2,14 @@
 from django.contrib import admin
 from django.urls import path,include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from utils.views import metrics_view
 urlpatterns = [
     path('admin/', admin.site.urls),
     #local app
     path('api/accounts/', include('account.urls')),
     path('api/products/', include('product.urls')),
     path('api/orders/', include('order.urls')),
+    path('api/cart/', include('cart.urls')),
 
     # OpenAPI schema
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -15,4 +17,7 @@ urlpatterns = [
     path('api/schema/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     # Redoc UI
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc-ui'),
+
+    # Prometheus scrape target
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,25 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .revocation import is_token_revoked
+from .tokens import token_version_matches
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that rejects tokens revoked on logout and tokens issued
+    before the user's last "logout everywhere".
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_token_revoked(token):
+            raise InvalidToken(_("Token has been revoked"))
+        return token
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if not token_version_matches(validated_token, user):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return user
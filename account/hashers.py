@@ -0,0 +1,85 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher
+from django.db import close_old_connections
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from settings. The algorithm
+    name is unchanged, so existing hashes keep verifying; hashes made with a
+    different count are re-encoded on the user's next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+class ConfigurableScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with the CPU/memory cost (`work_factor`, N) taken from settings."""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+
+# ---------------- Hashing off the event loop ----------------
+
+_executor = None
+# jobs submitted and not started yet; counted here rather than read off the
+# executor's private work queue
+_queued = 0
+_queued_lock = threading.Lock()
+
+
+def get_hash_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix='password-hash',
+        )
+    return _executor
+
+
+def hash_queue_depth():
+    """Hashing jobs submitted to the pool and not picked up by a thread yet."""
+    return _queued
+
+
+def _count_queued(delta):
+    global _queued
+    with _queued_lock:
+        _queued += delta
+
+
+def _run_with_fresh_connection(func, *args, **kwargs):
+    _count_queued(-1)
+    # pool threads live across requests, so drop connections that went stale
+    close_old_connections()
+    return func(*args, **kwargs)
+
+
+async def run_hashing(func, *args, **kwargs):
+    """
+    Run a CPU-heavy hashing call (make_password, check_password, ...) in a
+    bounded thread pool. hashlib releases the GIL, so hashes from concurrent
+    requests run in parallel while the event loop keeps serving others. The
+    pool size caps how many cores login/registration can take at once.
+    """
+    _count_queued(1)
+    future = get_hash_executor().submit(
+        functools.partial(_run_with_fresh_connection, func, *args, **kwargs),
+    )
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # a job cancelled before a thread picked it up never runs
+        if future.cancelled():
+            _count_queued(-1)
+        raise
@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Report password hashes/sec for PBKDF2 iteration counts and scrypt work factors'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, nargs='+',
+            help='PBKDF2 iteration counts to measure (default: a range around the current setting)',
+        )
+        parser.add_argument('--work-factors', type=int, nargs='*', default=[2**14, 2**15],
+                            help='scrypt N values to measure')
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, settings.PASSWORD_HASH_WORKERS],
+                            help='concurrent hashing threads (compare with PASSWORD_HASH_WORKERS)')
+        parser.add_argument('--seconds', type=float, default=2.0, help='time budget per measurement')
+
+    def handle(self, *args, **options):
+        current = settings.PASSWORD_HASH_ITERATIONS
+        iterations = options['iterations'] or sorted({100_000, 260_000, 600_000, current})
+
+        self.stdout.write(f'current setting: {settings.PASSWORD_HASH_ALGORITHM}, '
+                          f'{current} iterations, {settings.PASSWORD_HASH_WORKERS} hash workers')
+        for count in iterations:
+            hasher = PBKDF2PasswordHasher()
+            self._report(f'pbkdf2_sha256 iterations={count}',
+                         lambda: hasher.encode('benchmark-password', hasher.salt(), count), options)
+
+        for work_factor in options['work_factors']:
+            hasher = ScryptPasswordHasher()
+            hasher.work_factor = work_factor
+            self._report(f'scrypt N={work_factor}',
+                         lambda: hasher.encode('benchmark-password', hasher.salt()), options)
+
+    def _report(self, label, hash_once, options):
+        for threads in options['threads']:
+            hashes, elapsed = self._measure(hash_once, threads, options['seconds'])
+            rate = hashes / elapsed
+            self.stdout.write(
+                f'{label:<34} threads={threads:<3} {rate:9.1f} hashes/s   '
+                f'{elapsed / hashes * threads * 1000:8.1f} ms/hash'
+            )
+
+    def _measure(self, hash_once, threads, seconds):
+        deadline = time.perf_counter() + seconds
+
+        def worker():
+            done = 0
+            while time.perf_counter() < deadline:
+                hash_once()
+                done += 1
+            return done
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            hashes = sum(f.result() for f in [pool.submit(worker) for _ in range(threads)])
+        return max(hashes, 1), time.perf_counter() - started
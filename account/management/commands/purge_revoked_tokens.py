@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from account.revocation import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked token entries whose tokens have already expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_tokens(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired revoked tokens.'))
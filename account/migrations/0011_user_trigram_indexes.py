@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from utils.trigram import create_trigram_indexes, drop_trigram_indexes
+
+# the user columns searched by the order search (order/filters.py);
+# name -> (table, column), matching the UPPER(column::text) LIKE that icontains compiles to
+INDEXES = {
+    'account_user_email_trgm': ('account_user', 'email'),
+    'account_user_first_name_trgm': ('account_user', 'first_name'),
+    'account_user_last_name_trgm': ('account_user', 'last_name'),
+    'account_user_phone_trgm': ('account_user', 'phone'),
+}
+
+
+def create_indexes(apps, schema_editor):
+    create_trigram_indexes(schema_editor, INDEXES, 'customer names, emails and phones', 'account 0010')
+
+
+def drop_indexes(apps, schema_editor):
+    drop_trigram_indexes(schema_editor, INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0010_revokedtoken_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -4,9 +4,11 @@ from django.contrib.auth.models import BaseUserManager, AbstractBaseUser
 
 # custom user manager 
 class UserManager(BaseUserManager):
-    def create_user(self, email, role, first_name, last_name="", password=None, **extra_fields):
+    def create_user(self, email, role, first_name, last_name="", password=None, password_hash=None, **extra_fields):
         """
         Creates and saves a User with the given email, role, and other fields.
+        Pass `password_hash` instead of `password` when the password has already
+        been hashed (e.g. off the request thread).
         """
         if not email:
             raise ValueError("Users must have an email address")
@@ -19,7 +21,10 @@ class UserManager(BaseUserManager):
             **extra_fields
         )
 
-        user.set_password(password)
+        if password_hash is not None:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -64,6 +69,8 @@ class User(AbstractBaseUser):
     
     is_active = models.BooleanField(default=True)
     is_superuser = models.BooleanField(default=False)
+    # bumped to invalidate every JWT issued to this user (see account/tokens.py)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -92,4 +99,14 @@ class User(AbstractBaseUser):
     def is_staff(self):
         "Is the user a member of staff?"
         # Simplest possible answer: All admins are staff
-        return self.is_superuser
\ No newline at end of file
+        return self.is_superuser
+
+
+# Revoked JWTs, kept only until they would have expired anyway
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.jti
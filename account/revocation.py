@@ -0,0 +1,113 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken, User
+
+
+class RevocationList:
+    """
+    In-process snapshot of the RevokedToken table.
+
+    Lookups are a dict membership test, so the common case (token is not
+    revoked) costs no query. The snapshot is refreshed incrementally: only rows
+    revoked since the last sync (minus a small grace window for transactions
+    that committed late) are read back. Tokens revoked by this process are
+    added immediately; tokens revoked by other workers become visible after at
+    most TOKEN_REVOCATION_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # jti -> expiry (unix timestamp)
+        self._synced_at = None
+        self._checked_at = 0.0
+
+    def is_revoked(self, jti):
+        if not jti:
+            return False
+        self.refresh()
+        expires_at = self._entries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._entries[jti] = expires_at.timestamp()
+
+    def refresh(self, force=False):
+        interval = getattr(settings, 'TOKEN_REVOCATION_REFRESH_SECONDS', 5)
+        now = time.monotonic()
+        if not force and now - self._checked_at < interval:
+            return
+
+        with self._lock:
+            if not force and now - self._checked_at < interval:
+                return
+            sync_started = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=sync_started)
+            if self._synced_at is not None:
+                grace = getattr(settings, 'TOKEN_REVOCATION_SYNC_GRACE_SECONDS', 30)
+                rows = rows.filter(revoked_at__gte=self._synced_at - timedelta(seconds=grace))
+            else:
+                self._entries = {}
+
+            for jti, expires_at in rows.values_list('jti', 'expires_at').iterator():
+                self._entries[jti] = expires_at.timestamp()
+
+            # drop entries whose tokens have expired on their own
+            cutoff = time.time()
+            self._entries = {k: v for k, v in self._entries.items() if v > cutoff}
+            self._synced_at = sync_started
+            self._checked_at = now
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._synced_at = None
+            self._checked_at = 0.0
+
+
+revocation_list = RevocationList()
+
+
+def is_token_revoked(token):
+    return revocation_list.is_revoked(token.get(api_settings.JTI_CLAIM))
+
+
+def revoke_token(token):
+    """Revoke a single validated token (refresh or access) by its jti."""
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime_from_epoch(token['exp'])
+    try:
+        RevokedToken.objects.get_or_create(jti=jti, defaults={'expires_at': expires_at})
+    except IntegrityError:
+        # revoked concurrently by another request
+        pass
+    revocation_list.add(jti, expires_at)
+
+
+def revoke_all_tokens_for_user(user):
+    """Invalidate every token issued to `user` by bumping its token version."""
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+
+
+def purge_expired_tokens(batch_size=1000):
+    """Delete expired revocation rows in batches. Returns the number deleted."""
+    deleted = 0
+    while True:
+        ids = list(
+            RevokedToken.objects.filter(expires_at__lte=timezone.now())
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        count, _ = RevokedToken.objects.filter(id__in=ids).delete()
+        deleted += count
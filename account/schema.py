@@ -0,0 +1,7 @@
+# account/schema.py
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+
+class RevocableJWTScheme(SimpleJWTScheme):
+    """Documents RevocableJWTAuthentication as the same bearer scheme as simplejwt."""
+    target_class = 'account.authentication.RevocableJWTAuthentication'
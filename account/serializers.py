@@ -3,6 +3,10 @@ from account.models import User
 from django.utils.encoding import smart_str, force_bytes, DjangoUnicodeDecodeError
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from account.revocation import is_token_revoked, revoke_all_tokens_for_user
+from account.tokens import VersionedRefreshToken, token_version_matches
 
 from TFServer import settings
 
@@ -65,6 +69,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['uid', 'role']
 
+class PublicUserSerializer(serializers.ModelSerializer):
+    """What other users may see of an account (sellers, reviewers)."""
+    class Meta:
+        model = User
+        fields = ['uid', 'first_name', 'last_name', 'avatar']
+        read_only_fields = fields
+
 class UserChangePasswordSerializer(serializers.Serializer):
     password = serializers.CharField(max_length=255, write_only=True)
     password2 = serializers.CharField(max_length=255, write_only=True)
@@ -128,11 +139,40 @@ class UserPasswordResetSerializer(serializers.Serializer):
         
         user.set_password(password)
         user.save()
+        # a reset means the old password may be compromised: drop every session
+        revoke_all_tokens_for_user(user)
         return attrs
         
 class LogoutSerializer(serializers.Serializer):
     refresh = serializers.CharField()
 
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True)
+    access = serializers.CharField(read_only=True)
+
+    def validate(self, attrs):
+        try:
+            refresh = VersionedRefreshToken(attrs['refresh'])
+        except TokenError as e:
+            raise serializers.ValidationError(str(e))
+
+        if is_token_revoked(refresh):
+            raise serializers.ValidationError("Token has been revoked")
+
+        try:
+            user = User.objects.only('is_active', 'token_version').get(
+                **{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}
+            )
+        except User.DoesNotExist:
+            raise serializers.ValidationError("No active account found for the given token.")
+
+        if not user.is_active:
+            raise serializers.ValidationError("No active account found for the given token.")
+        if not token_version_matches(refresh, user):
+            raise serializers.ValidationError("Token has been revoked")
+
+        return {'access': str(refresh.access_token)}
+
 class TokenSerializer(serializers.Serializer):
     refresh = serializers.CharField()
     access = serializers.CharField()
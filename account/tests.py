@@ -1,3 +1,217 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import hashers
+from .models import RevokedToken, User
+from .revocation import revocation_list
+from .views import AsyncUserLoginView, AsyncUserRegistrationView, get_tokens_for_user
+
+
+class RevocationTestCase(TestCase):
+    def setUp(self):
+        revocation_list.clear()
+        self.addCleanup(revocation_list.clear)
+        self.user = User.objects.create_user(email='customer@example.com', role='customer', first_name='Test')
+        self.client = APIClient()
+
+    def profile(self, access):
+        return self.client.get('/api/accounts/profile/', HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def refresh(self, refresh):
+        return self.client.post('/api/accounts/token/refresh/', {'refresh': refresh}, format='json')
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        tokens = get_tokens_for_user(self.user)
+        self.assertEqual(self.profile(tokens['access']).status_code, 200)
+
+        response = self.client.post('/api/accounts/logout/', {'refresh': tokens['refresh']}, format='json',
+                                    HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(response.status_code, 205)
+
+        self.assertEqual(self.profile(tokens['access']).status_code, 401)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+    def test_logout_only_revokes_the_callers_own_refresh_token(self):
+        other = User.objects.create_user(email='other@example.com', role='customer', first_name='Other')
+        theirs = get_tokens_for_user(other)
+        mine = get_tokens_for_user(self.user)
+
+        response = self.client.post('/api/accounts/logout/', {'refresh': theirs['refresh']}, format='json',
+                                    HTTP_AUTHORIZATION=f"Bearer {mine['access']}")
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.refresh(theirs['refresh']).status_code, 200)
+        self.assertEqual(self.profile(mine['access']).status_code, 200)
+
+    def test_logout_is_seen_by_a_fresh_revocation_list(self):
+        tokens = get_tokens_for_user(self.user)
+        self.client.post('/api/accounts/logout/', {'refresh': tokens['refresh']}, format='json',
+                         HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        # as another worker would: only the database knows about the revocation
+        revocation_list.clear()
+        self.assertEqual(self.profile(tokens['access']).status_code, 401)
+
+    def test_logout_all_invalidates_earlier_tokens(self):
+        first = get_tokens_for_user(self.user)
+        second = get_tokens_for_user(self.user)
+
+        response = self.client.post('/api/accounts/logout-all/', HTTP_AUTHORIZATION=f"Bearer {first['access']}")
+        self.assertEqual(response.status_code, 205)
+
+        for tokens in (first, second):
+            self.assertEqual(self.profile(tokens['access']).status_code, 401)
+            self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+        self.user.refresh_from_db()
+        later = get_tokens_for_user(self.user)
+        self.assertEqual(self.profile(later['access']).status_code, 200)
+        self.assertEqual(self.refresh(later['refresh']).status_code, 200)
+
+    def test_purge_removes_only_expired_entries(self):
+        now = timezone.now()
+        RevokedToken.objects.create(jti='expired-1', expires_at=now - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='expired-2', expires_at=now - timedelta(days=3))
+        RevokedToken.objects.create(jti='live', expires_at=now + timedelta(hours=1))
+
+        out = StringIO()
+        call_command('purge_revoked_tokens', batch_size=1, stdout=out)
+
+        self.assertIn('Purged 2', out.getvalue())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000, PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10)
+class HasherTestCase(SimpleTestCase):
+    def test_pbkdf2_iterations_come_from_settings(self):
+        encoded = make_password('secret')
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(check_password('secret', encoded))
+        # a hash made with another count still verifies, and is due for an update
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertTrue(check_password('secret', encoded))
+            self.assertTrue(identify_hasher(encoded).must_update(encoded))
+
+    def test_scrypt_work_factor_comes_from_settings(self):
+        encoded = make_password('secret', hasher='scrypt')
+        self.assertEqual(identify_hasher(encoded).decode(encoded)['work_factor'], 2 ** 10)
+        self.assertTrue(check_password('secret', encoded))
+
+
+class HashPoolMixin:
+    """A fresh one-thread hashing pool per test, its database connection closed afterwards."""
+
+    def setUp(self):
+        super().setUp()
+        hashers._executor = None
+        self.addCleanup(self.shut_down_pool)
+
+    def shut_down_pool(self):
+        with override_settings(PASSWORD_HASH_WORKERS=1):
+            executor = hashers.get_hash_executor()
+        executor.submit(connections.close_all).result()
+        executor.shutdown()
+        hashers._executor = None
+
+
+@override_settings(PASSWORD_HASH_WORKERS=1)
+class RunHashingTestCase(HashPoolMixin, SimpleTestCase):
+    async def test_queue_depth_counts_jobs_waiting_for_a_thread(self):
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+            return 'first'
+
+        first = asyncio.ensure_future(hashers.run_hashing(block))
+        second = asyncio.ensure_future(hashers.run_hashing(make_password, 'secret'))
+        await asyncio.to_thread(started.wait, 5)
+        self.assertEqual(hashers.hash_queue_depth(), 1)
+
+        release.set()
+        self.assertEqual(await first, 'first')
+        self.assertTrue(check_password('secret', await second))
+        self.assertEqual(hashers.hash_queue_depth(), 0)
+
+    async def test_cancelled_jobs_leave_the_queue(self):
+        started, release = threading.Event(), threading.Event()
+        first = asyncio.ensure_future(hashers.run_hashing(lambda: started.set() or release.wait(5)))
+        second = asyncio.ensure_future(hashers.run_hashing(make_password, 'secret'))
+        await asyncio.to_thread(started.wait, 5)
+
+        second.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await second
+        self.assertEqual(hashers.hash_queue_depth(), 0)
+        release.set()
+        await first
+
+
+@override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_ITERATIONS=1000)
+class AsyncAuthViewTestCase(HashPoolMixin, TransactionTestCase):
+    """
+    Hashing, and the queries of authenticate(), run on the pool's thread and
+    connection, which only sees committed data: hence TransactionTestCase.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.factory = AsyncRequestFactory()
+
+    async def post(self, view, data):
+        request = self.factory.post('/', json.dumps(data), content_type='application/json')
+        response = await view.as_view()(request)
+        return response.status_code, json.loads(response.content)
+
+    async def test_registration_hashes_off_the_event_loop(self):
+        status_code, body = await self.post(AsyncUserRegistrationView, {
+            'email': 'new@example.com', 'first_name': 'New', 'last_name': 'User', 'role': 'customer',
+            'password': 'secret-pass', 'password2': 'secret-pass',
+        })
+        self.assertEqual(status_code, 201)
+        self.assertEqual(set(body['data']['tokens']), {'access', 'refresh'})
+        user = await User.objects.aget(email='new@example.com')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(await asyncio.to_thread(user.check_password, 'secret-pass'))
+
+    async def test_login_goes_through_the_auth_backends(self):
+        await sync_to_async(User.objects.create_user)(email='customer@example.com', role='customer', first_name='Cam', password='secret-pass')
+        failures = []
+
+        def on_failure(sender, credentials, request, **kwargs):
+            failures.append(credentials['email'])
+
+        user_login_failed.connect(on_failure)
+        self.addCleanup(user_login_failed.disconnect, on_failure)
+
+        status_code, body = await self.post(AsyncUserLoginView, {'email': 'customer@example.com', 'password': 'secret-pass'})
+        self.assertEqual(status_code, 200)
+        self.assertEqual(body['data']['user']['email'], 'customer@example.com')
+        self.assertEqual(failures, [])
+
+        for email, password in [('customer@example.com', 'wrong'), ('nobody@example.com', 'secret-pass')]:
+            status_code, _ = await self.post(AsyncUserLoginView, {'email': email, 'password': password})
+            self.assertEqual(status_code, 404)
+        self.assertEqual(failures, ['customer@example.com', 'nobody@example.com'])
+
+    async def test_inactive_users_cannot_log_in(self):
+        await sync_to_async(User.objects.create_user)(
+            email='gone@example.com', role='customer', first_name='Gus', password='secret-pass', is_active=False,
+        )
+        status_code, _ = await self.post(AsyncUserLoginView, {'email': 'gone@example.com', 'password': 'secret-pass'})
+        self.assertEqual(status_code, 404)
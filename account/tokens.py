@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+class VersionedRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's `token_version`. The claim is copied to
+    every access token minted from it, so bumping the version on the user
+    invalidates all of them at once.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+class OrderStreamToken(Token):
+    """
+    Short-lived token that only opens the live order stream. Browsers'
+    EventSource cannot send headers, so it travels in the URL, where access
+    tokens must not: URLs end up in logs and browser history. Not accepted
+    by JWTAuthentication, and an access token is not accepted as one.
+    """
+    token_type = 'order_stream'
+    lifetime = timedelta(seconds=settings.ORDER_STREAM_TOKEN_LIFETIME)
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+def token_version_matches(token, user):
+    return token.get(TOKEN_VERSION_CLAIM, 0) == user.token_version
@@ -1,12 +1,14 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path
-from account.views import UserRegistrationView, UserLoginView, UserProfileView,UserChangePasswordView,SendPasswordResetEmailView,UserPasswordResetView,LogoutView
+from account.views import AsyncUserRegistrationView, AsyncUserLoginView, UserRegistrationView, UserLoginView, UserProfileView,UserChangePasswordView,SendPasswordResetEmailView,UserPasswordResetView,LogoutView,LogoutAllView,TokenRefreshView
 urlpatterns = [
-    path('register/', UserRegistrationView.as_view(), name="register"),
-    path('login/', UserLoginView.as_view(), name="login"),
+    path('register/', (AsyncUserRegistrationView if settings.ASYNC_VIEWS else UserRegistrationView).as_view(), name="register"),
+    path('login/', (AsyncUserLoginView if settings.ASYNC_VIEWS else UserLoginView).as_view(), name="login"),
     path('profile/', UserProfileView.as_view(), name="profile"),
     path('changepassword/', UserChangePasswordView.as_view(), name="changepassword"),
     path('send-reset-password-email/', SendPasswordResetEmailView.as_view(), name="send-reset-password-email"),
     path('reset-password/<str:uid>/<str:token>/', UserPasswordResetView.as_view(), name="reset-password"),
     path('logout/', LogoutView.as_view(), name="logout"),
+    path('logout-all/', LogoutAllView.as_view(), name="logout-all"),
+    path('token/refresh/', TokenRefreshView.as_view(), name="token-refresh"),
 ]
\ No newline at end of file
@@ -9,12 +9,20 @@ from .serializers import (
     SendPasswordResetEmailSerializer,
     UserPasswordResetSerializer,
     LogoutSerializer,
+    TokenRefreshSerializer,
     AuthResponseSerializer
 )
 from drf_spectacular.utils import extend_schema
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from django.contrib.auth.hashers import make_password
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .revocation import revoke_token, revoke_all_tokens_for_user
+from .tokens import VersionedRefreshToken
+from .hashers import run_hashing
+from .models import User
+from utils.async_views import AsyncAPIView
 from rest_framework.permissions import IsAuthenticated
 from utils.swagger_helpers import wrapped_response_serializer
 
@@ -23,7 +31,7 @@ def get_tokens_for_user(user):
     if not user.is_active:
       raise AuthenticationFailed("User is not active")
 
-    refresh = RefreshToken.for_user(user)
+    refresh = VersionedRefreshToken.for_user(user)
 
     return {
         'refresh': str(refresh),
@@ -31,6 +39,8 @@ def get_tokens_for_user(user):
     }
 
 class UserRegistrationView(APIView):
+    throttle_scope = 'auth'
+
     @extend_schema(
         summary="Register a new user (Public)",
         description="Anyone can register a new user with email, name, password and role (`admin`, `seller`, `customer`).",
@@ -57,6 +67,8 @@ class UserRegistrationView(APIView):
         return Response(success=False, status=status.HTTP_400_BAD_REQUEST, message="Registration failed", errors=serializer.errors)
     
 class UserLoginView(APIView):
+    throttle_scope = 'auth'
+
     @extend_schema(
         summary="Login User (Public)",
         request=UserLoginSerializer,
@@ -87,6 +99,77 @@ class UserLoginView(APIView):
                 return Response(success=False, message="Login Failed", status=status.HTTP_404_NOT_FOUND, errors="Email or Password is not valid")
         return Response(success=False, message="Login Failed", status=status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
     
+# ---------------- Async (ASGI) auth views ----------------
+# Same contract as the views above; password hashing runs in a bounded thread
+# pool (account/hashers.py) instead of on the worker serving the request.
+
+class AsyncUserRegistrationView(AsyncAPIView):
+    throttle_scope = 'auth'
+
+    async def post(self, request):
+        try:
+            data = self.get_data(request)
+        except ValueError as e:
+            return Response(success=False, status=status.HTTP_400_BAD_REQUEST, message="Registration failed", errors={"detail": str(e)})
+
+        serializer = UserRegistrationSerializer(data=data)
+        # unique email/phone validators query the database
+        if not await sync_to_async(serializer.is_valid)():
+            return Response(success=False, status=status.HTTP_400_BAD_REQUEST, message="Registration failed", errors=serializer.errors)
+
+        validated_data = dict(serializer.validated_data)
+        validated_data.pop('password2')
+        password_hash = await run_hashing(make_password, validated_data.pop('password'))
+        user = await sync_to_async(User.objects.create_user)(password_hash=password_hash, **validated_data)
+        serializer.instance = user
+        try:
+            tokens = get_tokens_for_user(user)
+        except AuthenticationFailed as e:
+            return Response(
+            success=False,
+            status=status.HTTP_401_UNAUTHORIZED,
+            message="Authentication Failed",
+            errors={"detail": str(e)}
+            )
+        return Response(success=True, status=status.HTTP_201_CREATED, message="Registration Successful", data={
+            "user": serializer.data,
+            "tokens": tokens
+        })
+
+class AsyncUserLoginView(AsyncAPIView):
+    throttle_scope = 'auth'
+
+    async def post(self, request):
+        try:
+            data = self.get_data(request)
+        except ValueError as e:
+            return Response(success=False, message="Login Failed", status=status.HTTP_400_BAD_REQUEST, errors={"detail": str(e)})
+
+        serializer = UserLoginSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(success=False, message="Login Failed", status=status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+
+        email = serializer.validated_data.get('email')
+        password = serializer.validated_data.get('password')
+        # through the configured backends, so user_login_failed still fires
+        user = await run_hashing(authenticate, request, email=email, password=password)
+        if user is not None:
+            try:
+                tokens = get_tokens_for_user(user)
+            except AuthenticationFailed as e:
+                return Response(
+                success=False,
+                status=status.HTTP_401_UNAUTHORIZED,
+                message="Authentication Failed",
+                errors={"detail": str(e)}
+                )
+            user_serializer = UserProfileSerializer(user)
+            return Response(message="Login Successful", data={
+            "user": user_serializer.data,
+            "tokens": tokens
+            })
+        return Response(success=False, message="Login Failed", status=status.HTTP_404_NOT_FOUND, errors="Email or Password is not valid")
+
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
     @extend_schema(
@@ -112,6 +195,7 @@ class UserProfileView(APIView):
     
 class UserChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'auth'
 
     @extend_schema(
         summary="Change Password (Authenticated)",
@@ -134,6 +218,8 @@ class UserChangePasswordView(APIView):
         )
     
 class SendPasswordResetEmailView(APIView):
+    throttle_scope = 'auth'
+
     @extend_schema(
         summary="Send Password Reset Email (Public)",
         request=SendPasswordResetEmailSerializer,
@@ -151,6 +237,8 @@ class SendPasswordResetEmailView(APIView):
         )
     
 class UserPasswordResetView(APIView):
+    throttle_scope = 'auth'
+
     @extend_schema(
         summary="Reset Password (Public)",
         request=UserPasswordResetSerializer,
@@ -180,8 +268,15 @@ class LogoutView(APIView):
         if serializer.is_valid():
             try:
                 refresh_token = serializer.validated_data['refresh']
-                token = RefreshToken(refresh_token)
-                token.blacklist()
+                token = VersionedRefreshToken(refresh_token)
+                # a stolen refresh token must not let someone else log its owner out
+                owner = str(getattr(request.user, jwt_settings.USER_ID_FIELD))
+                if str(token.get(jwt_settings.USER_ID_CLAIM)) != owner:
+                    raise TokenError("Token does not belong to this user")
+                revoke_token(token)
+                # also revoke the access token used for this request
+                if request.auth is not None:
+                    revoke_token(request.auth)
 
                 return Response(
                     message='Logout successsful',
@@ -199,4 +294,37 @@ class LogoutView(APIView):
             message="Logout failed",
             status=status.HTTP_400_BAD_REQUEST,
             errors=serializer.errors
-        )
\ No newline at end of file
+        )
+
+class LogoutAllView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Logout From All Devices (Authenticated)",
+        description="Invalidates every access and refresh token issued to the current user.",
+        request=None,
+        responses=wrapped_response_serializer()
+    )
+    def post(self, request):
+        revoke_all_tokens_for_user(request.user)
+        return Response(
+            message='Logged out from all devices',
+            status=status.HTTP_205_RESET_CONTENT
+        )
+
+class TokenRefreshView(APIView):
+    @extend_schema(
+        summary="Refresh Access Token (Public)",
+        request=TokenRefreshSerializer,
+        responses=wrapped_response_serializer(TokenRefreshSerializer)
+    )
+    def post(self, request):
+        serializer = TokenRefreshSerializer(data=request.data)
+        if serializer.is_valid():
+            return Response(message="Token refreshed successfully", data=serializer.validated_data)
+        return Response(
+            success=False,
+            message="Token refresh failed",
+            status=status.HTTP_401_UNAUTHORIZED,
+            errors=serializer.errors
+        )
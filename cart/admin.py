@@ -0,0 +1,17 @@
+from django.contrib import admin
+from .models import Cart, CartItem
+
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+    readonly_fields = ('item_id', 'added_at')
+    autocomplete_fields = ('product',)
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    inlines = [CartItemInline]
+    list_display = ('user', 'created_at')
+    search_fields = ('user__email', 'user__first_name', 'user__last_name')
+    autocomplete_fields = ('user',)
@@ -0,0 +1,44 @@
+import uuid
+from django.db import models
+from django.conf import settings
+from product.models import Product
+
+User = settings.AUTH_USER_MODEL
+
+# lines per cart, bounding the quote and the checkout of a cart
+MAX_CART_ITEMS = 100
+
+
+class Cart(models.Model):
+    """A user's saved cart, priced by /api/cart/quote/ and checked out with POST /api/orders/ {"from_cart": true}."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cart of {self.user}"
+
+
+class CartItem(models.Model):
+    item_id = models.CharField(max_length=25, unique=True, editable=False)
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    size = models.CharField(max_length=50, blank=True, null=True)
+    color = models.CharField(max_length=30, blank=True, null=True)
+    quantity = models.PositiveIntegerField()
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # adding a product again in the same size and color adds to its line
+            models.UniqueConstraint(
+                fields=['cart', 'product', 'size', 'color'], name='cartitem_unique_line', nulls_distinct=False,
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.item_id:
+            self.item_id = 'CRT-' + uuid.uuid4().hex[:10].upper()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.product} x {self.quantity}"
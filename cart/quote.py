@@ -0,0 +1,100 @@
+# cart/quote.py
+"""
+Pricing of cart lines against the current catalog. A quote reads every
+product of the cart with one query and reports, per line, the price
+checkout would charge now, the stock, and what would stop the line from
+being ordered; subtotals and the total are computed as checkout does.
+"""
+from decimal import Decimal
+
+from order.models import line_subtotal
+from product.models import Product
+from .models import CartItem
+
+# why a line cannot be ordered as it is
+NOT_FOUND = 'not_found'
+UNAVAILABLE = 'unavailable'
+INSUFFICIENT_STOCK = 'insufficient_stock'
+INVALID_SIZE = 'invalid_size'
+INVALID_COLOR = 'invalid_color'
+
+# the product columns a quote reads
+QUOTE_FIELDS = ['id', 'product_id', 'name', 'thumbnail', 'price', 'stock', 'isAvailable', 'sizes', 'color']
+
+
+def line_problems(product, size, color, quantity):
+    """What stops `quantity` units of `product` in `size` and `color` from being ordered now."""
+    if product is None:
+        return [NOT_FOUND]
+    problems = []
+    if not product.isAvailable:
+        problems.append(UNAVAILABLE)
+    if product.stock < quantity:
+        problems.append(INSUFFICIENT_STOCK)
+    if size and size not in (product.sizes or ()):
+        problems.append(INVALID_SIZE)
+    if color and color not in (product.color or ()):
+        problems.append(INVALID_COLOR)
+    return problems
+
+
+def cart_items(user):
+    """The lines of `user`'s saved cart with their products, in the order they were added, with one query."""
+    fields = [f'product__{field}' for field in QUOTE_FIELDS]
+    return list(
+        CartItem.objects.filter(cart__user=user).select_related('product')
+        .only('item_id', 'size', 'color', 'quantity', *fields).order_by('pk')
+    )
+
+
+def quote_lines(lines):
+    """
+    The quote of `lines`, dicts with the `product` (None when it does not
+    exist), `size`, `color`, `quantity` and optionally the cart `item_id`.
+    """
+    total = Decimal('0.00')
+    quoted = []
+    for line in lines:
+        product = line['product']
+        problems = line_problems(product, line.get('size'), line.get('color'), line['quantity'])
+        subtotal = line_subtotal(product.price, line['quantity']) if product is not None else None
+        if subtotal is not None:
+            total += subtotal
+        quoted.append({
+            'item_id': line.get('item_id'),
+            'product_id': product.product_id if product is not None else line.get('product_id'),
+            'product_name': product.name if product is not None else None,
+            'thumbnail': product.thumbnail if product is not None else None,
+            'size': line.get('size'),
+            'color': line.get('color'),
+            'quantity': line['quantity'],
+            'price': product.price if product is not None else None,
+            'stock': product.stock if product is not None else None,
+            'isAvailable': product.isAvailable if product is not None else False,
+            'subtotal': subtotal,
+            'problems': problems,
+        })
+    return {
+        'lines': quoted,
+        'total': total.quantize(Decimal('0.01')),
+        'item_count': sum(line['quantity'] for line in quoted),
+        'valid': bool(quoted) and not any(line['problems'] for line in quoted),
+    }
+
+
+def quote_cart(user):
+    """The quote of `user`'s saved cart."""
+    return quote_lines([
+        {'item_id': item.item_id, 'product': item.product, 'size': item.size, 'color': item.color,
+         'quantity': item.quantity}
+        for item in cart_items(user)
+    ])
+
+
+def quote_products(lines):
+    """The quote of unsaved lines naming products by `product_id`, reading them with one query."""
+    products = {
+        product.product_id: product
+        for product in Product.objects.filter(product_id__in={line['product_id'] for line in lines}).only(*QUOTE_FIELDS)
+    }
+    return quote_lines([{**line, 'product': products.get(line['product_id'])} for line in lines])
@@ -0,0 +1,93 @@
+from rest_framework import serializers
+from product.models import Product
+from .models import CartItem, MAX_CART_ITEMS
+from .quote import INSUFFICIENT_STOCK, INVALID_COLOR, INVALID_SIZE, NOT_FOUND, UNAVAILABLE, line_problems
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+    product_id = serializers.SlugRelatedField(
+        queryset=Product.objects.all(),
+        slug_field='product_id',
+        source='product'
+    )
+    product_name = serializers.ReadOnlyField(source='product.name')
+    quantity = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = CartItem
+        fields = [
+            'item_id',
+            'product_id',
+            'product_name',
+            'size',
+            'color',
+            'quantity',
+            'added_at',
+        ]
+        read_only_fields = ['item_id', 'added_at']
+        # merged into an existing line by the view rather than rejected
+        validators = []
+
+    def validate(self, data):
+        # blank and missing options are the same line
+        for field in ('size', 'color'):
+            if field in data:
+                data[field] = data[field] or None
+        # options are checked now, stock and availability by the quote and at checkout
+        product = data['product']
+        problems = line_problems(product, data.get('size'), data.get('color'), data['quantity'])
+        errors = {}
+        if INVALID_SIZE in problems:
+            errors['size'] = [f"{product.name} does not come in this size."]
+        if INVALID_COLOR in problems:
+            errors['color'] = [f"{product.name} does not come in this color."]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return data
+
+
+class CartItemQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=1)
+
+
+# ---------------- Quotes ----------------
+
+class QuoteItemSerializer(serializers.Serializer):
+    product_id = serializers.CharField(max_length=50)
+    size = serializers.CharField(max_length=50, required=False, allow_blank=True, allow_null=True)
+    color = serializers.CharField(max_length=30, required=False, allow_blank=True, allow_null=True)
+    quantity = serializers.IntegerField(min_value=1)
+
+    def validate(self, data):
+        for field in ('size', 'color'):
+            data[field] = data.get(field) or None
+        return data
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    items = QuoteItemSerializer(many=True, allow_empty=False, max_length=MAX_CART_ITEMS)
+
+
+class QuoteLineSerializer(serializers.Serializer):
+    item_id = serializers.CharField(allow_null=True, help_text="The cart line; null for posted lines.")
+    product_id = serializers.CharField()
+    product_name = serializers.CharField(allow_null=True)
+    thumbnail = serializers.URLField(allow_null=True)
+    size = serializers.CharField(allow_null=True)
+    color = serializers.CharField(allow_null=True)
+    quantity = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True, help_text="Current unit price.")
+    stock = serializers.IntegerField(allow_null=True)
+    isAvailable = serializers.BooleanField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    problems = serializers.ListField(
+        child=serializers.ChoiceField(choices=[NOT_FOUND, UNAVAILABLE, INSUFFICIENT_STOCK, INVALID_SIZE, INVALID_COLOR]),
+        help_text="Why the line cannot be ordered as it is; empty when it can.",
+    )
+
+
+class QuoteSerializer(serializers.Serializer):
+    lines = QuoteLineSerializer(many=True)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2, help_text="Sum of the line subtotals.")
+    item_count = serializers.IntegerField(help_text="Units over all lines.")
+    valid = serializers.BooleanField(help_text="Every line can be ordered as it is.")
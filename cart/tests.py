@@ -0,0 +1,150 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from account.models import User
+from order.models import Order
+from product.models import Product
+from .models import Cart, CartItem
+from .quote import INSUFFICIENT_STOCK, INVALID_SIZE, NOT_FOUND, UNAVAILABLE
+
+
+class CartAPITestCase(TestCase):
+    """Fixtures and helpers; a customer with an empty cart."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        seller = User.objects.create_user(email='seller@example.com', role='seller', first_name='Sam')
+        cls.honey = Product.objects.create(
+            name='Honey', price=Decimal('12.50'), stock=5, seller=seller, sizes=['500ml', '1L'], color=['Golden'],
+        )
+        cls.jam = Product.objects.create(name='Jam', price=Decimal('3.00'), stock=10, seller=seller)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def add(self, product, quantity=1, **options):
+        return self.client.post('/api/cart/items/', {'product_id': product.product_id, 'quantity': quantity, **options}, format='json')
+
+    def lines(self):
+        return list(CartItem.objects.filter(cart__user=self.customer).order_by('pk').values_list('product', 'size', 'color', 'quantity'))
+
+
+class CartTestCase(CartAPITestCase):
+    def test_adding_again_merges_lines(self):
+        self.assertEqual(self.add(self.honey, size='500ml').status_code, 201)
+        response = self.add(self.honey, 2, size='500ml', color='')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['quantity'], 3)
+        self.assertEqual(self.add(self.honey, size='1L').status_code, 201)
+        self.assertEqual(self.add(self.jam).status_code, 201)
+
+        self.assertEqual(self.lines(), [
+            (self.honey.pk, '500ml', None, 3), (self.honey.pk, '1L', None, 1), (self.jam.pk, None, None, 1),
+        ])
+
+    def test_size_and_color_must_be_offered(self):
+        response = self.add(self.honey, size='XXXL-nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'size'})
+
+        response = self.add(self.honey, size='1L', color='Purple')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'color'})
+
+        # a product without options takes none
+        self.assertEqual(self.add(self.jam, size='1L').status_code, 400)
+        self.assertEqual(self.lines(), [])
+
+    def test_line_limit(self):
+        with mock.patch('cart.views.MAX_CART_ITEMS', 2):
+            self.add(self.honey, size='500ml')
+            self.add(self.honey, size='1L')
+            response = self.add(self.jam)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('non_field_errors', response.json()['errors'])
+            # a full cart still takes more of its lines
+            self.assertEqual(self.add(self.honey, size='1L').status_code, 200)
+        self.assertEqual(len(self.lines()), 2)
+
+    def test_quote_problems(self):
+        response = APIClient().post('/api/cart/quote/', {'items': [
+            {'product_id': self.honey.product_id, 'size': '1L', 'quantity': 2},
+            {'product_id': self.honey.product_id, 'size': '500ml', 'quantity': 6},
+            {'product_id': 'P-NOPE', 'quantity': 1},
+            {'product_id': self.jam.product_id, 'size': 'XL', 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        quote = response.json()['data']
+        self.assertEqual(
+            [line['problems'] for line in quote['lines']], [[], [INSUFFICIENT_STOCK], [NOT_FOUND], [INVALID_SIZE]],
+        )
+        self.assertEqual(Decimal(quote['total']), Decimal('25.00') + Decimal('75.00') + Decimal('3.00'))
+        self.assertFalse(quote['valid'])
+
+    def test_saved_cart_quote_sees_catalog_changes(self):
+        self.add(self.honey, size='1L')
+        Product.objects.filter(pk=self.honey.pk).update(isAvailable=False, sizes=['500ml'])
+        quote = self.client.get('/api/cart/quote/').json()['data']
+        self.assertEqual(quote['lines'][0]['problems'], [UNAVAILABLE, INVALID_SIZE])
+        self.assertFalse(quote['valid'])
+
+
+class CheckoutFromCartTestCase(CartAPITestCase):
+    profile = {
+        'first_name': 'Cam', 'last_name': 'Customer', 'email': 'customer@example.com', 'phone': '01700000000',
+        'address': '1 Main St', 'city': 'Dhaka',
+    }
+
+    def checkout(self, **data):
+        return self.client.post('/api/orders/', {'paymentMethod': 'COD', 'profile': self.profile, **data}, format='json')
+
+    def test_checkout_orders_and_removes_the_cart_lines(self):
+        self.add(self.honey, 2, size='500ml', color='Golden')
+        self.add(self.jam, 3)
+        quote = self.client.get('/api/cart/quote/').json()['data']
+        # another customer's cart is left alone
+        other = User.objects.create_user(email='other@example.com', role='customer', first_name='Oz')
+        CartItem.objects.create(cart=Cart.objects.create(user=other), product=self.jam, quantity=1)
+
+        response = self.checkout(from_cart=True)
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(order_id=response.json()['data']['order_id'])
+        self.assertEqual(order.total_amount, Decimal(quote['total']))
+        self.assertEqual(
+            sorted(order.items.values_list('product', 'size', 'color', 'quantity')),
+            sorted([(self.honey.pk, '500ml', 'Golden', 2), (self.jam.pk, None, None, 3)]),
+        )
+        self.assertEqual(self.lines(), [])
+        self.assertTrue(CartItem.objects.filter(cart__user=other).exists())
+        self.honey.refresh_from_db()
+        self.assertEqual(self.honey.stock, 3)
+
+    def test_items_and_from_cart_are_exclusive(self):
+        self.add(self.jam)
+        response = self.checkout(from_cart=True, items=[{'product_id': self.jam.product_id, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.json()['errors'])
+        self.assertEqual(len(self.lines()), 1)
+        self.assertFalse(Order.objects.exists())
+
+    def test_empty_cart(self):
+        response = self.checkout(from_cart=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('from_cart', response.json()['errors'])
+
+    def test_cart_lines_that_cannot_be_ordered(self):
+        self.add(self.honey, 2, size='1L')
+        Product.objects.filter(pk=self.honey.pk).update(sizes=['500ml'])
+        self.assertEqual(self.checkout(from_cart=True).status_code, 400)
+
+        Product.objects.filter(pk=self.honey.pk).update(sizes=['1L'], stock=1)
+        self.assertEqual(self.checkout(from_cart=True).status_code, 400)
+
+        self.assertEqual(len(self.lines()), 1)
+        self.assertFalse(Order.objects.exists())
@@ -0,0 +1,17 @@
+# urls.py
+from django.urls import path
+from .views import CartView, CartItemListView, CartItemDetailView, CartQuoteView
+
+urlpatterns = [
+    # The saved cart's lines, or clear it
+    path('', CartView.as_view(), name='cart'),
+
+    # Add a line, or add to the matching one
+    path('items/', CartItemListView.as_view(), name='cart-items'),
+
+    # Change the quantity of a line or remove it
+    path('items/<str:item_id>/', CartItemDetailView.as_view(), name='cart-item'),
+
+    # Current prices, stock and validity of the saved cart (GET) or of posted lines (POST)
+    path('quote/', CartQuoteView.as_view(), name='cart-quote'),
+]
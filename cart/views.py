@@ -0,0 +1,154 @@
+# views.py
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from rest_framework import permissions, status
+from rest_framework.exceptions import NotFound
+from rest_framework.views import APIView
+from drf_spectacular.utils import extend_schema, extend_schema_view
+from .models import Cart, CartItem, MAX_CART_ITEMS
+from .quote import quote_cart, quote_products
+from .serializers import (
+    CartItemSerializer, CartItemQuantitySerializer, QuoteRequestSerializer, QuoteSerializer,
+)
+from utils.helpers import Response
+from utils.swagger_helpers import wrapped_response_serializer
+
+
+def add_to_cart(cart, product, size, color, quantity):
+    """
+    Add `quantity` units to the cart line of `product` in `size` and `color`,
+    creating it if needed. Returns the line and whether it was created, or
+    None for a new line in a full cart.
+    """
+    line = CartItem.objects.filter(cart=cart, product=product, size=size, color=color)
+    if line.update(quantity=F('quantity') + quantity):
+        return line.get(), False
+    if cart.items.count() >= MAX_CART_ITEMS:
+        return None, False
+    try:
+        with transaction.atomic():
+            return CartItem.objects.create(cart=cart, product=product, size=size, color=color, quantity=quantity), True
+    except IntegrityError:
+        # created concurrently
+        line.update(quantity=F('quantity') + quantity)
+        return line.get(), False
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Get My Cart (Authenticated)",
+        description="The lines of the saved cart, oldest first. Prices and stock are in the quote.",
+        responses=wrapped_response_serializer(CartItemSerializer, many=True)
+    ),
+    delete=extend_schema(
+        summary="Clear My Cart (Authenticated)",
+        responses=wrapped_response_serializer()
+    )
+)
+class CartView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        items = CartItem.objects.filter(cart__user=request.user).select_related('product').order_by('pk')
+        return Response(data=CartItemSerializer(items, many=True).data, message="Cart retrieved successfully")
+
+    def delete(self, request):
+        CartItem.objects.filter(cart__user=request.user).delete()
+        return Response(message="Cart cleared successfully")
+
+
+@extend_schema_view(
+    post=extend_schema(
+        summary="Add to Cart (Authenticated)",
+        description=f"Adds to the line of the same product, size and color if there is one. A cart holds at most {MAX_CART_ITEMS} lines.",
+        request=CartItemSerializer,
+        responses=wrapped_response_serializer(CartItemSerializer)
+    )
+)
+class CartItemListView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = CartItemSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(success=False, message="Adding to cart failed", status=status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+        data = serializer.validated_data
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        item, created = add_to_cart(cart, data['product'], data.get('size'), data.get('color'), data['quantity'])
+        if item is None:
+            return Response(success=False, message="Adding to cart failed", status=status.HTTP_400_BAD_REQUEST,
+                            errors={'non_field_errors': [f"A cart holds at most {MAX_CART_ITEMS} lines."]})
+        return Response(
+            data=CartItemSerializer(item).data,
+            message="Added to cart successfully",
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+@extend_schema_view(
+    patch=extend_schema(
+        summary="Change Cart Line Quantity (Authenticated)",
+        request=CartItemQuantitySerializer,
+        responses=wrapped_response_serializer(CartItemSerializer)
+    ),
+    delete=extend_schema(
+        summary="Remove Cart Line (Authenticated)",
+        responses=wrapped_response_serializer()
+    )
+)
+class CartItemDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self, request, item_id):
+        item = CartItem.objects.filter(cart__user=request.user, item_id=item_id).select_related('product').first()
+        if item is None:
+            raise NotFound("No cart item matches the given query.")
+        return item
+
+    def patch(self, request, item_id):
+        item = self.get_object(request, item_id)
+        serializer = CartItemQuantitySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(success=False, message="Cart update failed", status=status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+        item.quantity = serializer.validated_data['quantity']
+        item.save(update_fields=['quantity'])
+        return Response(data=CartItemSerializer(item).data, message="Cart updated successfully")
+
+    def delete(self, request, item_id):
+        self.get_object(request, item_id).delete()
+        return Response(message="Removed from cart successfully")
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Quote My Cart (Authenticated)",
+        description=(
+            "Current price, stock and availability of every line of the saved cart, read with one query, with "
+            "line subtotals and the total as checkout would charge them. `problems` lists why a line cannot be "
+            "ordered as it is (`not_found`, `unavailable`, `insufficient_stock`, `invalid_size`, `invalid_color`)."
+        ),
+        responses=wrapped_response_serializer(QuoteSerializer)
+    ),
+    post=extend_schema(
+        summary="Quote Cart Lines (Public)",
+        description=f"Like GET, for up to {MAX_CART_ITEMS} lines sent in the body, e.g. a guest's cart.",
+        request=QuoteRequestSerializer,
+        responses=wrapped_response_serializer(QuoteSerializer)
+    )
+)
+class CartQuoteView(APIView):
+
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            return [permissions.AllowAny()]
+        return [permissions.IsAuthenticated()]
+
+    def get(self, request):
+        return Response(data=QuoteSerializer(quote_cart(request.user)).data, message="Cart quoted successfully")
+
+    def post(self, request):
+        serializer = QuoteRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(success=False, message="Cart quote failed", status=status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+        quote = quote_products(serializer.validated_data['items'])
+        return Response(data=QuoteSerializer(quote).data, message="Cart quoted successfully")
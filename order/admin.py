@@ -1,14 +1,60 @@
-from django.contrib import admin
+from collections import Counter
+
+from django import forms
+from django.contrib import admin, messages
 from django.db import transaction
-from .models import Order, OrderItem, Product
+from django.db.models import F
+from django.db.models.functions import Greatest
+from rest_framework.filters import search_smart_split
+from .filters import search_orders
+from .rollups import record_sales
+from .transitions import ORDER_TRANSITIONS, UPDATED, transition_orders
+from .models import Order, OrderEvent, OrderItem, Product
+
+
+def take_stock(removed, added):
+    """
+    Put the `removed` order lines back into stock and take the `added` ones
+    out, both as (product_id, seller_id, quantity, price) tuples. Products are
+    locked in pk order, as checkout does.
+    """
+    taken = Counter()
+    for product_id, _, quantity, _ in removed:
+        taken[product_id] -= quantity
+    for product_id, _, quantity, _ in added:
+        taken[product_id] += quantity
+    taken.pop(None, None)
+    products = Product.objects.select_for_update().filter(pk__in=list(taken)).order_by('pk')
+    for product in products:
+        if taken[product.pk] > product.stock:
+            raise ValueError(f"Not enough stock for {product.name}")
+    for product_id in sorted(taken):
+        if taken[product_id]:
+            Product.objects.filter(pk=product_id).update(
+                stock=F('stock') - taken[product_id],
+                sold=Greatest(F('sold') + taken[product_id], 0),
+            )
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 1
 
+
+class OrderAdminForm(forms.ModelForm):
+    def clean_status(self):
+        status = self.cleaned_data['status']
+        previous = self.initial.get('status')
+        if self.instance.pk and status != previous and previous not in ORDER_TRANSITIONS.get(status, ()):
+            raise forms.ValidationError(f"A {previous} order cannot be marked {status}.")
+        return status
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
     inlines = [OrderItemInline]
+    autocomplete_fields = ('user',)
     list_display = (
         'order_id', 
         'get_customer_name', 
@@ -20,6 +66,7 @@ class OrderAdmin(admin.ModelAdmin):
         'created_at'
     )
     list_filter = ('status', 'payment_status', 'created_at')
+    actions = ['mark_confirmed', 'mark_shipped', 'mark_delivered', 'mark_cancelled']
     search_fields = ('order_id', 'user__email', 'user__first_name', 'user__last_name', 'user__phone')
     readonly_fields = (
         'order_id', 
@@ -40,6 +87,44 @@ class OrderAdmin(admin.ModelAdmin):
         ('Status', {'fields': ('status',)}),
     )
 
+    def get_fieldsets(self, request, obj=None):
+        if obj is None:
+            # a new order needs its customer
+            return (('Customer', {'fields': ('user',)}),) + self.fieldsets
+        return self.fieldsets
+
+    def transition(self, request, queryset, status):
+        results = transition_orders(queryset.values_list('order_id', flat=True), status)
+        outcomes = Counter(result for result, _ in results.values())
+        updated = outcomes.pop(UPDATED, 0)
+        skipped = ', '.join(f"{count} {result.replace('_', ' ')}" for result, count in outcomes.items())
+        self.message_user(
+            request, f"{updated} order(s) marked {status}." + (f" Skipped: {skipped}." if skipped else ""),
+            messages.WARNING if skipped else messages.SUCCESS,
+        )
+
+    @admin.action(description='Mark selected orders confirmed')
+    def mark_confirmed(self, request, queryset):
+        self.transition(request, queryset, 'confirmed')
+
+    @admin.action(description='Mark selected orders shipped')
+    def mark_shipped(self, request, queryset):
+        self.transition(request, queryset, 'shipped')
+
+    @admin.action(description='Mark selected orders delivered')
+    def mark_delivered(self, request, queryset):
+        self.transition(request, queryset, 'delivered')
+
+    @admin.action(description='Cancel selected orders and restore stock')
+    def mark_cancelled(self, request, queryset):
+        self.transition(request, queryset, 'cancelled')
+
+    def get_search_results(self, request, queryset, search_term):
+        terms = search_smart_split(search_term)
+        if not terms:
+            return queryset, False
+        return search_orders(queryset, terms, self.search_fields), False
+
     def get_customer_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}"
     get_customer_name.short_description = 'Customer Name'
@@ -60,24 +145,53 @@ class OrderAdmin(admin.ModelAdmin):
         return obj.user.postal_code
     get_delivery_postal_code.short_description = 'Postal Code'
 
+    def save_model(self, request, obj, form, change):
+        status = obj.status
+        if change and 'status' in form.changed_data:
+            # moved by transition_orders() below, which restores stock and sales on cancel
+            obj.status = form.initial['status']
+        super().save_model(request, obj, form, change)
+        if not change:
+            events = [OrderEvent.CREATED]
+        else:
+            events = [OrderEvent.PAYMENT_STATUS_CHANGED] if 'payment_status' in form.changed_data else []
+        OrderEvent.record([OrderEvent.of(obj, event) for event in events])
+
+        if status != obj.status:
+            outcome, current = transition_orders([obj.order_id], status)[obj.order_id]
+            if outcome != UPDATED:
+                self.message_user(request, f"Order {obj.order_id} was not marked {status}: it is {current}.", messages.ERROR)
+            obj.status = current
+
     def save_formset(self, request, form, formset, change):
-        """This is called for inline OrderItems"""
+        """
+        This is called for inline OrderItems. Stock and the sales rollup follow
+        the lines added, changed and deleted, unless the order is cancelled.
+        """
         with transaction.atomic():
+            order = form.instance
             instances = formset.save(commit=False)
-            for item in instances:
-                # Check stock
-                if item.product and item.quantity:
-                    if item.product.stock < item.quantity:
-                        raise ValueError(f"Not enough stock for {item.product.name}")
-
-                    # Deduct stock
-                    item.product.stock -= item.quantity
-                    item.product.save()
+            # the changed and deleted lines as they were, to take back out
+            removed = list(
+                OrderItem.objects.filter(pk__in=[item.pk for item, _ in formset.changed_objects] +
+                                         [item.pk for item in formset.deleted_objects])
+                .values_list('product', 'product__seller', 'quantity', 'price')
+            )
+            added = [(item.product_id, item.product.seller_id, item.quantity, item.price)
+                     for item in instances if item.product_id]
+            counted = order.status != 'cancelled'
+            if counted:
+                take_stock(removed, added)
 
+            for item in formset.deleted_objects:
+                item.delete()
+            for item in instances:
                 item.save()
             formset.save_m2m()
+            if counted:
+                record_sales(order, removed, sign=-1)
+                record_sales(order, added)
 
             # After all items saved, update total_amount
-            order = form.instance
             order.total_amount = sum(item.subtotal() for item in order.items.all())
-            order.save()
+            order.save(update_fields=['total_amount'])
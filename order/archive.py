@@ -0,0 +1,119 @@
+# order/archive.py
+"""
+Archival of finished orders.
+
+Delivered and cancelled orders older than a cutoff are rarely read again, but
+they keep growing every index on the order tables. `manage.py archive_orders`
+moves them in batches into ArchivedOrder: one row per order, holding the order
+and its items as the API rendered them, zlib-compressed to about half the
+size, plus the few columns the order list filters on. The live rows are
+deleted in the same transaction.
+
+Reads fall through to the archive: the order detail view when the live
+lookup misses, and a customer's order list after their live orders (see
+OrderHistory). Archived orders are read-only, and served as they were
+stored: `?fields=` prunes them, but `?expand=` does not apply, as the
+snapshot only holds the order's own fields.
+"""
+import orjson
+from django.db import transaction
+
+from utils.fieldsets import ALL
+from utils.renderers import RawJSON, dumps
+from .models import ArchivedOrder, Order, OrderItem
+from .serializers import OrderSerializer
+
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+
+
+def archivable_orders(cutoff):
+    """Live orders finished and created before `cutoff`."""
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Archive up to `batch_size` archivable orders in one transaction and
+    return how many were moved. Orders locked by a concurrent update are
+    skipped and picked up by a later run.
+    """
+    with transaction.atomic():
+        pks = list(
+            archivable_orders(cutoff).select_for_update(skip_locked=True)
+            .order_by('created_at', 'pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return 0
+        orders = list(
+            Order.objects.filter(pk__in=pks).select_related('user').prefetch_related('items__product')
+        )
+        snapshots = OrderSerializer(orders, many=True).data
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                order_id=order.order_id, user_id=order.user_id, status=order.status,
+                payment_status=order.payment_status, total_amount=order.total_amount,
+                created_at=order.created_at, data=ArchivedOrder.pack(dumps(snapshot)),
+            )
+            for order, snapshot in zip(orders, snapshots)
+        ])
+        OrderItem.objects.filter(order__in=pks).delete()
+        Order.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def load(data):
+    """The representation stored in an ArchivedOrder's `data`."""
+    return orjson.loads(ArchivedOrder.unpack(data))
+
+
+def load_raw(data):
+    """The stored representation as RawJSON, rendered without being parsed again."""
+    return RawJSON(ArchivedOrder.unpack(data))
+
+
+def prune(data, fields=ALL):
+    """An archived representation reduced to a parsed `?fields=` tree, like SparseFieldsMixin does."""
+    if fields is ALL:
+        return data
+    if isinstance(data, list):
+        return [prune(item, fields) for item in data]
+    return {name: prune(data[name], fields[name] or ALL) for name in fields if name in data}
+
+
+class OrderHistory:
+    """
+    The live orders of a list request followed by the archived ones, as a
+    sequence Django's Paginator can slice. Live orders are rendered with
+    `render` (the view's list serializer), archived ones come from their
+    snapshot, pruned to `fields`. Each page costs one query per source it
+    touches, plus the two counts.
+    """
+
+    def __init__(self, live, archived, render, fields=ALL):
+        self.live = live
+        self.archived = archived
+        self.render = render
+        self.fields = fields
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = self.live.count(), self.archived.count()
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('OrderHistory only supports slicing.')
+        start, stop, _ = index.indices(self.count())
+        live_count = self.counts()[0]
+        rows = list(self.render(self.live[start:stop])) if start < live_count else []
+        if stop > live_count:
+            snapshots = self.archived.values_list('data', flat=True)[max(start - live_count, 0):stop - live_count]
+            rows += [prune(load(snapshot), self.fields) for snapshot in snapshots]
+        return rows
@@ -0,0 +1,58 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework import filters
+
+from account.models import User
+
+# an order id or the start of one; a full id is ORD- and 10 hex digits
+ORDER_ID_PREFIX = re.compile(r'ORD-[0-9A-F]{0,10}', re.IGNORECASE)
+ORDER_ID_LENGTH = 14
+
+# a term matching more users than this is filtered with a subquery instead
+MAX_USER_IDS = 1000
+
+
+def search_orders(queryset, terms, search_fields):
+    """
+    Filter orders (or archived orders) by search terms, each matching at
+    least one of `search_fields`, as DRF's SearchFilter does. Terms shaped
+    like an order id match order ids exactly, or by prefix, through the btree
+    index. Other terms are case-insensitive substring searches, which the
+    trigram indexes serve where pg_trgm is installed. `user__` fields are
+    searched on the users first, so each side can use its own indexes
+    instead of scanning the orders joined to their users.
+    """
+    own = [field for field in search_fields if not field.startswith('user__')]
+    user_fields = [field.removeprefix('user__') for field in search_fields if field.startswith('user__')]
+    for term in terms:
+        if 'order_id' in own and ORDER_ID_PREFIX.fullmatch(term):
+            term = term.upper()
+            if len(term) == ORDER_ID_LENGTH:
+                queryset = queryset.filter(order_id=term)
+            else:
+                queryset = queryset.filter(order_id__startswith=term)
+            continue
+
+        condition = Q(*(Q(**{f'{field}__icontains': term}) for field in own), _connector=Q.OR)
+        if user_fields:
+            users = User.objects.filter(reduce(or_, (Q(**{f'{field}__icontains': term}) for field in user_fields)))
+            user_ids = list(users.values_list('pk', flat=True)[:MAX_USER_IDS + 1])
+            if len(user_ids) > MAX_USER_IDS:
+                user_ids = users.values('pk')
+            condition |= Q(user__in=user_ids)
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+class OrderSearchFilter(filters.SearchFilter):
+    """SearchFilter for the order views' `search_fields`, searching with search_orders()."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        search_fields = self.get_search_fields(view, request)
+        if not terms or not search_fields:
+            return queryset
+        return search_orders(queryset, terms, search_fields)
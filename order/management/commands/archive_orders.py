@@ -0,0 +1,45 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from order.archive import ARCHIVABLE_STATUSES, archivable_orders, archive_batch
+from order.partitions import add_months, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        'Move delivered and cancelled orders older than some months into the compressed order archive, '
+        'in batches of one transaction each'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-months', type=int, default=12,
+                            help='Archive orders created before the start of the month this many months ago')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders that would be archived')
+
+    def handle(self, *args, **options):
+        if options['older_than_months'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--older-than-months and --batch-size must be positive.')
+        # whole months, so an archived month's partitions end up empty and can be dropped
+        month = add_months(month_start(timezone.now()), -options['older_than_months'])
+        cutoff = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+        if options['dry_run']:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(f'{count} {"/".join(ARCHIVABLE_STATUSES)} order(s) created before {cutoff:%Y-%m}.')
+            return
+
+        total = 0
+        while True:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f'  archived {total} order(s)')
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'{total} order(s) created before {cutoff:%Y-%m} archived.'))
@@ -0,0 +1,83 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from order.partitions import (
+    PARTITIONED_MODELS, add_months, create_partitions, default_partition, detach_partitions, month_start,
+    partitions,
+)
+
+
+def month(value):
+    try:
+        return date.fromisoformat(f'{value}-01')
+    except ValueError:
+        raise ValueError(f'{value!r} is not a YYYY-MM month') from None
+
+
+class Command(BaseCommand):
+    help = (
+        'Manage the monthly partitions of the order tables: create upcoming months (run daily), '
+        'detach or drop old ones, or list them'
+    )
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest='action', required=True)
+
+        create = subcommands.add_parser('create', help='Create missing partitions up to some months ahead')
+        create.add_argument('--months-ahead', type=int, default=3)
+        create.add_argument('--from', dest='first', type=month, help='First month (YYYY-MM), default this month')
+
+        detach = subcommands.add_parser(
+            'detach', help='Detach the months before a given one; they stay as standalone tables unless --drop',
+        )
+        detach.add_argument('--before', type=month, help='First month to keep (YYYY-MM)')
+        detach.add_argument('--keep-months', type=int, help='Or: keep this many months before the current one')
+        detach.add_argument('--drop', action='store_true', help='Drop the detached partitions')
+        detach.add_argument(
+            '--force', action='store_true', help='With --drop: drop partitions holding orders that were not archived',
+        )
+
+        subcommands.add_parser('list', help='Rows per partition')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Order partitions need the PostgreSQL backend.')
+        getattr(self, options['action'])(options)
+
+    def create(self, options):
+        this_month = month_start(timezone.now())
+        first = options['first'] or this_month
+        try:
+            created = create_partitions(first, add_months(this_month, options['months_ahead']))
+        except ValueError as exc:
+            raise CommandError(exc)
+        for name in created:
+            self.stdout.write(f'  created {name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} partition(s) created.'))
+
+    def detach(self, options):
+        if (options['before'] is None) == (options['keep_months'] is None):
+            raise CommandError('Give either --before or --keep-months.')
+        before = options['before'] or add_months(month_start(timezone.now()), -options['keep_months'])
+        try:
+            detached = detach_partitions(before, drop=options['drop'], force=options['force'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        for name in detached:
+            self.stdout.write(f"  {'dropped' if options['drop'] else 'detached'} {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(detached)} partition(s) before {before:%Y-%m} {'dropped' if options['drop'] else 'detached'}."
+        ))
+
+    def list(self, options):
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model in PARTITIONED_MODELS:
+                names = [name for _, name in sorted(partitions(model).items())] + [default_partition(model)]
+                self.stdout.write(model._meta.db_table)
+                for name in names:
+                    cursor.execute(f'SELECT COUNT(*) FROM {quote(name)}')
+                    self.stdout.write(f'  {name:<32} {cursor.fetchone()[0]:>12,}')
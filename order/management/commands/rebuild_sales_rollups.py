@@ -0,0 +1,27 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from order.rollups import rebuild_sales
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the DailySales rollup from the orders, for every day or a date range. '
+        'Run once after deploying the rollup, and to repair it after editing orders outside the API'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day (YYYY-MM-DD), inclusive')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day (YYYY-MM-DD), inclusive')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['start'] and options['end'] and options['start'] > options['end']:
+            raise CommandError('--start must not be after --end.')
+        started = time.perf_counter()
+        rows = rebuild_sales(options['start'], options['end'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows:,} daily sales rows in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0010_dailysales'),
+        ('product', '0006_alter_category_cat_id_alter_product_product_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='seller',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sold_items', to=settings.AUTH_USER_MODEL),
+        ),
+        # items created before the column existed
+        migrations.RunSQL(
+            'UPDATE order_orderitem SET seller_id = product_product.seller_id '
+            'FROM product_product WHERE product_product.id = order_orderitem.product_id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['seller', 'order'], name='orderitem_seller_order'),
+        ),
+    ]
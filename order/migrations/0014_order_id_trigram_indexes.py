@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from utils.trigram import create_trigram_indexes, drop_trigram_indexes
+
+# name -> (table, column), matching the UPPER(column::text) LIKE that icontains compiles to
+INDEXES = {
+    'order_order_id_trgm': ('order_order', 'order_id'),
+    'archivedorder_order_id_trgm': ('order_archivedorder', 'order_id'),
+}
+
+
+def create_indexes(apps, schema_editor):
+    create_trigram_indexes(schema_editor, INDEXES, 'order ids', 'order 0013')
+
+
+def drop_indexes(apps, schema_editor):
+    drop_trigram_indexes(schema_editor, INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0013_archivedorder'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:22
+
+import django.db.models.deletion
+import order.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0014_order_id_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(max_length=20)),
+                ('event', models.CharField(choices=[('created', 'Created'), ('status_changed', 'Status changed'), ('payment_status_changed', 'Payment status changed')], max_length=30)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed')], max_length=20)),
+                ('xid', models.BigIntegerField(db_default=order.models.CurrentTransactionId(), editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='order_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['xid', 'id'], name='orderevent_xid_id'), models.Index(fields=['user', 'xid', 'id'], name='orderevent_user_xid_id'), models.Index(fields=['order_id', 'id'], name='orderevent_order_id')],
+            },
+        ),
+    ]
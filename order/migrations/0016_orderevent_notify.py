@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    NOTIFY every order event on the `order_events` channel for the live
+    order stream (order/stream.py). Notifications are sent when the
+    inserting transaction commits, and not at all if it rolls back.
+    """
+
+    dependencies = [
+        ('order', '0015_orderevent'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE FUNCTION order_orderevent_notify() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('order_events', json_build_object(
+                    'id', NEW.id, 'order_id', NEW.order_id, 'user_id', NEW.user_id, 'event', NEW.event,
+                    'status', NEW.status, 'payment_status', NEW.payment_status, 'created_at', NEW.created_at
+                )::text);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER order_orderevent_notify AFTER INSERT ON order_orderevent
+                FOR EACH ROW EXECUTE FUNCTION order_orderevent_notify();
+            """,
+            reverse_sql="""
+            DROP TRIGGER IF EXISTS order_orderevent_notify ON order_orderevent;
+            DROP FUNCTION IF EXISTS order_orderevent_notify();
+            """,
+        ),
+    ]
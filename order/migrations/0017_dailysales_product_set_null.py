@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("order", "0016_orderevent_notify"),
+        ("product", "0006_alter_category_cat_id_alter_product_product_id_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="dailysales",
+            name="product",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="product.product",
+            ),
+        ),
+    ]
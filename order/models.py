@@ -1,6 +1,7 @@
 import uuid
+import zlib
 from decimal import Decimal, ROUND_HALF_UP
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from product.models import Product
@@ -28,9 +29,31 @@ ORDER_STATUS_CHOICES = (
     ('cancelled', 'Cancelled'),
 )
 
+def new_public_ids(model, field, prefix, count=1, also=()):
+    """
+    `count` unused random ids like ORD-1A2B3C4D5E. The partitioned order
+    tables only enforce uniqueness per partition, so they are checked across
+    all of them, with one query for the lot, and in the `also` models that
+    take ids over (the order archive).
+    """
+    while True:
+        ids = {f"{prefix}{uuid.uuid4().hex[:10].upper()}" for _ in range(count)}
+        if len(ids) == count and not any(
+            other.objects.filter(**{f'{field}__in': ids}).exists() for other in (model, *also)
+        ):
+            return list(ids)
+
+
+def line_subtotal(price, quantity):
+    """What a line of `quantity` units at unit `price` costs, rounded to the cent."""
+    return (price * quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
 class Order(models.Model):
+    """Partitioned by month of created_at in PostgreSQL, see order/partitions.py."""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
-    order_id = models.CharField(max_length=20, unique=True, editable=False)
+    # unique per partition only, so save() checks it across partitions
+    order_id = models.CharField(max_length=20, db_index=True, editable=False)
     
     delivery_note = models.TextField(blank=True, null=True)
 
@@ -46,31 +69,180 @@ class Order(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.order_id:
-            self.order_id = 'ORD-' + uuid.uuid4().hex[:10].upper()
+            self.order_id, = new_public_ids(Order, 'order_id', 'ORD-', also=[ArchivedOrder])
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            # newest first: with a LIMIT, only the top of each partition is read
+            models.Index(fields=['created_at'], name='order_created_at'),
+        ]
+
     def __str__(self):
         return f"{self.order_id} - {self.user}"
 
 
 class OrderItem(models.Model):
-    item_id = models.CharField(max_length=25, unique=True, editable=False)
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    """Partitioned like Order, by its order's created_at."""
+    # unique per partition only, so save() checks it across partitions
+    item_id = models.CharField(max_length=25, db_index=True, editable=False)
+    # a foreign key cannot reference a partitioned table by id alone
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', db_constraint=False)
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
+    # the product's seller, copied on save so seller order feeds need no join through products
+    seller = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, editable=False, related_name='sold_items', db_index=False,
+    )
     size = models.CharField(max_length=50, blank=True, null=True)
     color = models.CharField(max_length=30, blank=True, null=True)
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=12, decimal_places=2)  # price at the time of order (per unit)
+    # the order's, as the partition key
+    created_at = models.DateTimeField(editable=False)
 
     def save(self, *args, **kwargs):
         if not self.item_id:
-            self.item_id = 'ITM-' + uuid.uuid4().hex[:10].upper()
+            self.item_id, = new_public_ids(OrderItem, 'item_id', 'ITM-')
+        if self.created_at is None:
+            self.created_at = self.order.created_at
+        if self.seller_id is None and self.product is not None:
+            self.seller_id = self.product.seller_id
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            # EXISTS (... WHERE seller_id = %s AND order_id = orders.id) for the seller order feed
+            models.Index(fields=['seller', 'order'], name='orderitem_seller_order'),
+        ]
+
     def subtotal(self):
-        price = self.price or Decimal('0.00')
-        quantity = self.quantity or 0
-        return (self.price * self.quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return line_subtotal(self.price, self.quantity)
 
     def __str__(self):
         return f"{self.product} x {self.quantity}"
+
+
+class CurrentTransactionId(models.Func):
+    """The writing transaction's 64-bit id (xid8, PostgreSQL 13+) as a bigint."""
+    template = 'pg_current_xact_id()::text::bigint'
+    output_field = models.BigIntegerField()
+
+
+class OrderEvent(models.Model):
+    """
+    Append-only log of order changes, read incrementally by the change feed
+    (GET /api/orders/events/). `xid` is the writing transaction: the feed
+    orders by (xid, id) and only serves transactions older than every one
+    still running, so an event committed late never lands behind a cursor.
+    """
+    CREATED = 'created'
+    STATUS_CHANGED = 'status_changed'
+    PAYMENT_STATUS_CHANGED = 'payment_status_changed'
+    EVENT_CHOICES = (
+        (CREATED, 'Created'),
+        (STATUS_CHANGED, 'Status changed'),
+        (PAYMENT_STATUS_CHANGED, 'Payment status changed'),
+    )
+
+    # the public id; orders can be archived, the log keeps them
+    order_id = models.CharField(max_length=20)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='order_events', db_index=False)
+    event = models.CharField(max_length=30, choices=EVENT_CHOICES)
+    # the order's state after the change
+    status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES)
+    payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES)
+    xid = models.BigIntegerField(db_default=CurrentTransactionId(), editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['xid', 'id'], name='orderevent_xid_id'),
+            models.Index(fields=['user', 'xid', 'id'], name='orderevent_user_xid_id'),
+            models.Index(fields=['order_id', 'id'], name='orderevent_order_id'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} {self.event} -> {self.status}/{self.payment_status}"
+
+    @classmethod
+    def of(cls, order, event):
+        """An unsaved event recording `order`'s current state."""
+        return cls(order_id=order.order_id, user_id=order.user_id, event=event, status=order.status,
+                   payment_status=order.payment_status)
+
+    @classmethod
+    def record(cls, events):
+        """
+        Save unsaved `events`. The live order stream learns about them from
+        the NOTIFY trigger, or with the 'local' ORDER_STREAM_BROKER from this
+        process once the transaction commits.
+        """
+        events = cls.objects.bulk_create(events)
+        if events and getattr(settings, 'ORDER_STREAM_BROKER', 'postgres') == 'local':
+            from .stream import get_broker
+            transaction.on_commit(lambda: get_broker().publish(events))
+        return events
+
+
+class ArchivedOrder(models.Model):
+    """
+    A delivered or cancelled order moved out of the live tables by
+    `manage.py archive_orders` (see order/archive.py): the columns the order
+    list filters and sorts on, plus the order and its items as the API
+    rendered them at archival, as zlib-compressed JSON. PostgreSQL only
+    compresses values of rows over ~2KB, which a single order rarely is.
+    """
+    order_id = models.CharField(max_length=20, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders', db_index=False)
+    status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES)
+    payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            # a customer's order history, newest first
+            models.Index(fields=['user', '-created_at'], name='archivedorder_user_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} - {self.user} (archived)"
+
+    @staticmethod
+    def pack(content):
+        """`data` for the JSON bytes of an order's representation."""
+        return zlib.compress(content, 9)
+
+    @staticmethod
+    def unpack(data):
+        """The JSON bytes stored in `data`."""
+        return zlib.decompress(data)
+
+
+class DailySales(models.Model):
+    """
+    Sales of a product on a day, kept current by OrderSerializer on checkout
+    and cancellation (see order/rollups.py) and rebuilt from the orders by
+    `manage.py rebuild_sales_rollups`. Cancelled orders are not counted.
+    Deleting a product keeps its sales, with no product, like its order lines.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='+')
+    # copied from the product, so per-seller queries need no join
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    order_lines = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='dailysales_date_product'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'date'], name='dailysales_seller_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.revenue}"
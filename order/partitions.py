@@ -0,0 +1,164 @@
+# order/partitions.py
+"""
+Monthly range partitions of the order tables.
+
+order_order and order_orderitem are partitioned by created_at (an item's is
+its order's), one partition per UTC month named <table>_pYYYYMM, plus a
+<table>_default partition catching rows outside them. Queries filtering on
+created_at only scan the months they cover, and old months can be detached
+as standalone tables, to be dumped or dropped, instead of deleted row by row.
+
+`manage.py order_partitions create` must run ahead of time (e.g. daily from
+cron) so new orders never land in the default partition; a month that did
+collect rows there is moved out when its partition is created.
+"""
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import ArchivedOrder, Order, OrderItem
+
+PARTITIONED_MODELS = (Order, OrderItem)
+PARTITION_KEY = 'created_at'
+
+MONTH_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(first, last):
+    """First days of the months from `first` to `last`, inclusive."""
+    month, last = month_start(first), month_start(last)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat()
+
+
+def partition_name(model, month):
+    return f'{model._meta.db_table}_p{month:%Y%m}'
+
+
+def default_partition(model):
+    return f'{model._meta.db_table}_default'
+
+
+def partitions(model):
+    """{month: partition name} of the monthly partitions of `model`'s table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s',
+            [model._meta.db_table],
+        )
+        names = [name for name, in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = MONTH_SUFFIX.search(name)
+        if match:
+            months[date(int(match[1]), int(match[2]), 1)] = name
+    return months
+
+
+def create_partition(model, month):
+    """
+    Create the partition of `month`, moving any of its rows out of the
+    default partition first. Returns False if it already exists.
+    """
+    if month in partitions(model):
+        return False
+    quote = connection.ops.quote_name
+    table, name, default = (quote(model._meta.db_table), quote(partition_name(model, month)),
+                            quote(default_partition(model)))
+    key = quote(PARTITION_KEY)
+    low, high = bound(month), bound(add_months(month, 1))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [partition_name(model, month)])
+        if cursor.fetchone()[0] is not None:
+            raise ValueError(
+                f'{partition_name(model, month)} exists as a detached partition: drop it, rename it, or attach '
+                f'it again with ALTER TABLE ... ATTACH PARTITION.'
+            )
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {default} WHERE {key} >= %s AND {key} < %s)', [low, high])
+        stranded = cursor.fetchone()[0]
+        if stranded:
+            # PostgreSQL refuses a partition whose rows sit in the default one
+            cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {default}')
+        cursor.execute(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)', [low, high])
+        if stranded:
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {default} WHERE {key} >= %s AND {key} < %s RETURNING *) '
+                f'INSERT INTO {table} SELECT * FROM moved',
+                [low, high],
+            )
+            cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT')
+    return True
+
+
+def create_partitions(first, last):
+    """Create the missing partitions of every partitioned table for the months from `first` to `last`."""
+    created = []
+    for month in month_range(first, last):
+        for model in PARTITIONED_MODELS:
+            if create_partition(model, month):
+                created.append(partition_name(model, month))
+    return created
+
+
+def unarchived_orders(name):
+    """Orders in the partition (or detached table) `name` that have no ArchivedOrder row."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM {quote(name)} o WHERE NOT EXISTS '
+            f'(SELECT 1 FROM {quote(ArchivedOrder._meta.db_table)} a WHERE a.order_id = o.order_id)'
+        )
+        return cursor.fetchone()[0]
+
+
+def detach_partitions(before, drop=False, force=False):
+    """
+    Detach the partitions of the months before `before` from every
+    partitioned table, leaving them as standalone tables, or drop them.
+    Returns the partition names.
+
+    Dropping is refused with ValueError while an order partition still holds
+    orders that were not archived (`manage.py archive_orders`), unless
+    `force` is set.
+    """
+    quote = connection.ops.quote_name
+    detached = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if drop and not force:
+            unarchived = {
+                name: count for month, name in sorted(partitions(Order).items())
+                if month < month_start(before) and (count := unarchived_orders(name))
+            }
+            if unarchived:
+                raise ValueError(
+                    'Not dropping partitions with orders that were not archived: '
+                    + ', '.join(f'{name} ({count})' for name, count in unarchived.items())
+                    + '. Archive them first (manage.py archive_orders), or force the drop.'
+                )
+        for model in PARTITIONED_MODELS:
+            for month, name in sorted(partitions(model).items()):
+                if month >= month_start(before):
+                    continue
+                cursor.execute(f'ALTER TABLE {quote(model._meta.db_table)} DETACH PARTITION {quote(name)}')
+                if drop:
+                    cursor.execute(f'DROP TABLE {quote(name)}')
+                detached.append(name)
+    return detached
@@ -0,0 +1,146 @@
+# order/rollups.py
+from collections import defaultdict
+from decimal import Decimal
+
+import orjson
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from product.models import Product
+from .models import ArchivedOrder, DailySales, OrderItem
+
+
+def record_sales(order, items, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) an order's items, given as
+    (product_id, seller_id, quantity, price) tuples, to the DailySales row of
+    each product on the order's day. Runs in the caller's transaction, after
+    the product rows are locked, so the rows are taken in the same order.
+    """
+    record_sales_lines([(order.created_at, *item) for item in items], sign)
+
+
+def record_sales_lines(lines, sign=1):
+    """
+    record_sales() for the items of several orders, given as (order
+    created_at, product_id, seller_id, quantity, price) tuples, in one
+    statement. Rows are taken in (date, product) order.
+    """
+    totals = defaultdict(lambda: [None, 0, Decimal('0.00'), 0])
+    for created_at, product_id, seller_id, quantity, price in lines:
+        if product_id is None:
+            continue
+        row = totals[timezone.localdate(created_at), product_id]
+        row[0] = seller_id
+        row[1] += sign * quantity
+        row[2] += sign * price * quantity
+        row[3] += sign
+    if not totals:
+        return
+
+    rows = [(date, product_id, *totals[date, product_id]) for date, product_id in sorted(totals)]
+    table = connection.ops.quote_name(DailySales._meta.db_table)
+    # Django's upsert overwrites columns, the rollup needs them incremented
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (date, product_id, seller_id, units, revenue, order_lines) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(rows))} "
+            f"ON CONFLICT (date, product_id) DO UPDATE SET "
+            f"seller_id = EXCLUDED.seller_id, "
+            f"units = {table}.units + EXCLUDED.units, "
+            f"revenue = {table}.revenue + EXCLUDED.revenue, "
+            f"order_lines = {table}.order_lines + EXCLUDED.order_lines",
+            [value for row in rows for value in row],
+        )
+
+
+def sales_from_orders(start=None, end=None):
+    """DailySales values computed from the order items, optionally for a date range."""
+    # lines of deleted products still count, under their seller and no product
+    items = OrderItem.objects.exclude(order__status='cancelled').exclude(product=None, seller=None)
+    items = items.annotate(date=TruncDate('order__created_at'))
+    if start:
+        items = items.filter(date__gte=start)
+    if end:
+        items = items.filter(date__lte=end)
+    return (
+        items.values('date', 'product')
+        .annotate(
+            seller=Coalesce('product__seller', 'seller'),
+            units=Sum('quantity'),
+            revenue=Sum(F('price') * F('quantity')),
+            order_lines=Count('pk'),
+        )
+        .order_by()
+    )
+
+
+def sales_from_archive(start=None, end=None):
+    """
+    The same values as sales_from_orders() for archived orders, added up
+    from the items of their stored representations. Items whose product was
+    deleted since are skipped: the representation does not name the seller.
+    """
+    archived = ArchivedOrder.objects.exclude(status='cancelled').annotate(date=TruncDate('created_at'))
+    if start:
+        archived = archived.filter(date__gte=start)
+    if end:
+        archived = archived.filter(date__lte=end)
+    totals = defaultdict(lambda: [0, Decimal('0.00'), 0])
+    for date, data in archived.values_list('date', 'data').iterator():
+        for item in orjson.loads(ArchivedOrder.unpack(data))['items']:
+            row = totals[date, item['product_id']]
+            row[0] += item['quantity']
+            # the API renders prices as strings, and subtotals as numbers
+            row[1] += Decimal(item['price']) * item['quantity']
+            row[2] += 1
+
+    products = {
+        product_id: (pk, seller_id) for product_id, pk, seller_id in Product.objects.filter(
+            product_id__in={product_id for _, product_id in totals},
+        ).values_list('product_id', 'pk', 'seller_id')
+    }
+    return [
+        {'date': date, 'product': products[product_id][0], 'seller': products[product_id][1],
+         'units': units, 'revenue': revenue, 'order_lines': order_lines}
+        for (date, product_id), (units, revenue, order_lines) in totals.items() if product_id in products
+    ]
+
+
+def rebuild_sales(start=None, end=None, batch_size=5000):
+    """
+    Recompute DailySales from the live and archived orders, for all days or a
+    date range, and return the number of rows written. The table is locked against writers
+    for the duration, so checkouts that commit meanwhile wait and then apply
+    their change on top of the rebuilt rows instead of being lost.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {connection.ops.quote_name(DailySales._meta.db_table)} IN SHARE ROW EXCLUSIVE MODE'
+            )
+        stale = DailySales.objects.all()
+        if start:
+            stale = stale.filter(date__gte=start)
+        if end:
+            stale = stale.filter(date__lte=end)
+        stale.delete()
+
+        totals = {}
+        for row in [*sales_from_orders(start, end).iterator(), *sales_from_archive(start, end)]:
+            total = totals.get((row['date'], row['product']))
+            if total is None:
+                totals[row['date'], row['product']] = DailySales(
+                    date=row['date'], product_id=row['product'], seller_id=row['seller'], units=row['units'],
+                    revenue=row['revenue'], order_lines=row['order_lines'],
+                )
+            else:
+                # a day whose orders are partly archived
+                total.units += row['units']
+                total.revenue += row['revenue']
+                total.order_lines += row['order_lines']
+        rows = list(totals.values())
+        DailySales.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
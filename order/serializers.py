@@ -1,13 +1,25 @@
 from rest_framework import serializers
+from collections import Counter
+from datetime import timedelta
 from decimal import Decimal
 from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.utils import timezone
-from .models import Order, OrderItem, PAYMENT_METHOD_CHOICES
+from .models import Order, OrderEvent, OrderItem, PAYMENT_METHOD_CHOICES, line_subtotal, new_public_ids
+from .rollups import record_sales
+from .transitions import ARCHIVED, INVALID_TRANSITION, NOT_FOUND, ORDER_TRANSITIONS, UPDATED
 from product.models import Product
+from cart.models import CartItem
+from cart.quote import INVALID_COLOR, INVALID_SIZE, UNAVAILABLE, cart_items, line_problems
+from product.serializers import ProductSummarySerializer
 from drf_spectacular.utils import extend_schema_field
+from utils.fast_serializers import FastSerializer
+from utils.fieldsets import SparseFieldsMixin
+from utils.metrics import CHECKOUT_LOCK_WAIT, STOCKOUT_REJECTIONS
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product_id = serializers.SlugRelatedField(
         queryset=Product.objects.all(),
         slug_field='product_id',
@@ -15,6 +27,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
     )
     product_name = serializers.ReadOnlyField(source='product.name')
     subtotal = serializers.SerializerMethodField(read_only=True)
+    expandable_fields = {'product': (ProductSummarySerializer, {})}
 
     class Meta:
         model = OrderItem
@@ -48,8 +61,12 @@ class CustomerProfileSerializer(serializers.Serializer):
     postal_code = serializers.CharField(max_length=20, required=False)
 
 
-class OrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True)
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, required=False)
+    # order the saved cart (cart app) instead of `items`, and empty it
+    from_cart = serializers.BooleanField(
+        write_only=True, required=False, help_text="Order the lines of the saved cart instead of `items`.",
+    )
     totalPrice = serializers.DecimalField(source='total_amount', max_digits=12, decimal_places=2, read_only=True)
     user = serializers.StringRelatedField(read_only=True)
     
@@ -83,6 +100,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'totalPrice',
             'status',
             'items',
+            'from_cart',  # Input only
             'created_at',
         ]
         read_only_fields = ['order_id', 'created_at', 'totalPrice', 'customer_name', 'customer_email', 'contact_number', 'deliveryAddress', 'deliveryCity', 'deliveryPostalCode']
@@ -109,7 +127,18 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         if not self.instance:  # Only on create
-            if not data.get('items'):
+            if data.get('from_cart'):
+                if data.get('items'):
+                    raise serializers.ValidationError({"items": "Leave out items when ordering the cart."})
+                # the cart's products come with its lines, so they are not looked up one by one
+                data['items'] = [
+                    {'product': item.product, 'size': item.size, 'color': item.color, 'quantity': item.quantity,
+                     'cart_item': item.pk}
+                    for item in cart_items(self.context['request'].user)
+                ]
+                if not data['items']:
+                    raise serializers.ValidationError({"from_cart": "Your cart is empty."})
+            elif not data.get('items'):
                 raise serializers.ValidationError({"items": "At least one item is required."})
             if not data.get('profile'):
                 raise serializers.ValidationError({"profile": "Profile information is required to place an order."})
@@ -130,6 +159,7 @@ class OrderSerializer(serializers.ModelSerializer):
         user = request.user
         items_data = validated_data.pop('items', [])
         profile_data = validated_data.pop('profile', {})
+        from_cart = validated_data.pop('from_cart', False)
 
         # Update user profile information
         user.first_name = profile_data.get('first_name', user.first_name)
@@ -147,17 +177,34 @@ class OrderSerializer(serializers.ModelSerializer):
         )
 
         total = Decimal('0.00')
-
-        for item_data in items_data:
-            product = item_data.get('product')
+        sales = []
+        items = []
+
+        if any(item_data.get('quantity') <= 0 for item_data in items_data):
+            raise serializers.ValidationError("Quantity must be greater than 0.")
+        item_ids = new_public_ids(OrderItem, 'item_id', 'ITM-', len(items_data))
+
+        # Lock every product of the cart at once, in primary key order, so
+        # concurrent checkouts of overlapping carts queue instead of deadlocking
+        product_ids = sorted({item_data['product'].pk for item_data in items_data})
+        with CHECKOUT_LOCK_WAIT.time():
+            locked = {product.pk: product for product in
+                      Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk')}
+
+        for item_data, item_id in zip(items_data, item_ids):
+            product = locked[item_data['product'].pk]
             quantity = item_data.get('quantity')
 
-            # Fetch product with row-level lock
-            product = Product.objects.select_for_update().get(pk=product.id)
+            if from_cart:
+                # the checks the cart quote reports, on the locked product
+                problems = line_problems(product, item_data.get('size'), item_data.get('color'), quantity)
+                if UNAVAILABLE in problems:
+                    raise serializers.ValidationError(f"{product.name} is not available.")
+                if INVALID_SIZE in problems or INVALID_COLOR in problems:
+                    raise serializers.ValidationError(f"{product.name} does not come in the chosen size or color.")
 
-            if quantity <= 0:
-                raise serializers.ValidationError("Quantity must be greater than 0.")
             if product.stock < quantity:
+                STOCKOUT_REJECTIONS.inc()
                 raise serializers.ValidationError(
                     f"Insufficient stock for {product.name}. Available: {product.stock}"
                 )
@@ -165,20 +212,31 @@ class OrderSerializer(serializers.ModelSerializer):
             price = product.price
             product.stock -= quantity
             product.sold += quantity
-            product.save()
+            product.save(update_fields=['stock', 'sold', 'updated_at'])
 
-            order_item = OrderItem.objects.create(
+            order_item = OrderItem(
+                item_id=item_id,
                 order=order,
                 product=product,
+                seller_id=product.seller_id,
                 size=item_data.get('size'),
                 color=item_data.get('color'),
                 quantity=quantity,
                 price=price,
+                created_at=order.created_at,
             )
+            items.append(order_item)
             total += order_item.subtotal()
+            sales.append((product.pk, product.seller_id, quantity, price))
 
+        OrderItem.objects.bulk_create(items)
+        if from_cart:
+            CartItem.objects.filter(pk__in=[item_data['cart_item'] for item_data in items_data]).delete()
+        record_sales(order, sales)
         order.total_amount = total.quantize(Decimal('0.01'))
-        order.save()
+        # created_at takes PostgreSQL straight to the order's partition
+        Order.objects.filter(pk=order.pk, created_at=order.created_at).update(total_amount=order.total_amount)
+        OrderEvent.record([OrderEvent.of(order, OrderEvent.CREATED)])
 
         return order
 
@@ -196,6 +254,16 @@ class OrderSerializer(serializers.ModelSerializer):
         if not user or (not user.is_staff and getattr(user, 'role', None) != 'admin'):
             raise serializers.ValidationError("You don't have permission to modify this order.")
         
+        # Re-read the statuses under a row lock, so two concurrent cancellations
+        # cannot both restore the stock
+        try:
+            instance.status, instance.payment_status = Order.objects.select_for_update().values_list(
+                'status', 'payment_status',
+            ).get(pk=instance.pk, created_at=instance.created_at)
+        except Order.DoesNotExist:
+            # archived (see order/archive.py) since it was looked up
+            raise serializers.ValidationError("This order has been archived and cannot be modified.")
+
         # Prevent changing cancelled orders
         if instance.status == 'cancelled':
             raise serializers.ValidationError("This order has been cancelled and cannot be modified.")
@@ -210,16 +278,30 @@ class OrderSerializer(serializers.ModelSerializer):
         new_payment_status = validated_data.get('payment_status', instance.payment_status)
         # --- Restore stock if order is cancelled ---
         if new_status == 'cancelled' and instance.status != 'cancelled':
-            for item in instance.items.all():
-                product = item.product
-                if product:
-                    product.stock += item.quantity
-                    product.save()
+            items = list(instance.items.exclude(product=None).values_list('product', 'product__seller', 'quantity', 'price'))
+            quantities = Counter()
+            for product_id, _, quantity, _ in items:
+                quantities[product_id] += quantity
+            # In-place updates in the same lock order as create(); a product
+            # read earlier without a lock would overwrite concurrent checkouts
+            for product_id in sorted(quantities):
+                Product.objects.filter(pk=product_id).update(
+                    stock=F('stock') + quantities[product_id],
+                    sold=Greatest(F('sold') - quantities[product_id], 0),
+                )
+            record_sales(instance, items, sign=-1)
+
+        events = []
+        if new_status != instance.status:
+            events.append(OrderEvent.STATUS_CHANGED)
+        if new_payment_status != instance.payment_status:
+            events.append(OrderEvent.PAYMENT_STATUS_CHANGED)
 
         # --- Update the order status ---
         instance.status = new_status
         instance.payment_status = new_payment_status
         instance.save()
+        OrderEvent.record([OrderEvent.of(instance, event) for event in events])
 
         return instance
 
@@ -239,3 +321,141 @@ class OrderSerializer(serializers.ModelSerializer):
             data.pop('payment_status', None)
 
         return data
+
+
+# ---------------- Read-only fast paths ----------------
+
+class FastOrderItemSerializer(FastSerializer):
+    serializer_class = OrderItemSerializer
+    computed = {
+        'subtotal': (('price', 'quantity'), line_subtotal),
+    }
+
+
+class FastOrderSerializer(FastSerializer):
+    serializer_class = OrderSerializer
+    lookups = {
+        'user': 'user__email',
+        'contact_number': 'user__phone',
+        'deliveryAddress': 'user__address',
+        'deliveryCity': 'user__city',
+        'deliveryPostalCode': 'user__postal_code',
+    }
+    computed = {
+        'customer_name': (('user__first_name', 'user__last_name'), lambda first, last: f"{first} {last}"),
+    }
+    many = {'items': FastOrderItemSerializer}
+
+
+# ---------------- Bulk status transitions ----------------
+
+# order ids per bulk request
+MAX_BULK_ORDERS = 500
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.CharField(max_length=20), allow_empty=False, max_length=MAX_BULK_ORDERS,
+    )
+    status = serializers.ChoiceField(
+        choices=list(ORDER_TRANSITIONS),
+        help_text="; ".join(f"`{status}` from {', '.join(allowed)}" for status, allowed in ORDER_TRANSITIONS.items()),
+    )
+
+
+class BulkStatusResultSerializer(serializers.Serializer):
+    order_id = serializers.CharField()
+    result = serializers.ChoiceField(choices=[UPDATED, INVALID_TRANSITION, ARCHIVED, NOT_FOUND])
+    status = serializers.CharField(allow_null=True, help_text="The order's status after the request.")
+
+
+class BulkStatusReportSerializer(serializers.Serializer):
+    status = serializers.CharField()
+    updated = serializers.IntegerField()
+    results = BulkStatusResultSerializer(many=True)
+
+
+# ---------------- Change feed ----------------
+
+# events per feed page
+MAX_EVENTS_PAGE = 1000
+
+
+class OrderEventQuerySerializer(serializers.Serializer):
+    after = serializers.IntegerField(
+        min_value=0, default=0, help_text="Last event `id` already seen (the previous page's `meta.next`); 0 to start.",
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_EVENTS_PAGE, default=100)
+    order_id = serializers.CharField(max_length=20, required=False, help_text="Only the events of this order.")
+
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderEvent
+        fields = ['id', 'order_id', 'event', 'status', 'payment_status', 'created_at']
+
+    def to_representation(self, instance):
+        """Hide payment data from non-admin users, as OrderSerializer does."""
+        data = super().to_representation(instance)
+        user = self.context['request'].user if 'request' in self.context else None
+        if not user or (not user.is_staff and getattr(user, 'role', None) != 'admin'):
+            data.pop('payment_status', None)
+        return data
+
+
+class OrderEventPageSerializer(serializers.Serializer):
+    events = OrderEventSerializer(many=True)
+    next = serializers.IntegerField(help_text="Pass as `after` to get the following events.")
+    has_more = serializers.BooleanField(help_text="More events are available right away.")
+    held_back = serializers.BooleanField(
+        help_text="Committed events are waiting for an older transaction, still running, to finish.",
+    )
+    retry_after = serializers.IntegerField(
+        allow_null=True, help_text="Seconds to wait before polling again when `held_back`, else null.",
+    )
+
+
+class OrderStreamTokenSerializer(serializers.Serializer):
+    token = serializers.CharField(help_text="Pass as `?token=` to GET /api/orders/stream/.")
+    expires_in = serializers.IntegerField(help_text="Seconds the token can open a stream for.")
+
+
+# ---------------- Sales analytics ----------------
+
+SALES_GROUPS = ('day', 'product', 'seller', 'category')
+
+
+class SalesQuerySerializer(serializers.Serializer):
+    group_by = serializers.ChoiceField(choices=SALES_GROUPS, default='day')
+    start = serializers.DateField(required=False, help_text="First day, inclusive. Defaults to 29 days before `end`.")
+    end = serializers.DateField(required=False, help_text="Last day, inclusive. Defaults to today.")
+    seller = serializers.CharField(required=False, help_text="Seller uid (admin only; sellers always see their own sales).")
+
+    def validate(self, data):
+        data.setdefault('end', timezone.localdate())
+        data.setdefault('start', data['end'] - timedelta(days=29))
+        if data['start'] > data['end']:
+            raise serializers.ValidationError({"start": "Must not be after end."})
+        return data
+
+
+class SalesRowSerializer(serializers.Serializer):
+    key = serializers.CharField(allow_null=True, help_text="Date, product_id, seller uid or category slug, per `group_by`.")
+    label = serializers.CharField(allow_null=True)
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    order_lines = serializers.IntegerField()
+
+
+class SalesTotalsSerializer(serializers.Serializer):
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    order_lines = serializers.IntegerField()
+
+
+class SalesReportSerializer(serializers.Serializer):
+    group_by = serializers.ChoiceField(choices=SALES_GROUPS)
+    start = serializers.DateField()
+    end = serializers.DateField()
+    totals = SalesTotalsSerializer()
+    rows = SalesRowSerializer(many=True)
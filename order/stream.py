@@ -0,0 +1,193 @@
+# order/stream.py
+"""
+Fan-out of order events to the live order stream (GET /api/orders/stream/).
+
+Every OrderEvent insert sends a NOTIFY on ORDER_EVENTS_CHANNEL from a trigger
+(migration 0016), delivered when its transaction commits. Each worker process
+holds a single LISTEN connection, opened with its first stream, and hands the
+notifications to the queues of the streams it serves, so open streams cost no
+queries while their orders do not change.
+
+With ORDER_STREAM_BROKER = 'local' events are handed over in-process by
+OrderEvent.record() instead, for tests (whose transactions never commit) and
+single-process setups.
+"""
+import asyncio
+import logging
+
+import orjson
+from django.conf import settings
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+
+from .models import OrderEvent
+
+logger = logging.getLogger(__name__)
+
+# the channel the migration 0016 trigger notifies
+ORDER_EVENTS_CHANNEL = 'order_events'
+# notifications a stream may have waiting; a slower client is disconnected and resumes from Last-Event-ID
+QUEUE_SIZE = 100
+# seconds between attempts to reconnect the listener
+RECONNECT_DELAY = 5
+
+
+class Subscription:
+    """The queue of one stream, receiving the events of `user_id`'s orders, or of all orders for None."""
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+
+    def matches(self, event):
+        return self.user_id is None or event.user_id == self.user_id
+
+    def put(self, event):
+        if self.closed:
+            return
+        if self.queue.full():
+            self.close()
+            return
+        self.queue.put_nowait(event)
+
+    def close(self):
+        """End the stream: queued events are dropped and the reader gets None."""
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    def call(self, method, *args):
+        # subscriptions live on their stream's event loop; brokers may call from other threads
+        try:
+            self.loop.call_soon_threadsafe(method, *args)
+        except RuntimeError:  # loop closed
+            pass
+
+
+class Broker:
+    def __init__(self):
+        self.subscriptions = set()
+
+    async def subscribe(self, user_id=None):
+        subscription = Subscription(user_id)
+        self.subscriptions.add(subscription)
+        await self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+
+    async def start(self):
+        pass
+
+    def deliver(self, event):
+        for subscription in list(self.subscriptions):
+            if subscription.matches(event):
+                subscription.call(subscription.put, event)
+
+
+class LocalBroker(Broker):
+    """Delivers the events OrderEvent.record() saved in this process."""
+
+    def publish(self, events):
+        for event in events:
+            self.deliver(event)
+
+
+class PostgresBroker(Broker):
+    """Delivers the events notified on ORDER_EVENTS_CHANNEL, from one listening connection per process."""
+
+    def __init__(self):
+        super().__init__()
+        self.task = None
+
+    async def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.listen())
+
+    async def listen(self):
+        while True:
+            try:
+                await self.listen_once()
+            except Exception:
+                # including failures to start (driver missing, bad settings): never leave streams waiting silently
+                logger.exception('Order event listener failed')
+            # events notified meanwhile are lost: close the streams so their clients replay them
+            for subscription in list(self.subscriptions):
+                subscription.call(subscription.close)
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def listen_once(self):
+        """LISTEN with the driver Django uses: psycopg 3 if installed, else psycopg2."""
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        params = {
+            key: value for key, value in connection.get_connection_params().items()
+            if key not in ('cursor_factory', 'context')
+        }
+        if is_psycopg3:
+            await self.listen_psycopg(params)
+        else:
+            await self.listen_psycopg2(params)
+
+    async def listen_psycopg(self, params):
+        import psycopg
+
+        conn = await psycopg.AsyncConnection.connect(**params, autocommit=True)
+        async with conn:
+            await conn.execute(f'LISTEN {ORDER_EVENTS_CHANNEL}')
+            async for notify in conn.notifies():
+                self.deliver(event_from_payload(notify.payload))
+
+    async def listen_psycopg2(self, params):
+        import psycopg2
+
+        loop = asyncio.get_running_loop()
+        conn = await loop.run_in_executor(None, lambda: psycopg2.connect(**params))
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {ORDER_EVENTS_CHANNEL}')
+            # wake up when the socket has data, instead of a thread blocked on it
+            readable = asyncio.Event()
+            fileno = conn.fileno()
+            loop.add_reader(fileno, readable.set)
+            try:
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    conn.poll()  # raises once the server is gone
+                    while conn.notifies:
+                        self.deliver(event_from_payload(conn.notifies.pop(0).payload))
+            finally:
+                loop.remove_reader(fileno)
+        finally:
+            conn.close()
+
+
+def event_from_payload(payload):
+    """The unsaved OrderEvent of a notification sent by the trigger."""
+    data = orjson.loads(payload)
+    return OrderEvent(
+        id=data['id'], order_id=data['order_id'], user_id=data['user_id'], event=data['event'],
+        status=data['status'], payment_status=data['payment_status'],
+        created_at=parse_datetime(data['created_at']),
+    )
+
+
+BROKERS = {
+    'postgres': PostgresBroker,
+    'local': LocalBroker,
+}
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = BROKERS[getattr(settings, 'ORDER_STREAM_BROKER', 'postgres')]()
+    return _broker
@@ -1,3 +1,888 @@
-from django.test import TestCase
+import asyncio
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from account.models import User
+from account.revocation import revoke_all_tokens_for_user
+from account.tokens import OrderStreamToken
+from account.views import get_tokens_for_user
+from product.models import Category, Product
+from utils.fieldsets import parse_fieldset
+from utils.helpers import Response
+from utils.renderers import dumps
+from . import stream
+from .archive import archive_batch, load
+from .filters import search_orders
+from .models import ArchivedOrder, DailySales, Order, OrderEvent, OrderItem
+from .rollups import rebuild_sales, record_sales
+from .serializers import FastOrderSerializer, OrderSerializer
+from .transitions import ARCHIVED, INVALID_TRANSITION, NOT_FOUND, UPDATED, transition_orders
+
+# (?fields=, ?expand=) combinations compared besides the full output
+ORDER_FIELDSETS = [
+    ('', ''), ('order_id,totalPrice,items.quantity', ''), ('order_id,items.subtotal', 'items.product'),
+    ('', 'items.product'), ('customer_name,contact_number,deliveryPostalCode', ''), ('items.product_name', ''),
+]
+
+
+class FastOrderSerializerParityTestCase(TestCase):
+    """FastOrderSerializer returns exactly what OrderSerializer does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(email='seller@example.com', role='seller', first_name='Sam')
+        # no phone or postal code
+        cls.customer = User.objects.create_user(
+            email='customer@example.com', role='customer', first_name='Cam', last_name='Customer',
+            address='1 Main St', city='Dhaka',
+        )
+        cls.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+        honey = Product.objects.create(name='Honey', price=Decimal('12.50'), stock=10, seller=seller, thumbnail=None)
+        gone = Product.objects.create(name='Gone', price=Decimal('3.00'), stock=10, seller=seller)
+
+        order = Order.objects.create(user=cls.customer, payment_method='cod', total_amount=Decimal('31.33'))
+        OrderItem.objects.create(order=order, product=honey, quantity=2, price=Decimal('12.50'), size='1L', color='Golden')
+        OrderItem.objects.create(order=order, product=gone, quantity=3, price=Decimal('2.11'))
+        # the line keeps its price, the product is no more
+        gone.delete()
+        # no items
+        Order.objects.create(user=cls.customer, payment_method='cod', delivery_note='Leave at the door')
+
+    def test_orders(self):
+        queryset = Order.objects.select_related('user').prefetch_related('items__product').order_by('pk')
+        for fields, expand in ORDER_FIELDSETS:
+            with self.subTest(fields=fields, expand=expand):
+                fieldset = {'fields': parse_fieldset(fields), 'expand': parse_fieldset(expand)}
+                expected = OrderSerializer(queryset, many=True, **fieldset).data
+                self.assertEqual(len(expected), 2)
+                self.assertEqual(dumps(expected), dumps(FastOrderSerializer(queryset, **fieldset).data))
+
+    def test_list_endpoint(self):
+        client = APIClient()
+        # customers page through live and archived orders, admins through live ones only
+        for user in (self.customer, self.admin):
+            client.force_authenticate(user)
+            for fields, expand in ORDER_FIELDSETS:
+                params = {'fields': fields, 'expand': expand}
+                with self.subTest(user=user.email, **params):
+                    with override_settings(FAST_SERIALIZERS=False):
+                        expected = client.get('/api/orders/', params)
+                    with override_settings(FAST_SERIALIZERS=True):
+                        actual = client.get('/api/orders/', params)
+                    self.assertEqual(expected.status_code, 200)
+                    self.assertEqual(len(expected.json()['data']), 2)
+                    self.assertEqual(expected.json(), actual.json())
+
+
+class SellerOrderScopeTestCase(TestCase):
+    """Sellers see the orders with their products in them, and only their own lines."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sam = User.objects.create_user(email='sam@example.com', role='seller', first_name='Sam')
+        sue = User.objects.create_user(email='sue@example.com', role='seller', first_name='Sue')
+        cls.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+        customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        honey = Product.objects.create(name='Honey', price=Decimal('12.50'), stock=10, seller=cls.sam)
+        jam = Product.objects.create(name='Jam', price=Decimal('3.00'), stock=10, seller=sue)
+        cls.orders = {}
+        for name, products in [('mixed', [honey, jam]), ('sue_only', [jam]), ('sam_only', [honey])]:
+            order = cls.orders[name] = Order.objects.create(user=customer, payment_method='cod')
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def lines(self, order):
+        return sorted(item['product_name'] for item in order['items'])
+
+    def test_list(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), override_settings(FAST_SERIALIZERS=fast):
+                orders = self.client_for(self.sam).get('/api/orders/').json()['data']
+                self.assertEqual(
+                    sorted((order['order_id'], tuple(self.lines(order))) for order in orders),
+                    sorted([(self.orders['mixed'].order_id, ('Honey',)), (self.orders['sam_only'].order_id, ('Honey',))]),
+                )
+                orders = self.client_for(self.admin).get('/api/orders/').json()['data']
+                self.assertEqual(sorted(len(order['items']) for order in orders), [1, 1, 2])
+
+    def test_detail(self):
+        client = self.client_for(self.sam)
+        response = client.get(f"/api/orders/{self.orders['mixed'].order_id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lines(response.json()['data']), ['Honey'])
+        self.assertEqual(client.get(f"/api/orders/{self.orders['sue_only'].order_id}/").status_code, 404)
+
+        response = self.client_for(self.admin).get(f"/api/orders/{self.orders['mixed'].order_id}/")
+        self.assertEqual(self.lines(response.json()['data']), ['Honey', 'Jam'])
+
+
+class ArchivedOrderDetailTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+        customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        seller = User.objects.create_user(email='seller@example.com', role='seller', first_name='Sam')
+        product = Product.objects.create(name='Ünïcode Honey', price=Decimal('12.50'), stock=10, seller=seller)
+        cls.order = Order.objects.create(user=customer, payment_method='cod', total_amount=Decimal('25.00'), status='delivered')
+        OrderItem.objects.create(order=cls.order, product=product, quantity=2, price=Decimal('12.50'))
+        archive_batch(timezone.now() + timedelta(days=1), 10)
+
+    def test_snapshot_is_rendered_as_stored(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get(f'/api/orders/{self.order.order_id}/')
+        self.assertEqual(response.status_code, 200)
+
+        data = load(ArchivedOrder.objects.get(order_id=self.order.order_id).data)
+        expected = JSONRenderer().render(Response(data=data, message="Order retrieved successfully").data)
+        self.assertEqual(response.content, expected)
+        self.assertEqual(response.json()['data']['items'][0]['product_name'], 'Ünïcode Honey')
+
+
+class OrderArchiveTestCase(TestCase):
+    """Archived orders: moved by archive_batch, then read through the order endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+        cls.sam = User.objects.create_user(email='sam@example.com', role='seller', first_name='Sam')
+        cls.sue = User.objects.create_user(email='sue@example.com', role='seller', first_name='Sue')
+        cls.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        other = User.objects.create_user(email='other@example.com', role='customer', first_name='Olga')
+        honey = Product.objects.create(name='Honey', price=Decimal('12.50'), stock=10, seller=cls.sam)
+        jam = Product.objects.create(name='Jam', price=Decimal('3.00'), stock=10, seller=cls.sue)
+
+        def order(user, products, status, days_ago):
+            order = Order.objects.create(user=user, payment_method='cod', status=status)
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+            created_at = timezone.now() - timedelta(days=days_ago)
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            OrderItem.objects.filter(order=order).update(created_at=created_at)
+            return order.order_id
+
+        # newest first, as the list returns them
+        cls.live = [order(cls.customer, [honey], 'pending', days) for days in (1, 2, 3)]
+        cls.archived = {
+            'mixed': order(cls.customer, [honey, jam], 'delivered', 30),
+            'jam': order(cls.customer, [jam], 'cancelled', 40),
+            'honey': order(cls.customer, [honey], 'delivered', 50),
+        }
+        cls.others = order(other, [honey], 'delivered', 35)
+        cutoff = timezone.now() - timedelta(days=7)
+        cls.batches = [archive_batch(cutoff, 3) for _ in range(3)]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def lines(self, order):
+        return sorted(item['product_name'] for item in order['items'])
+
+    def test_archive_batch(self):
+        self.assertEqual(self.batches, [3, 1, 0])
+        archived = [*self.archived.values(), self.others]
+        self.assertEqual(set(ArchivedOrder.objects.values_list('order_id', flat=True)), set(archived))
+        self.assertFalse(Order.objects.filter(order_id__in=archived).exists())
+        self.assertFalse(OrderItem.objects.filter(order__order_id__in=archived).exists())
+        self.assertEqual(Order.objects.count(), 3)
+
+        row = ArchivedOrder.objects.get(order_id=self.archived['jam'])
+        self.assertEqual((row.user, row.status, row.total_amount), (self.customer, 'cancelled', Decimal('0.00')))
+        snapshot = load(row.data)
+        self.assertEqual(snapshot['order_id'], self.archived['jam'])
+        self.assertEqual(self.lines(snapshot), ['Jam'])
+
+    def test_detail(self):
+        url = f"/api/orders/{self.archived['mixed']}/"
+        response = self.client_for(self.admin).get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lines(response.json()['data']), ['Honey', 'Jam'])
+
+        sam = self.client_for(self.sam)
+        self.assertEqual(self.lines(sam.get(url).json()['data']), ['Honey'])
+        self.assertEqual(self.lines(sam.get(f"/api/orders/{self.archived['honey']}/").json()['data']), ['Honey'])
+        self.assertEqual(sam.get(f"/api/orders/{self.archived['jam']}/").status_code, 404)
+        self.assertEqual(self.lines(self.client_for(self.sue).get(url).json()['data']), ['Jam'])
+
+        self.assertEqual(self.client_for(self.customer).get(url).status_code, 403)
+        self.assertEqual(self.client_for(self.admin).get('/api/orders/ORD-MISSING/').status_code, 404)
+
+    def test_archived_orders_are_read_only(self):
+        response = self.client_for(self.admin).patch(
+            f"/api/orders/{self.archived['mixed']}/", {'status': 'pending'}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ArchivedOrder.objects.get(order_id=self.archived['mixed']).status, 'delivered')
+
+    def test_detail_fields(self):
+        for user in (self.admin, self.sam):
+            with self.subTest(user=user.email):
+                response = self.client_for(user).get(
+                    f"/api/orders/{self.archived['mixed']}/", {'fields': 'order_id,items.product_name'},
+                )
+                self.assertEqual(response.json()['data'], {
+                    'order_id': self.archived['mixed'],
+                    'items': [{'product_name': 'Honey'}, {'product_name': 'Jam'}] if user == self.admin
+                    else [{'product_name': 'Honey'}],
+                })
+
+    def test_expand_does_not_apply_to_archived_orders(self):
+        client = self.client_for(self.admin)
+        live = client.get(f'/api/orders/{self.live[0]}/', {'expand': 'items.product'}).json()['data']
+        self.assertEqual(live['items'][0]['product']['name'], 'Honey')
+
+        url = f"/api/orders/{self.archived['honey']}/"
+        self.assertEqual(client.get(url, {'expand': 'items.product'}).content, client.get(url).content)
+
+        orders = self.client_for(self.customer).get('/api/orders/', {'expand': 'items.product'}).json()['data']
+        self.assertEqual(['product' in order['items'][0] for order in orders], [True] * 3 + [False] * 3)
+
+    def test_list_pages_through_live_then_archived_orders(self):
+        client = self.client_for(self.customer)
+        expected = self.live + list(self.archived.values())
+        seen = []
+        for page in (1, 2, 3):
+            body = client.get('/api/orders/', {'limit': 2, 'page': page}).json()
+            self.assertEqual(body['meta'], {'total': 6, 'page': page, 'limit': 2, 'totalPages': 3})
+            seen += [order['order_id'] for order in body['data']]
+        self.assertEqual(seen, expected)
+
+        body = client.get('/api/orders/').json()
+        self.assertEqual([order['order_id'] for order in body['data']], expected)
+        self.assertEqual(self.lines(body['data'][3]), ['Honey', 'Jam'])
+
+    def test_list_fields(self):
+        body = self.client_for(self.customer).get('/api/orders/', {'fields': 'order_id,status'}).json()
+        self.assertEqual(body['data'][2:4], [
+            {'order_id': self.live[2], 'status': 'pending'},
+            {'order_id': self.archived['mixed'], 'status': 'delivered'},
+        ])
+
+    def test_list_filters_apply_to_archived_orders(self):
+        body = self.client_for(self.customer).get('/api/orders/', {'status': 'cancelled'}).json()
+        self.assertEqual([order['order_id'] for order in body['data']], [self.archived['jam']])
+
+    def test_only_customers_list_archived_orders(self):
+        for user in (self.admin, self.sam):
+            with self.subTest(user=user.email):
+                orders = self.client_for(user).get('/api/orders/').json()['data']
+                self.assertEqual({order['order_id'] for order in orders}, set(self.live))
+
+
+class OrderSearchTestCase(TestCase):
+    """
+    search_orders(), through the order list. Substring terms are served by
+    trigram indexes where pg_trgm is installed, and scan the tables where it
+    is not (as on servers without the contrib package): the results are the
+    same either way.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+        cls.cam = User.objects.create_user(
+            email='cam@example.com', role='customer', first_name='Cam', last_name='Hill',
+        )
+        olga = User.objects.create_user(email='olga@shop.test', role='customer', first_name='Olga', last_name='Camden')
+        for user, order_id, status in [
+            (cls.cam, 'ORD-00000000A1', 'pending'), (cls.cam, 'ORD-00000000A2', 'delivered'),
+            (olga, 'ORD-00000000B1', 'pending'), (olga, 'ORD-000000001A', 'pending'),
+        ]:
+            order = Order.objects.create(user=user, payment_method='cod', status=status)
+            Order.objects.filter(pk=order.pk).update(order_id=order_id)
+        # ORD-00000000A2 is only in the archive now
+        archive_batch(timezone.now() + timedelta(days=1), 10)
+
+    def search(self, term, user=None):
+        client = APIClient()
+        client.force_authenticate(user or self.admin)
+        response = client.get('/api/orders/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return sorted(order['order_id'] for order in response.json()['data'])
+
+    def test_order_ids(self):
+        self.assertEqual(self.search('ORD-00000000A1'), ['ORD-00000000A1'])
+        # case-insensitive, and exact: a full id is not a prefix of longer ones
+        self.assertEqual(self.search('ord-00000000b1'), ['ORD-00000000B1'])
+        self.assertEqual(self.search('ORD-00000000'), ['ORD-000000001A', 'ORD-00000000A1', 'ORD-00000000B1'])
+        self.assertEqual(self.search('ORD-0000000'), ['ORD-000000001A', 'ORD-00000000A1', 'ORD-00000000B1'])
+        # a prefix, not a substring
+        self.assertEqual(self.search('ORD-1A'), [])
+        self.assertEqual(self.search('ORD-00000000C1'), [])
+
+    def test_order_id_substrings(self):
+        # not shaped like an order id: a substring search on the id
+        self.assertEqual(self.search('1a'), ['ORD-000000001A'])
+        self.assertEqual(self.search('0a'), ['ORD-00000000A1'])
+
+    def test_archived_orders(self):
+        self.assertEqual(self.search('ORD-00000000A2', self.cam), ['ORD-00000000A2'])
+        self.assertEqual(self.search('ORD-00000000', self.cam), ['ORD-00000000A1', 'ORD-00000000A2'])
+        self.assertEqual(self.search('ORD-00000000A2'), [])
+
+    def test_users(self):
+        self.assertEqual(self.search('olga'), ['ORD-000000001A', 'ORD-00000000B1'])
+        self.assertEqual(self.search('SHOP.TEST'), ['ORD-000000001A', 'ORD-00000000B1'])
+        # first name of one user, last name of the other
+        self.assertEqual(self.search('cam'), ['ORD-000000001A', 'ORD-00000000A1', 'ORD-00000000B1'])
+        self.assertEqual(self.search('nobody'), [])
+
+    def test_terms_must_all_match(self):
+        self.assertEqual(self.search('cam hill'), ['ORD-00000000A1'])
+        self.assertEqual(self.search('cam ORD-00000000B'), ['ORD-00000000B1'])
+        self.assertEqual(self.search('olga ORD-00000000A1'), [])
+
+    def test_many_matching_users_use_a_subquery(self):
+        with mock.patch('order.filters.MAX_USER_IDS', 1), CaptureQueriesContext(connection) as queries:
+            orders = list(search_orders(Order.objects.all(), ['cam'], ['order_id', 'user__first_name', 'user__last_name']))
+        self.assertIn('IN (SELECT', queries[-1]['sql'])
+        self.assertEqual(sorted(order.order_id for order in orders), ['ORD-000000001A', 'ORD-00000000A1', 'ORD-00000000B1'])
+
+
+class PartitionCommandTestCase(TestCase):
+    """order_partitions create / detach / list, on a month in the past."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('order_partitions', 'create', '--from', '2020-01', '--months-ahead', '0', stdout=StringIO())
+        customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        seller = User.objects.create_user(email='seller@example.com', role='seller', first_name='Sam')
+        product = Product.objects.create(name='Honey', price=Decimal('12.50'), stock=10, seller=seller)
+        cls.order = Order.objects.create(user=customer, payment_method='cod', status='delivered')
+        OrderItem.objects.create(order=cls.order, product=product, quantity=1, price=product.price)
+        january = datetime(2020, 1, 15, tzinfo=dt_timezone.utc)
+        Order.objects.filter(pk=cls.order.pk).update(created_at=january)
+        OrderItem.objects.filter(order=cls.order).update(created_at=january)
+
+    def setUp(self):
+        self.run_deferred_checks()
+
+    def run_deferred_checks(self):
+        # run the foreign key checks of the rows written so far, as their
+        # commit would: PostgreSQL won't drop a table with checks pending
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    def command(self, *args):
+        out = StringIO()
+        call_command('order_partitions', *args, stdout=out)
+        return out.getvalue()
+
+    def test_list(self):
+        out = self.command('list')
+        self.assertRegex(out, r'order_order_p202001 +1\n')
+        self.assertRegex(out, r'order_orderitem_p202001 +1\n')
+
+    def test_detach_keeps_the_tables(self):
+        out = self.command('detach', '--before', '2020-02')
+        self.assertIn('detached order_order_p202001', out)
+        self.assertNotIn('order_order_p202001', self.command('list'))
+        self.assertFalse(Order.objects.filter(pk=self.order.pk).exists())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM order_order_p202001')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_drop_refuses_unarchived_orders(self):
+        with self.assertRaisesMessage(CommandError, 'order_order_p202001 (1)'):
+            self.command('detach', '--before', '2020-02', '--drop')
+        self.assertIn('order_order_p202001', self.command('list'))
+
+        self.assertEqual(archive_batch(datetime(2020, 2, 1, tzinfo=dt_timezone.utc), 10), 1)
+        self.run_deferred_checks()
+        out = self.command('detach', '--before', '2020-02', '--drop')
+        self.assertIn('dropped order_order_p202001', out)
+        self.assertIn('dropped order_orderitem_p202001', out)
+        self.assertTrue(ArchivedOrder.objects.filter(order_id=self.order.order_id).exists())
+
+    def test_force_drops_unarchived_orders(self):
+        self.command('detach', '--before', '2020-02', '--drop', '--force')
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('order_order_p202001')")
+            self.assertIsNone(cursor.fetchone()[0])
+        self.assertFalse(Order.objects.filter(pk=self.order.pk).exists())
+
+
+class OrderAdminTestCase(TestCase):
+    """Orders created and changed in the admin keep stock and the sales rollup in step."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@example.com', first_name='Ada', password='pw')
+        cls.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        seller = User.objects.create_user(email='seller@example.com', role='seller', first_name='Sam')
+        cls.product = Product.objects.create(name='Honey', price=Decimal('12.50'), stock=10, seller=seller)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def post(self, order, status='pending', lines=()):
+        """Submit the add (order=None) or change form with inline `lines` of {field: value}."""
+        initial = sum(1 for line in lines if line.get('id'))
+        data = {
+            'status': status, 'payment_status': 'pending', 'payment_method': 'cod',
+            'items-TOTAL_FORMS': len(lines), 'items-INITIAL_FORMS': initial,
+            'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+        }
+        for index, line in enumerate(lines):
+            line = {'product': self.product.pk, 'quantity': 2, 'price': '12.50', **line}
+            data.update({f'items-{index}-{field}': value for field, value in line.items()})
+        if order is None:
+            data['user'] = self.customer.pk
+            return self.client.post('/admin/order/order/add/', data)
+        for index in range(len(lines)):
+            data[f'items-{index}-order'] = order.pk
+        return self.client.post(f'/admin/order/order/{order.pk}/change/', data)
+
+    def create(self):
+        response = self.post(None, lines=[{}])
+        self.assertEqual(response.status_code, 302)
+        return Order.objects.get(user=self.customer)
+
+    def assertStock(self, stock, sold, units):
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.sold), (stock, sold))
+        self.assertEqual(sum(DailySales.objects.filter(product=self.product).values_list('units', flat=True)), units)
+
+    def test_created_order_takes_stock_and_records_sales(self):
+        order = self.create()
+        self.assertEqual(order.total_amount, Decimal('25.00'))
+        self.assertStock(8, 2, 2)
+        self.assertEqual(DailySales.objects.get(product=self.product).revenue, Decimal('25.00'))
+        self.assertTrue(OrderEvent.objects.filter(order_id=order.order_id, event=OrderEvent.CREATED).exists())
+
+    def test_changed_and_deleted_lines_adjust_stock_and_sales(self):
+        order = self.create()
+        item = order.items.get()
+
+        self.post(order, lines=[{'id': item.pk, 'quantity': 5}])
+        self.assertStock(5, 5, 5)
+
+        self.post(order, lines=[{'id': item.pk, 'quantity': 5, 'DELETE': 'on'}])
+        self.assertStock(10, 0, 0)
+        self.assertFalse(order.items.exists())
+
+    def test_cancelling_restores_stock_and_sales(self):
+        order = self.create()
+        item = order.items.get()
+
+        response = self.post(order, 'cancelled', lines=[{'id': item.pk}])
+        self.assertEqual(response.status_code, 302)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+        self.assertStock(10, 0, 0)
+        self.assertTrue(OrderEvent.objects.filter(
+            order_id=order.order_id, event=OrderEvent.STATUS_CHANGED, status='cancelled').exists())
+
+        # lines of a cancelled order are not counted
+        self.post(order, 'cancelled', lines=[{'id': item.pk, 'quantity': 4}])
+        self.assertStock(10, 0, 0)
+
+    def test_invalid_transitions_are_rejected(self):
+        order = self.create()
+        Order.objects.filter(pk=order.pk).update(status='delivered')
+        item = order.items.get()
+
+        response = self.post(order, 'pending', lines=[{'id': item.pk}])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('status', response.context['adminform'].form.errors)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'delivered')
+
+
+class SalesAnalyticsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+        cls.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        cls.sam = User.objects.create_user(email='sam@example.com', role='seller', first_name='Sam')
+        cls.sue = User.objects.create_user(email='sue@example.com', role='seller', first_name='Sue')
+        honey = Category.objects.create(name='Honey', slug='honey')
+        cls.raw = Product.objects.create(name='Raw', price=Decimal('10.00'), stock=10, seller=cls.sam, category=honey)
+        cls.comb = Product.objects.create(name='Comb', price=Decimal('20.00'), stock=10, seller=cls.sam)
+        cls.jam = Product.objects.create(name='Jam', price=Decimal('5.00'), stock=10, seller=cls.sue)
+        cls.today = timezone.localdate()
+        for days_ago, product, units in [(0, cls.raw, 2), (1, cls.raw, 1), (1, cls.comb, 1), (2, cls.jam, 5), (40, cls.raw, 9)]:
+            DailySales.objects.create(
+                date=cls.today - timedelta(days=days_ago), product=product, seller=product.seller,
+                units=units, revenue=product.price * units, order_lines=1,
+            )
+
+    def report(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get('/api/orders/analytics/sales/', params)
+
+    def test_by_day(self):
+        response = self.report(self.admin)
+        self.assertEqual(response.status_code, 200)
+        report = response.json()['data']
+        self.assertEqual((report['start'], report['end']), (str(self.today - timedelta(days=29)), str(self.today)))
+        self.assertEqual(
+            [(row['key'], row['units'], row['revenue']) for row in report['rows']],
+            [(str(self.today - timedelta(days=2)), 5, '25.00'), (str(self.today - timedelta(days=1)), 2, '30.00'),
+             (str(self.today), 2, '20.00')],
+        )
+        self.assertEqual(report['totals'], {'units': 9, 'revenue': '75.00', 'order_lines': 4})
+
+    def test_groups(self):
+        rows = lambda group_by: [(row['key'], row['label'], row['revenue'])
+                                 for row in self.report(self.admin, group_by=group_by).json()['data']['rows']]
+        self.assertEqual(rows('product'), [
+            (self.raw.product_id, 'Raw', '30.00'), (self.jam.product_id, 'Jam', '25.00'), (self.comb.product_id, 'Comb', '20.00'),
+        ])
+        self.assertEqual(rows('seller'), [(str(self.sam.uid), 'sam@example.com', '50.00'), (str(self.sue.uid), 'sue@example.com', '25.00')])
+        self.assertEqual(rows('category'), [(None, None, '45.00'), ('honey', 'Honey', '30.00')])
+
+    def test_range(self):
+        report = self.report(self.admin, start=str(self.today - timedelta(days=40)), end=str(self.today - timedelta(days=1))).json()['data']
+        self.assertEqual(report['totals']['units'], 16)
+        self.assertEqual(self.report(self.admin, start=str(self.today), end=str(self.today - timedelta(days=1))).status_code, 400)
+        self.assertEqual(self.report(self.admin, group_by='week').status_code, 400)
+
+    def test_scoping(self):
+        # sellers only see their own sales, whatever they ask for
+        report = self.report(self.sue, group_by='seller', seller=str(self.sam.uid)).json()['data']
+        self.assertEqual([row['key'] for row in report['rows']], [str(self.sue.uid)])
+        report = self.report(self.admin, group_by='product', seller=str(self.sue.uid)).json()['data']
+        self.assertEqual([row['key'] for row in report['rows']], [self.jam.product_id])
+        self.assertEqual(self.report(self.customer).status_code, 403)
+        self.assertEqual(self.report(None).status_code, 401)
+
+    def test_deleting_a_product_keeps_its_sales(self):
+        self.comb.delete()
+        self.assertEqual(self.report(self.admin).json()['data']['totals']['revenue'], '75.00')
+        rows = self.report(self.sam, group_by='product').json()['data']['rows']
+        self.assertEqual([(row['key'], row['revenue']) for row in rows], [(self.raw.product_id, '30.00'), (None, '20.00')])
+
+    def test_rebuild_keeps_sales_of_deleted_products(self):
+        order = Order.objects.create(user=self.customer, payment_method='cod', total_amount=Decimal('20.00'))
+        OrderItem.objects.create(order=order, product=self.comb, quantity=1, price=Decimal('20.00'))
+        self.comb.delete()
+        rebuild_sales(start=timezone.localdate(order.created_at))
+        sales = DailySales.objects.get(date=timezone.localdate(order.created_at), product=None)
+        self.assertEqual((sales.seller, sales.units, sales.revenue), (self.sam, 1, Decimal('20.00')))
+
+
+class TransitionOrdersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        cls.seller = User.objects.create_user(email='seller@example.com', role='seller', first_name='Sam')
+        cls.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+        cls.product = Product.objects.create(name='Honey', price=Decimal('12.50'), stock=10, seller=cls.seller)
+
+    def order(self, quantity=1, status='pending'):
+        """An order as checkout leaves it: stock taken and sales recorded."""
+        order = Order.objects.create(user=self.customer, payment_method='cod', status=status)
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity, price=self.product.price)
+        Product.objects.filter(pk=self.product.pk).update(stock=F('stock') - quantity, sold=F('sold') + quantity)
+        record_sales(order, [(self.product.pk, self.seller.pk, quantity, self.product.price)])
+        return order
+
+    def test_outcomes(self):
+        pending, delivered = self.order(), self.order(status='delivered')
+        ArchivedOrder.objects.create(
+            order_id='ORD-ARCHIVED', user=self.customer, status='delivered', payment_status='paid',
+            total_amount=Decimal('1.00'), created_at=timezone.now(), data=b'',
+        )
+
+        results = transition_orders([pending.order_id, delivered.order_id, 'ORD-ARCHIVED', 'ORD-NOPE', pending.order_id], 'confirmed')
+
+        self.assertEqual(results, {
+            pending.order_id: (UPDATED, 'confirmed'),
+            delivered.order_id: (INVALID_TRANSITION, 'delivered'),
+            'ORD-ARCHIVED': (ARCHIVED, 'delivered'),
+            'ORD-NOPE': (NOT_FOUND, None),
+        })
+        self.assertEqual(Order.objects.get(pk=pending.pk).status, 'confirmed')
+        self.assertEqual(Order.objects.get(pk=delivered.pk).status, 'delivered')
+        events = OrderEvent.objects.filter(event=OrderEvent.STATUS_CHANGED)
+        self.assertEqual(list(events.values_list('order_id', 'status')), [(pending.order_id, 'confirmed')])
+
+    def test_cancelling_restores_stock_and_sales(self):
+        orders = [self.order(2), self.order(3), self.order(1, status='delivered')]
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.sold), (4, 6))
+
+        results = transition_orders([order.order_id for order in orders], 'cancelled')
+
+        self.assertEqual([result for result, _ in results.values()], [UPDATED, UPDATED, INVALID_TRANSITION])
+        self.product.refresh_from_db()
+        # only the delivered order's unit stays sold
+        self.assertEqual((self.product.stock, self.product.sold), (9, 1))
+        sales = DailySales.objects.get(product=self.product)
+        self.assertEqual((sales.units, sales.revenue, sales.order_lines), (1, Decimal('12.50'), 1))
+
+        # cancelling again changes nothing
+        transition_orders([order.order_id for order in orders], 'cancelled')
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.sold), (9, 1))
+
+    def test_endpoint_is_admin_only(self):
+        order = self.order()
+        client = APIClient()
+        payload = {'order_ids': [order.order_id], 'status': 'confirmed'}
+
+        self.assertEqual(client.post('/api/orders/bulk-status/', payload, format='json').status_code, 401)
+        for user in (self.customer, self.seller):
+            client.force_authenticate(user)
+            self.assertEqual(client.post('/api/orders/bulk-status/', payload, format='json').status_code, 403)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pending')
+
+        client.force_authenticate(self.admin)
+        response = client.post('/api/orders/bulk-status/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['updated'], 1)
+        self.assertEqual(response.json()['data']['results'], [{'order_id': order.order_id, 'result': UPDATED, 'status': 'confirmed'}])
+
+        response = client.post('/api/orders/bulk-status/', {'order_ids': [], 'status': 'returned'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'order_ids', 'status'})
+
+
+class OrderEventFeedTestCase(TransactionTestCase):
+    """The feed's lag behind open transactions needs real commits to observe."""
+
+    def setUp(self):
+        self.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def feed(self, **params):
+        response = self.client.get('/api/orders/events/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_open_transactions_hold_events_back(self):
+        first = Order.objects.create(user=self.customer, payment_method='cod')
+        OrderEvent.record([OrderEvent.of(first, OrderEvent.CREATED)])
+        page = self.feed()
+        self.assertEqual([event['order_id'] for event in page['events']], [first.order_id])
+        self.assertEqual((page['has_more'], page['held_back'], page['retry_after']), (False, False, None))
+
+        # another session with a transaction started before the next event
+        other = connection.copy()
+        self.addCleanup(other.close)
+        with other.cursor() as cursor:
+            cursor.execute('BEGIN')
+            cursor.execute('SELECT pg_current_xact_id()')
+            second = Order.objects.create(user=self.customer, payment_method='cod')
+            OrderEvent.record([OrderEvent.of(second, OrderEvent.CREATED)])
+
+            page = self.feed(after=page['next'])
+            self.assertEqual(page['events'], [])
+            self.assertEqual((page['held_back'], page['retry_after']), (True, 1))
+            cursor.execute('ROLLBACK')
+
+        page = self.feed(after=page['next'])
+        self.assertEqual([event['order_id'] for event in page['events']], [second.order_id])
+        self.assertFalse(page['held_back'])
+
+    def test_scoping(self):
+        seller = User.objects.create_user(email='seller@example.com', role='seller', first_name='Sam')
+        admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+        product = Product.objects.create(name='Honey', price=Decimal('12.50'), stock=10, seller=seller)
+        mine, theirs = (Order.objects.create(user=self.customer, payment_method='cod') for _ in range(2))
+        OrderItem.objects.create(order=mine, product=product, quantity=1, price=product.price)
+        OrderEvent.record([
+            OrderEvent.of(mine, OrderEvent.CREATED), OrderEvent.of(theirs, OrderEvent.CREATED),
+            OrderEvent.of(mine, OrderEvent.PAYMENT_STATUS_CHANGED), OrderEvent.of(mine, OrderEvent.STATUS_CHANGED),
+        ])
+
+        def events(user):
+            self.client.force_authenticate(user)
+            return [(event['order_id'], event['event']) for event in self.feed()['events']]
+
+        created, paid, changed = OrderEvent.CREATED, OrderEvent.PAYMENT_STATUS_CHANGED, OrderEvent.STATUS_CHANGED
+        # payment changes are for admins only
+        self.assertEqual(events(seller), [(mine.order_id, created), (mine.order_id, changed)])
+        self.assertEqual(events(self.customer), [(mine.order_id, created), (theirs.order_id, created), (mine.order_id, changed)])
+        self.assertEqual(events(admin), [
+            (mine.order_id, created), (theirs.order_id, created), (mine.order_id, paid), (mine.order_id, changed),
+        ])
+
+
+@override_settings(ORDER_STREAM_BROKER='local')
+class OrderStreamAuthTestCase(TestCase):
+    """The stream takes the Authorization header, or a stream-only token in the URL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+
+    def setUp(self):
+        stream._broker = None
+        self.addCleanup(setattr, stream, '_broker', None)
+        self.access = get_tokens_for_user(self.customer)['access']
+        response = APIClient().post('/api/orders/stream/token/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['expires_in'], 60)
+        self.stream_token = response.json()['data']['token']
+        self.client = AsyncClient()
+
+    async def open(self, **kwargs):
+        response = await self.client.get('/api/orders/stream/', **kwargs)
+        if response.streaming:
+            # never read: close the stream so it unsubscribes
+            await response.streaming_content.aclose()
+        return response
+
+    async def test_header_or_stream_token(self):
+        response = await self.open(headers={'Authorization': f'Bearer {self.access}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        response = await self.open(query_params={'token': self.stream_token})
+        self.assertEqual(response.status_code, 200)
+
+    async def test_access_tokens_are_refused_in_the_url(self):
+        self.assertEqual((await self.open(query_params={'token': self.access})).status_code, 401)
+        self.assertEqual((await self.open()).status_code, 401)
+
+    def test_stream_tokens_only_open_the_stream(self):
+        response = APIClient().get('/api/orders/', HTTP_AUTHORIZATION=f'Bearer {self.stream_token}')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(APIClient().post('/api/orders/stream/token/').status_code, 401)
+
+    async def test_expired_and_revoked_stream_tokens(self):
+        expired = OrderStreamToken.for_user(self.customer)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        self.assertEqual((await self.open(query_params={'token': str(expired)})).status_code, 401)
+
+        # logging out everywhere also ends the stream tokens issued before
+        await sync_to_async(revoke_all_tokens_for_user)(self.customer)
+        self.assertEqual((await self.open(query_params={'token': self.stream_token})).status_code, 401)
+
+
+@override_settings(ORDER_STREAM_BROKER='local', ORDER_STREAM_HEARTBEAT=0.2)
+class OrderStreamResumeTestCase(TransactionTestCase):
+    """Streams serve events in feed order, so a reconnecting client misses none committed late."""
+
+    def setUp(self):
+        stream._broker = None
+        self.addCleanup(setattr, stream, '_broker', None)
+        self.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        self.order = Order.objects.create(user=self.customer, payment_method='cod')
+        self.headers = {'Authorization': f"Bearer {get_tokens_for_user(self.customer)['access']}"}
+        self.client = AsyncClient()
+
+    async def open(self, last_event_id=None):
+        headers = dict(self.headers)
+        if last_event_id is not None:
+            headers['Last-Event-ID'] = str(last_event_id)
+        response = await self.client.get('/api/orders/stream/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response.streaming_content
+
+    async def read(self, content):
+        """(event, id) of the messages received until the stream goes idle."""
+        messages = []
+        while (chunk := await anext(content)) != b': keep-alive\n\n':
+            fields = dict(line.split(': ', 1) for line in chunk.decode().splitlines() if line)
+            messages.append((fields['event'], int(fields['id'])))
+        return messages
+
+    async def record(self, event=OrderEvent.STATUS_CHANGED):
+        events = await sync_to_async(OrderEvent.record)([OrderEvent.of(self.order, event)])
+        return events[0].pk
+
+    def begin_other_transaction(self):
+        """Another session's transaction, started now and so older than the events recorded next."""
+        other = connection.copy()
+        self.addCleanup(other.close)
+        cursor = other.cursor()
+        cursor.execute('BEGIN')
+        cursor.execute('SELECT pg_current_xact_id()')
+        return cursor
+
+    def record_in(self, cursor):
+        cursor.execute(
+            'INSERT INTO order_orderevent (order_id, user_id, event, status, payment_status, created_at) '
+            "VALUES (%s, %s, 'status_changed', 'confirmed', 'pending', now()) RETURNING id",
+            [self.order.order_id, self.customer.pk],
+        )
+        return cursor.fetchone()[0]
+
+    async def test_resuming_after_an_event_committed_late(self):
+        first = await self.record(OrderEvent.CREATED)
+        other = await sync_to_async(self.begin_other_transaction)()
+        late = await sync_to_async(self.record_in)(other)
+        # committed first, but sorts after the open transaction's event
+        second = await self.record()
+
+        content = await self.open(last_event_id=first)
+        self.assertEqual(await self.read(content), [])
+        await content.aclose()
+
+        await sync_to_async(other.execute)('COMMIT')
+        content = await self.open(last_event_id=first)
+        self.assertEqual(await self.read(content), [('order', late), ('order', second)])
+        third = await self.record()
+        self.assertEqual(await self.read(content), [('order', third)])
+        await content.aclose()
+
+        content = await self.open(last_event_id=third)
+        self.assertEqual(await self.read(content), [])
+        await content.aclose()
+
+    async def test_held_back_events_follow_once_settled(self):
+        await self.record(OrderEvent.CREATED)
+        content = await self.open()
+        self.assertEqual(await self.read(content), [])
+
+        other = await sync_to_async(self.begin_other_transaction)()
+        event = await self.record()
+        self.assertEqual(await self.read(content), [])
+        await sync_to_async(other.execute)('ROLLBACK')
+        self.assertEqual(await self.read(content), [('order', event)])
+        await content.aclose()
+
+    async def test_resync_when_too_many_events_were_missed(self):
+        first = await self.record(OrderEvent.CREATED)
+        second, third, fourth = [await self.record() for _ in range(3)]
+        with mock.patch('order.views.MAX_EVENTS_PAGE', 2):
+            content = await self.open(last_event_id=second)
+            self.assertEqual(await self.read(content), [('order', third), ('order', fourth)])
+            await content.aclose()
+
+            content = await self.open(last_event_id=first)
+            self.assertEqual(await self.read(content), [('resync', fourth)])
+            fifth = await self.record()
+            self.assertEqual(await self.read(content), [('order', fifth)])
+            await content.aclose()
+
+    async def test_unknown_last_event_id(self):
+        response = await self.client.get('/api/orders/stream/', headers={**self.headers, 'Last-Event-ID': '999999'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], {'last_event_id': ['Unknown event.']})
+
+
+class PostgresBrokerTestCase(TestCase):
+    async def test_failed_listener_closes_the_streams(self):
+        broker = stream.PostgresBroker()
+        with mock.patch.object(broker, 'listen_once', side_effect=ImportError('no driver')), \
+                self.assertLogs('order.stream', 'ERROR') as logs:
+            subscription = await broker.subscribe()
+            self.assertIsNone(await asyncio.wait_for(subscription.queue.get(), 1))
+        broker.task.cancel()
+        self.assertIn('Order event listener failed', logs.output[0])
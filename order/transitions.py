@@ -0,0 +1,107 @@
+# order/transitions.py
+"""
+Bulk order status transitions, for fulfilment staff moving many orders at
+once. Each target status may only be reached from the statuses listed in
+ORDER_TRANSITIONS, and the check happens in the UPDATE itself, so an order
+changed concurrently is never moved from a status that no longer allows it.
+Cancelling restores the stock and the sales rollup of all cancelled orders
+with one statement each. Every moved order gets an OrderEvent.
+
+Single-order PATCHes go through OrderSerializer.update() and are not bound
+by these transitions, so staff can still correct a mistaken status.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+
+from product.models import Product
+from .models import ArchivedOrder, Order, OrderEvent, OrderItem
+from .rollups import record_sales_lines
+
+# target status -> statuses it may be reached from
+ORDER_TRANSITIONS = {
+    'confirmed': ('pending',),
+    'shipped': ('pending', 'confirmed'),
+    'delivered': ('confirmed', 'shipped'),
+    'cancelled': ('pending', 'confirmed', 'shipped'),
+}
+
+# per-order outcomes
+UPDATED = 'updated'
+INVALID_TRANSITION = 'invalid_transition'
+ARCHIVED = 'archived'
+NOT_FOUND = 'not_found'
+
+
+def transition_orders(order_ids, status):
+    """
+    Move the orders `order_ids` to `status` where ORDER_TRANSITIONS allows it,
+    in one transaction. Returns {order_id: (outcome, current status)}, the
+    status being None for orders not found.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    quote = connection.ops.quote_name
+    table = quote(Order._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # lock the rows in id order first: an UPDATE takes them in whatever
+            # order its plan visits them, so overlapping batches could deadlock
+            cursor.execute(
+                f'SELECT id FROM {table} WHERE order_id = ANY(%s) AND status = ANY(%s) ORDER BY id FOR UPDATE',
+                [order_ids, list(ORDER_TRANSITIONS[status])],
+            )
+            cursor.execute(
+                f'UPDATE {table} SET status = %s '
+                f'WHERE order_id = ANY(%s) AND status = ANY(%s) '
+                f'RETURNING id, order_id, created_at, user_id, payment_status',
+                [status, order_ids, list(ORDER_TRANSITIONS[status])],
+            )
+            moved = cursor.fetchall()
+        if status == 'cancelled' and moved:
+            restore_cancelled([(pk, created_at) for pk, _, created_at, _, _ in moved])
+        OrderEvent.record([
+            OrderEvent(order_id=order_id, user_id=user_id, event=OrderEvent.STATUS_CHANGED, status=status,
+                       payment_status=payment_status)
+            for _, order_id, _, user_id, payment_status in moved
+        ])
+
+        results = {order_id: (UPDATED, status) for _, order_id, _, _, _ in moved}
+        rest = [order_id for order_id in order_ids if order_id not in results]
+        if rest:
+            for order_id, current in Order.objects.filter(order_id__in=rest).values_list('order_id', 'status'):
+                results[order_id] = (INVALID_TRANSITION, current)
+            rest = [order_id for order_id in rest if order_id not in results]
+        if rest:
+            for order_id, current in ArchivedOrder.objects.filter(order_id__in=rest).values_list('order_id', 'status'):
+                results[order_id] = (ARCHIVED, current)
+    return {order_id: results.get(order_id, (NOT_FOUND, None)) for order_id in order_ids}
+
+
+def restore_cancelled(orders):
+    """
+    Put the items of just cancelled orders, given as (pk, created_at), back
+    into stock and take them out of the sales rollup. Products are locked in
+    pk order first, the order checkout takes them in.
+    """
+    lines = list(
+        OrderItem.objects.filter(
+            order__in=[pk for pk, _ in orders], created_at__in={created_at for _, created_at in orders},
+        ).exclude(product=None).values_list('created_at', 'product', 'product__seller', 'quantity', 'price')
+    )
+    quantities = Counter()
+    for _, product_id, _, quantity, _ in lines:
+        quantities[product_id] += quantity
+    if not quantities:
+        return
+
+    products = sorted(quantities)
+    list(Product.objects.select_for_update().filter(pk__in=products).order_by('pk').values_list('pk', flat=True))
+    table = connection.ops.quote_name(Product._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET stock = {table}.stock + restored.quantity, '
+            f'sold = GREATEST({table}.sold - restored.quantity, 0) '
+            f'FROM unnest(%s::bigint[], %s::integer[]) AS restored (id, quantity) WHERE {table}.id = restored.id',
+            [products, [quantities[pk] for pk in products]],
+        )
+    record_sales_lines(lines, sign=-1)
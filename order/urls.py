@@ -1,11 +1,29 @@
 # urls.py
 from django.urls import path
-from .views import OrderListCreateView, OrderDetailUpdateAPIView
+from .views import (
+    OrderListCreateView, OrderDetailUpdateAPIView, OrderBulkStatusView, OrderEventFeedView, OrderStreamView,
+    OrderStreamTokenView, SalesAnalyticsView,
+)
 
 urlpatterns = [
     # List all orders for the authenticated user or create a new order
     path('', OrderListCreateView.as_view(), name='order-list-create'),
 
+    # Move many orders to a status at once (admin)
+    path('bulk-status/', OrderBulkStatusView.as_view(), name='order-bulk-status'),
+
+    # Order events after a given one, for incremental sync
+    path('events/', OrderEventFeedView.as_view(), name='order-events'),
+
+    # Server-Sent Events stream of order events as they happen (ASGI only)
+    path('stream/', OrderStreamView.as_view(), name='order-stream'),
+
+    # Short-lived token for opening the stream from a browser's EventSource
+    path('stream/token/', OrderStreamTokenView.as_view(), name='order-stream-token'),
+
+    # Sales per day/product/seller/category from the rollup tables (admin/seller)
+    path('analytics/sales/', SalesAnalyticsView.as_view(), name='sales-analytics'),
+
     # Retrieve a single order by ID and update its status/payment_status
     path('<str:order_id>/', OrderDetailUpdateAPIView.as_view(), name='order-detail-update'),
 ]
@@ -1,19 +1,92 @@
 # views.py
+import asyncio
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from rest_framework import generics, permissions, filters
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status as drf_status
-from .models import Order
-from .serializers import OrderSerializer
+from rest_framework.views import APIView
+from django.db.models import Exists, OuterRef, Prefetch, Sum
+from django.db.models.expressions import RawSQL
+from django.http import Http404, StreamingHttpResponse
+from .archive import OrderHistory, load, load_raw, prune
+from .filters import OrderSearchFilter
+from .models import ArchivedOrder, Order, OrderEvent, OrderItem, DailySales
+from .serializers import (
+    OrderSerializer, FastOrderSerializer, BulkStatusSerializer, BulkStatusReportSerializer, OrderEventQuerySerializer,
+    OrderEventSerializer, OrderEventPageSerializer, OrderStreamTokenSerializer, SalesQuerySerializer, SalesReportSerializer,
+    MAX_EVENTS_PAGE,
+)
+from .stream import get_broker
+from .transitions import UPDATED, transition_orders
 from utils.helpers import Response 
+from utils.async_views import AsyncAPIView
+from utils.db_router import ReplicaReadMixin
+from utils.renderers import dumps
+from utils.fast_serializers import FastListMixin
+from utils.fieldsets import ALL, SparseFieldsViewMixin, get_request_fieldset
 from drf_spectacular.utils import extend_schema,extend_schema_view
-from utils.swagger_helpers import wrapped_response_serializer
-from account.permission import ReadOnlyOrAdmin,IsAdminOrSeller
+from utils.swagger_helpers import wrapped_response_serializer, FIELDSET_PARAMETERS
+from account.permission import ReadOnlyOrAdmin,IsAdminOrSeller,IsAdmin
+from account.authentication import RevocableJWTAuthentication
+from account.tokens import OrderStreamToken
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from product.models import Product
+
+def seller_orders(seller):
+    """
+    Orders with at least one item sold by `seller`, with only those items
+    prefetched. The EXISTS semi-join is answered from the (seller, order)
+    index on order items, so it does not grow with other sellers' orders.
+    """
+    items = OrderItem.objects.filter(seller=seller)
+    return Order.objects.filter(Exists(items.filter(order=OuterRef('pk')))).prefetch_related(
+        Prefetch('items', queryset=items.select_related('product'))
+    )
+
+
+def events_after(events, after):
+    """
+    The `events` following the event `after` in feed order, (transaction, id),
+    or None if there is no such event.
+    """
+    xid = OrderEvent.objects.filter(pk=after).values_list('xid', flat=True).first()
+    if xid is None:
+        return None
+    return events.filter(xid__gte=xid).exclude(xid=xid, id__lte=after)
+
+
+def snapshot_xmin():
+    """The oldest transaction still running: none older can commit anymore."""
+    return RawSQL('pg_snapshot_xmin(pg_current_snapshot())::text::bigint', [])
+
+
+def settled_events(events, limit):
+    """
+    The first `limit` of `events` in feed order, of transactions older than
+    every running one, as (events, has_more, held_back); `held_back` tells
+    that committed events wait for an older transaction to finish.
+    """
+    ready = list(events.filter(xid__lt=snapshot_xmin()).order_by('xid', 'id')[:limit + 1])
+    has_more = len(ready) > limit
+    held_back = not has_more and events.filter(xid__gte=snapshot_xmin()).exists()
+    return ready[:limit], has_more, held_back
+
+
+def last_settled_event(events):
+    """The id of the last of `events` the feed can serve now, or None: a cursor for events still to come."""
+    return events.filter(xid__lt=snapshot_xmin()).order_by('-xid', '-id').values_list('pk', flat=True).first()
+
 
 # ---------- USER VIEWS ----------
 @extend_schema_view(
     get=extend_schema(
         summary="List Orders (Authenticated users/admin/seller)",
-        description="Admin or Seller can see all orders, regular users see only their own. Authentication required.",
+        description="Admins see all orders, sellers see orders containing their products (with only their own line items), regular users see only their own, archived ones included after the live ones (`expand` does not apply to those). Authentication required.",
+        parameters=FIELDSET_PARAMETERS,
         responses=wrapped_response_serializer(OrderSerializer, many=True)
     ),
     post=extend_schema(
@@ -23,16 +96,19 @@ from account.permission import ReadOnlyOrAdmin,IsAdminOrSeller
         responses=wrapped_response_serializer(OrderSerializer)
     )
 )
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderListCreateView(FastListMixin, SparseFieldsViewMixin, generics.ListCreateAPIView):
     """
-    - Admin/Seller: Can list all orders
-    - Authenticated user: Can list only their own orders
+    - Admin: Can list all orders
+    - Seller: Can list orders containing their products, with only their items
+    - Authenticated user: Can list only their own orders, archived ones after the live ones
     - Requires Authentication
     """
     serializer_class = OrderSerializer
+    fast_serializer_class = FastOrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = {'POST': 'checkout'}
 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderSearchFilter, filters.OrderingFilter]
     filterset_fields = {
         'status': ['exact'],
         'payment_status': ['exact'],
@@ -45,13 +121,29 @@ class OrderListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.is_authenticated:
-            if getattr(user, 'role', None) in ['admin', 'seller']:
+            role = getattr(user, 'role', None)
+            if role == 'seller' and not user.is_staff:
+                return seller_orders(user).order_by('-created_at')
+            if role in ['admin', 'seller']:
                 return Order.objects.all().order_by('-created_at')
             return Order.objects.filter(user=user).order_by('-created_at')
         return Order.objects.none()
 
+    def includes_archive(self):
+        """Customers see their archived orders too; admins and sellers list live orders only."""
+        user = self.request.user
+        return user.is_authenticated and getattr(user, 'role', None) not in ['admin', 'seller'] and not user.is_staff
+
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
+        if self.includes_archive():
+            archived = self.filter_queryset(ArchivedOrder.objects.filter(user=request.user).order_by('-created_at'))
+            history = OrderHistory(
+                queryset, archived, lambda rows: self.get_serializer(rows, many=True).data,
+                fields=get_request_fieldset(request)[0],
+            )
+            return self.get_paginated_response(self.paginator.paginate_queryset(history, request, view=self))
+
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -75,20 +167,23 @@ class OrderListCreateView(generics.ListCreateAPIView):
 @extend_schema_view(
     get=extend_schema(
         summary="Retrieve Single Order (Authenticated users/admin/seller)",
-        description="Admin/Seller can retrieve any order, regular users can retrieve only their own order.",
+        description="Admin can retrieve any order, sellers orders containing their products (with only their own line items), regular users only their own order. Archived orders are returned from the archive, as stored (`expand` does not apply to them).",
+        parameters=FIELDSET_PARAMETERS,
         responses=wrapped_response_serializer(OrderSerializer)
     ),
     patch=extend_schema(
         summary="Update Order and Payment Status (Admin/Seller Only)",
-        description="Only Admin or Seller can update `status` or `payment_status`. Regular users cannot update.",
+        description="Only Admin or Seller can update `status` or `payment_status`. Regular users cannot update. Archived orders cannot be updated.",
         request=OrderSerializer,
         responses=wrapped_response_serializer(OrderSerializer)
     )
 )
-class OrderDetailUpdateAPIView(generics.RetrieveUpdateAPIView):
+class OrderDetailUpdateAPIView(SparseFieldsViewMixin, generics.RetrieveUpdateAPIView):
     """
-    - Admin/Seller: Can retrieve any order and update only `status` or `payment_status`
+    - Admin: Can retrieve any order and update only `status` or `payment_status`
+    - Seller: Can retrieve orders containing their products, with only their items
     - Regular user: Can retrieve only their own order
+    - Orders missing from the live tables are looked up in the archive (read-only)
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
@@ -98,20 +193,369 @@ class OrderDetailUpdateAPIView(generics.RetrieveUpdateAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        if getattr(user, 'role', None) in ['admin', 'seller'] or user.is_staff:
+        if getattr(user, 'role', None) == 'seller' and not user.is_staff:
+            return seller_orders(user)
+        if getattr(user, 'role', None) == 'admin' or user.is_staff:
             return Order.objects.all()
         return Order.objects.filter(user=user)
 
+    def get_archived_order(self):
+        """
+        The representation of the archived order named in the URL, scoped like
+        get_queryset() (sellers get only the items of their products) and
+        pruned to `?fields=`, or None.
+        """
+        user = self.request.user
+        archived = ArchivedOrder.objects.filter(order_id=self.kwargs[self.lookup_url_kwarg])
+        is_seller = getattr(user, 'role', None) == 'seller' and not user.is_staff
+        if not is_seller and getattr(user, 'role', None) != 'admin' and not user.is_staff:
+            archived = archived.filter(user=user)
+        data = archived.values_list('data', flat=True).first()
+        if data is None:
+            return None
+        fields = get_request_fieldset(self.request)[0]
+        if not is_seller and fields is ALL:
+            # the snapshot is the response's data as it stands
+            return load_raw(data)
+        data = load(data)
+        if not is_seller:
+            return prune(data, fields)
+        own = set(Product.objects.filter(
+            seller=user, product_id__in=[item['product_id'] for item in data['items']],
+        ).values_list('product_id', flat=True))
+        if not own:
+            return None
+        return prune({**data, 'items': [item for item in data['items'] if item['product_id'] in own]}, fields)
+
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
+        try:
+            instance = self.get_object()
+        except Http404:
+            data = self.get_archived_order()
+            if data is None:
+                raise
+            return Response(data=data, message="Order retrieved successfully")
         serializer = self.get_serializer(instance)
         return Response(data=serializer.data, message="Order retrieved successfully")
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', True)  # Allow PATCH only
-        instance = self.get_object()
+        try:
+            instance = self.get_object()
+        except Http404:
+            if self.get_archived_order() is None:
+                raise
+            return Response(success=False, message="Order update failed", status=drf_status.HTTP_400_BAD_REQUEST,
+                            errors={'non_field_errors': ["This order has been archived and cannot be modified."]})
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         if serializer.is_valid():
             self.perform_update(serializer)
             return Response(data=serializer.data, message="Order updated successfully")
         return Response(success=False, message="Order update failed", status=drf_status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+
+
+# ---------- BULK STATUS TRANSITIONS ----------
+@extend_schema_view(
+    post=extend_schema(
+        summary="Bulk Order Status Transition (Admin Only)",
+        description=(
+            "Move up to 500 orders to `status` in one transaction. Each order is only moved from a status the "
+            "target allows; the others are reported with their current status. Cancelling restores stock."
+        ),
+        request=BulkStatusSerializer,
+        responses=wrapped_response_serializer(BulkStatusReportSerializer)
+    )
+)
+class OrderBulkStatusView(APIView):
+    permission_classes = [IsAdmin]
+
+    def post(self, request):
+        serializer = BulkStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(success=False, message="Bulk status update failed", status=drf_status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+        status = serializer.validated_data['status']
+        results = transition_orders(serializer.validated_data['order_ids'], status)
+        report = BulkStatusReportSerializer({
+            'status': status,
+            'updated': sum(result == UPDATED for result, _ in results.values()),
+            'results': [
+                {'order_id': order_id, 'result': result, 'status': current}
+                for order_id, (result, current) in results.items()
+            ],
+        })
+        return Response(data=report.data, message="Bulk status update applied")
+
+
+# ---------- CHANGE FEED ----------
+
+# seconds to wait before polling again while events are held back
+EVENT_FEED_RETRY_AFTER = 1
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Order Change Feed (Authenticated users/admin/seller)",
+        description=(
+            "Order events (created, status changed, payment status changed) after the event `after`, oldest "
+            "first, scoped like the order list; payment events are admin only. Poll with the previous page's "
+            "`next`. Events are served once every transaction that could still commit an earlier one has "
+            "finished, so none is skipped: a long-running transaction anywhere in the database holds back "
+            "the feed until it ends (sessions idle in a transaction are ended after "
+            "DB_IDLE_IN_TRANSACTION_TIMEOUT seconds). `held_back` tells when committed events are waiting "
+            "on one; poll again after `retry_after` seconds."
+        ),
+        parameters=[OrderEventQuerySerializer],
+        responses=wrapped_response_serializer(OrderEventPageSerializer)
+    )
+)
+class OrderEventFeedView(APIView):
+    """
+    Events are served by transaction id, and only those of transactions older
+    than the oldest running one (its snapshot's xmin), since a transaction
+    still running could commit an event that sorts before them. The feed
+    therefore lags behind the longest open transaction in the whole
+    database, not only this app's; DB_IDLE_IN_TRANSACTION_TIMEOUT bounds the
+    forgotten ones and `held_back` exposes the lag to clients.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        query = OrderEventQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(success=False, message="Invalid change feed query", status=drf_status.HTTP_400_BAD_REQUEST, errors=query.errors)
+        after, limit = query.validated_data['after'], query.validated_data['limit']
+
+        events = OrderEvent.objects.all()
+        user = request.user
+        role = getattr(user, 'role', None)
+        if role == 'seller' and not user.is_staff:
+            events = events.filter(Exists(OrderItem.objects.filter(seller=user, order__order_id=OuterRef('order_id'))))
+        elif role != 'admin' and not user.is_staff:
+            events = events.filter(user=user)
+        if role != 'admin' and not user.is_staff:
+            # even with the field hidden, the event itself tells that a payment changed
+            events = events.exclude(event=OrderEvent.PAYMENT_STATUS_CHANGED)
+        if query.validated_data.get('order_id'):
+            events = events.filter(order_id=query.validated_data['order_id'])
+
+        if after:
+            events = events_after(events, after)
+            if events is None:
+                return Response(success=False, message="Invalid change feed query", status=drf_status.HTTP_400_BAD_REQUEST,
+                                errors={'after': ["Unknown event."]})
+        ready, has_more, held_back = settled_events(events, limit)
+
+        page = OrderEventPageSerializer({
+            'events': ready,
+            'next': ready[-1].pk if ready else after,
+            'has_more': has_more,
+            'held_back': held_back,
+            'retry_after': EVENT_FEED_RETRY_AFTER if held_back else None,
+        }, context={'request': request})
+        return Response(data=page.data, message="Order events retrieved successfully")
+
+
+# ---------- LIVE ORDER STREAM (ASGI) ----------
+
+def stream_user(request):
+    """
+    The user of a stream request, from the Authorization header like the
+    other views, or from a stream token (see OrderStreamTokenView) in
+    `?token=`, since browsers' EventSource cannot send headers.
+    """
+    authentication = RevocableJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is not None:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    if not request.GET.get('token'):
+        raise NotAuthenticated()
+    try:
+        token = OrderStreamToken(request.GET['token'])
+    except TokenError as exc:
+        raise InvalidToken(exc.args[0])
+    return authentication.get_user(token)
+
+
+@extend_schema_view(
+    post=extend_schema(
+        summary="Order Stream Token (Authenticated)",
+        description=(
+            "A token that only opens the live order stream, for browsers' EventSource: "
+            "`new EventSource('/api/orders/stream/?token=<token>')`. It must be used within `expires_in` "
+            "seconds; an open stream stays open after that, but reconnecting needs a new token."
+        ),
+        request=None,
+        responses=wrapped_response_serializer(OrderStreamTokenSerializer)
+    )
+)
+class OrderStreamTokenView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        token = OrderStreamToken.for_user(request.user)
+        data = OrderStreamTokenSerializer({'token': str(token), 'expires_in': settings.ORDER_STREAM_TOKEN_LIFETIME}).data
+        return Response(data=data, message="Order stream token issued", status=drf_status.HTTP_201_CREATED)
+
+
+class OrderStreamView(AsyncAPIView):
+    """
+    Server-Sent Events stream of the events of the user's orders (every
+    order for admins). It serves them like the change feed, in (transaction,
+    id) order once no running transaction can commit an earlier one, so the
+    last id a client received is a cursor it can resume from without missing
+    events committed late. The broker's notifications only wake the stream
+    up, instead of it polling; while events are held back it checks again
+    every EVENT_FEED_RETRY_AFTER seconds. Needs the ASGI server.
+    """
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return Response(success=False, status=drf_status.HTTP_501_NOT_IMPLEMENTED,
+                            message="The order stream needs the ASGI server.", errors={})
+        user = await sync_to_async(stream_user)(request)
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        if last_event_id is not None and not last_event_id.isdigit():
+            return Response(success=False, message="Invalid order stream request", status=drf_status.HTTP_400_BAD_REQUEST,
+                            errors={'last_event_id': ["A valid integer is required."]})
+
+        is_admin = user.is_staff or getattr(user, 'role', None) == 'admin'
+        events = OrderEvent.objects.all()
+        if not is_admin:
+            events = events.filter(user=user).exclude(event=OrderEvent.PAYMENT_STATUS_CHANGED)
+        broker = get_broker()
+        # subscribe before reading the cursor, so events committed meanwhile wake the stream up
+        subscription = await broker.subscribe(None if is_admin else user.pk)
+        if last_event_id:
+            after = int(last_event_id)
+            if not await OrderEvent.objects.filter(pk=after).aexists():
+                broker.unsubscribe(subscription)
+                return Response(success=False, message="Invalid order stream request", status=drf_status.HTTP_400_BAD_REQUEST,
+                                errors={'last_event_id': ["Unknown event."]})
+        else:
+            after = await sync_to_async(last_settled_event)(events)
+
+        drf_request = self.get_drf_request(request)
+        drf_request.user = user
+        response = StreamingHttpResponse(
+            self.stream(subscription, events, after, bool(last_event_id), {'request': drf_request}),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def next_events(self, events, after):
+        """settled_events() after the event `after` (None: from the start)."""
+        if after is not None:
+            events = events_after(events, after)
+        return settled_events(events, MAX_EVENTS_PAGE)
+
+    async def stream(self, subscription, events, after, resuming, context):
+        loop = asyncio.get_running_loop()
+        try:
+            last_write = loop.time()
+            while True:
+                page, has_more, held_back = await sync_to_async(self.next_events)(events, after)
+                if resuming and has_more:
+                    # more missed than one page: the client reloads its orders and goes on from now
+                    after = await sync_to_async(last_settled_event)(events)
+                    yield self.resync_message(after)
+                    resuming = False
+                    continue
+                resuming = False
+                for event in page:
+                    yield self.message(event, context)
+                    after = event.pk
+                if page:
+                    last_write = loop.time()
+                if has_more:
+                    continue
+
+                idle = loop.time() - last_write
+                timeout = settings.ORDER_STREAM_HEARTBEAT - idle
+                if held_back:
+                    timeout = min(timeout, EVENT_FEED_RETRY_AFTER)
+                try:
+                    wake = await asyncio.wait_for(subscription.queue.get(), max(timeout, 0))
+                except TimeoutError:
+                    if loop.time() - last_write >= settings.ORDER_STREAM_HEARTBEAT:
+                        # a comment line, so proxies do not drop the idle connection
+                        yield b': keep-alive\n\n'
+                        last_write = loop.time()
+                    continue
+                # one query serves every notification received meanwhile
+                while wake is not None and not subscription.queue.empty():
+                    wake = subscription.queue.get_nowait()
+                if wake is None:
+                    break
+        finally:
+            get_broker().unsubscribe(subscription)
+
+    def message(self, event, context):
+        data = dumps(OrderEventSerializer(event, context=context).data)
+        return b'id: %d\nevent: order\ndata: %s\n\n' % (event.pk, data)
+
+    def resync_message(self, after):
+        data = dumps({'reason': 'too_many_missed_events', 'max_events': MAX_EVENTS_PAGE})
+        return b'id: %d\nevent: resync\ndata: %s\n\n' % (after, data)
+
+
+# ---------- SALES ANALYTICS ----------
+
+# group_by -> (key column, label column) of DailySales
+SALES_GROUP_COLUMNS = {
+    'day': ('date', None),
+    'product': ('product__product_id', 'product__name'),
+    'seller': ('seller__uid', 'seller__email'),
+    'category': ('product__category__slug', 'product__category__name'),
+}
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Sales Analytics (Admin/Seller)",
+        description=(
+            "Units, revenue and order lines between `start` and `end` (default: the last 30 days), grouped by "
+            "day, product, seller or category. Answered from the DailySales rollup, which excludes cancelled "
+            "orders. Sellers only see their own sales; admins can narrow to one seller with `seller=<uid>`. "
+            "Read from a replica when one is configured."
+        ),
+        parameters=[SalesQuerySerializer],
+        responses=wrapped_response_serializer(SalesReportSerializer)
+    )
+)
+class SalesAnalyticsView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAdminOrSeller]
+
+    def get(self, request):
+        query = SalesQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(success=False, message="Invalid analytics query", status=drf_status.HTTP_400_BAD_REQUEST, errors=query.errors)
+        params = query.validated_data
+
+        sales = DailySales.objects.filter(date__range=(params['start'], params['end']))
+        user = request.user
+        if getattr(user, 'role', None) == 'seller' and not user.is_superuser:
+            sales = sales.filter(seller=user)
+        elif params.get('seller'):
+            sales = sales.filter(seller__uid=params['seller'])
+
+        key, label = SALES_GROUP_COLUMNS[params['group_by']]
+        columns = [key, label] if label else [key]
+        rows = sales.values(*columns).annotate(
+            units=Sum('units'), revenue=Sum('revenue'), order_lines=Sum('order_lines'),
+        )
+        rows = rows.order_by(key) if params['group_by'] == 'day' else rows.order_by('-revenue', key)
+        rows = [
+            {'key': row[key], 'label': row[label] if label else None, 'units': row['units'],
+             'revenue': row['revenue'], 'order_lines': row['order_lines']}
+            for row in rows
+        ]
+        totals = {
+            'units': sum(row['units'] for row in rows),
+            'revenue': sum((row['revenue'] for row in rows), Decimal('0.00')),
+            'order_lines': sum(row['order_lines'] for row in rows),
+        }
+        report = SalesReportSerializer({**params, 'totals': totals, 'rows': rows})
+        return Response(data=report.data, message="Sales analytics retrieved successfully")
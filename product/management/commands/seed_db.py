@@ -1,183 +1,416 @@
+import hashlib
+import multiprocessing
+import os
 import random
-import uuid
-from decimal import Decimal
-from django.core.management.base import BaseCommand
-from django.utils.text import slugify
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import django
+from django.apps import apps
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from order.models import ArchivedOrder, DailySales, Order, OrderEvent, OrderItem, ORDER_STATUS_CHOICES, PAYMENT_STATUS_CHOICES
+from order.partitions import create_partitions
+from order.rollups import rebuild_sales
 from product.models import Category, Product, Review
-from order.models import Order, OrderItem
-from django.db import transaction
 
 User = get_user_model()
 
+# rows per task and per COPY; fixed, so the data does not depend on --workers
+CHUNK_SIZE = 10_000
+MAX_ITEMS_PER_ORDER = 5
+
+# emails of the users this command creates, removed by --clear
+SEEDED_EMAIL_REGEX = r'^(customer|seller)[0-9]+@tradifoodi\.com$'
+
+CATEGORIES = [
+    ('Organic Honey', 'pure-honey'),
+    ('Traditional Ghee', 'pure-ghee'),
+    ('Pure Spices', 'spices'),
+    ('Homemade Pickles', 'pickles'),
+    ('Nuts & Seeds', 'nuts-seeds'),
+    ('Organic Rice', 'organic-rice'),
+    ('Handmade Snacks', 'snacks'),
+    ('Herbal Tea', 'herbal-tea'),
+    ('Traditional Sweets', 'sweets'),
+    ('Cold Pressed Oil', 'organic-oil'),
+]
+SELLER_CITIES = ['Dhaka', 'Chittagong', 'Sylhet', 'Rajshahi', 'Khulna']
+CUSTOMER_CITIES = ['Dhaka', 'Chittagong', 'Khulna', 'Barisal', 'Comilla', 'Sylhet', 'Noakhali']
+SERVING_SIZES = ['250g', '500g', '1kg', '2kg', '1L', '5L']
+COLORS = ['Natural', 'Golden', 'Brown']
+COMMENTS = [
+    'Absolutely wonderful!', 'Very authentic and pure.', 'The packaging was excellent.',
+    'I have been looking for this for a long time.', 'Will definitely order again!',
+    'Great value for money.', 'Perfect taste!', '100% genuine products.',
+]
+ORDER_STATUSES = [status for status, _ in ORDER_STATUS_CHOICES]
+PAYMENT_STATUSES = [status for status, _ in PAYMENT_STATUS_CHOICES]
+
+
+# ---------------- Deterministic values ----------------
+
+def table_key(seed, table, bits=64):
+    digest = hashlib.blake2b(f'{seed}:{table}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') & ((1 << bits) - 1)
+
+
+def scramble(index, key, bits):
+    """A bijection on `bits`-bit integers: distinct indexes give distinct, random-looking ids."""
+    mask = (1 << bits) - 1
+    return (((index * 0x9E3779B97F4A7C15) & mask) ^ key) * 0xBF58476D1CE4E5B9 & mask
+
+
+def public_id(plan, table, index, bits=40):
+    return f'{scramble(index, plan["keys"][table], bits):0{bits // 4}X}'
+
+
+def price_of(plan, product):
+    """Product prices are a function of the index, so order items need no lookup."""
+    return Decimal(150 + scramble(product, plan['keys']['price'], 32) % 2351)
+
+
+def seller_of(plan, product):
+    """Like prices, the seller follows from the product index, for the order items' copy."""
+    return plan['user_base'] + scramble(product, plan['keys']['seller'], 32) % plan['sellers']
+
+
+def chunk_rng(plan, table, start):
+    return random.Random(f'{plan["seed"]}:{table}:{start}')
+
+
+def timestamp(plan, rng):
+    return plan['until'] - timedelta(seconds=rng.randrange(plan['days'] * 86400))
+
+
+# ---------------- Row generators ----------------
+
+USER_FIELDS = [
+    'id', 'uid', 'email', 'password', 'phone', 'role', 'first_name', 'last_name', 'address',
+    'city', 'postal_code', 'is_active', 'is_superuser', 'token_version', 'created_at', 'updated_at',
+]
+PRODUCT_FIELDS = [
+    'id', 'product_id', 'name', 'description', 'price', 'originalPrice', 'stock', 'sold', 'category',
+    'seller', 'thumbnail', 'images', 'ingredients', 'preparationTime', 'servingSize', 'isAvailable',
+    'sizes', 'color', 'created_at', 'updated_at',
+]
+REVIEW_FIELDS = ['id', 'review_id', 'product', 'user', 'rating', 'comment', 'createdAt']
+ORDER_FIELDS = [
+    'id', 'order_id', 'user', 'delivery_note', 'total_amount', 'payment_method', 'payment_status',
+    'status', 'created_at',
+]
+ITEM_FIELDS = ['id', 'item_id', 'order', 'product', 'seller', 'size', 'color', 'quantity', 'price', 'created_at']
+
+
+def seller_rows(plan, start, stop):
+    rng = chunk_rng(plan, 'seller', start)
+    rows = []
+    for i in range(start, stop):
+        created = timestamp(plan, rng)
+        rows.append((
+            plan['user_base'] + i, 'USR-' + public_id(plan, 'user', i), f'seller{i + 1}@tradifoodi.com',
+            plan['seller_password'], f'017{i + 1:08d}', 'seller', 'Seller', f'Number {i + 1}',
+            f'Industrial Road {i + 1}', rng.choice(SELLER_CITIES), None, True, False, 0, created, created,
+        ))
+    return [(User, USER_FIELDS, rows)]
+
+
+def customer_rows(plan, start, stop):
+    rng = chunk_rng(plan, 'customer', start)
+    rows = []
+    for i in range(start, stop):
+        index = plan['sellers'] + i
+        created = timestamp(plan, rng)
+        rows.append((
+            plan['user_base'] + index, 'USR-' + public_id(plan, 'user', index), f'customer{i + 1}@tradifoodi.com',
+            plan['customer_password'], f'018{i + 1:08d}', 'customer', 'Customer', f'User {i + 1}',
+            f'House {i + 1}, Road {rng.randint(1, 50)}, Sector {rng.randint(1, 15)}',
+            rng.choice(CUSTOMER_CITIES), f'{1000 + i + 1}', True, False, 0, created, created,
+        ))
+    return [(User, USER_FIELDS, rows)]
+
+
+def product_rows(plan, start, stop):
+    rng = chunk_rng(plan, 'product', start)
+    categories = plan['categories']
+    rows = []
+    for i in range(start, stop):
+        category_pk, cat_id, name = categories[i % len(categories)]
+        product_id = f'{cat_id}-P{public_id(plan, "product", i, bits=24)}'
+        price = price_of(plan, i)
+        created = timestamp(plan, rng)
+        rows.append((
+            plan['product_base'] + i, product_id, f'{name} Premium Pack - {i // len(categories) + 1}',
+            f'Experience the authentic taste of {name} with this carefully curated premium selection. '
+            'Harvested with care and packed for purity.',
+            price, price + rng.randint(50, 400), rng.randint(20, 1000), 0, category_pk, seller_of(plan, i),
+            f'https://picsum.photos/seed/{product_id}/400/400', [f'https://picsum.photos/seed/{product_id}-1/800/800'],
+            ['Organic Raw Material', 'Natural Preservatives', 'Love'], f'{rng.randint(1, 15)} days',
+            rng.choice(SERVING_SIZES), True,
+            ['500ml', '1L'] if name == 'Organic Honey' else ['Standard', 'Family Pack', 'Trial Size'],
+            COLORS, created, created,
+        ))
+    return [(Product, PRODUCT_FIELDS, rows)]
+
+
+def review_rows(plan, start, stop):
+    # review k is the (k // products)-th review of product k % products, each by a different customer
+    rng = chunk_rng(plan, 'review', start)
+    products, customers = plan['products'], plan['customers']
+    customer_base = plan['user_base'] + plan['sellers']
+    rows = []
+    for k in range(start, stop):
+        product, nth = k % products, k // products
+        customer = (scramble(product, plan['keys']['reviewer'], 32) + nth) % customers
+        rows.append((
+            plan['review_base'] + k, 'REV-' + public_id(plan, 'review', k), plan['product_base'] + product,
+            customer_base + customer, rng.randint(3, 5), rng.choice(COMMENTS), timestamp(plan, rng),
+        ))
+    return [(Review, REVIEW_FIELDS, rows)]
+
+
+def order_rows(plan, start, stop):
+    rng = chunk_rng(plan, 'order', start)
+    customer_base = plan['user_base'] + plan['sellers']
+    orders, items = [], []
+    for i in range(start, stop):
+        order_pk = plan['order_base'] + i
+        total = Decimal('0.00')
+        count = rng.randint(1, min(MAX_ITEMS_PER_ORDER, plan['products']))
+        order_items = []
+        for j, product in enumerate(rng.sample(range(plan['products']), count)):
+            # item ids leave room for MAX_ITEMS_PER_ORDER per order, so chunks never overlap
+            index = i * MAX_ITEMS_PER_ORDER + j
+            quantity, price = rng.randint(1, 4), price_of(plan, product)
+            total += (price * quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            order_items.append((
+                plan['item_base'] + index, 'ITM-' + public_id(plan, 'item', index), order_pk,
+                plan['product_base'] + product, seller_of(plan, product), rng.choice(['Standard', 'Family Pack']),
+                rng.choice(COLORS), quantity, price,
+            ))
+        orders.append((
+            order_pk, 'ORD-' + public_id(plan, 'order', i), customer_base + rng.randrange(plan['customers']),
+            f'Handle with care. Order {i + 1}', total, 'cod', rng.choice(PAYMENT_STATUSES),
+            rng.choice(ORDER_STATUSES), timestamp(plan, rng),
+        ))
+        # items share their order's created_at, the partition key
+        items += [(*item, orders[-1][-1]) for item in order_items]
+    return [(Order, ORDER_FIELDS, orders), (OrderItem, ITEM_FIELDS, items)]
+
+
+GENERATORS = {
+    'sellers': seller_rows,
+    'customers': customer_rows,
+    'products': product_rows,
+    'reviews': review_rows,
+    'orders': order_rows,
+}
+
+# tables of a phase only reference tables of earlier phases
+PHASES = [('sellers', 'customers'), ('products',), ('reviews', 'orders')]
+
+
+# ---------------- Writing ----------------
+
+def write_rows(model, fields, rows):
+    """COPY FROM STDIN with psycopg 3, bulk_create otherwise."""
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if not hasattr(cursor.cursor, 'copy'):
+            model.objects.bulk_create([model(**dict(zip(attnames(model, fields), row))) for row in rows])
+            return
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+        with cursor.cursor.copy(f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
+def attnames(model, fields):
+    return [model._meta.get_field(name).attname for name in fields]
+
+
+_plan = None
+
+
+def init_worker(plan):
+    global _plan
+    if not apps.ready:  # spawned rather than forked
+        django.setup()
+    _plan = plan
+
+
+def run_task(task):
+    table, start, stop = task
+    with transaction.atomic():
+        for model, fields, rows in GENERATORS[table](_plan, start, stop):
+            write_rows(model, fields, rows)
+    return table, stop - start
+
+
 class Command(BaseCommand):
-    help = 'Seed the database with a high volume of dummy data'
+    help = (
+        'Seed the database with deterministic dummy data: sellers, customers, products, reviews and '
+        'orders in any volume, written with COPY by several processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Customers to create')
+        parser.add_argument('--sellers', type=int, default=5)
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--reviews', type=int, default=600)
+        parser.add_argument('--orders', type=int, default=100, help='Orders, with 1-5 items each')
+        parser.add_argument('--seed', type=int, default=42, help='Same seed, same data')
+        parser.add_argument(
+            '--until', type=datetime.fromisoformat, default=None,
+            help='Latest creation date (YYYY-MM-DD), default today; pass it for identical runs on other days',
+        )
+        parser.add_argument('--days', type=int, default=365, help='Creation dates spread over this many days')
+        parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 8))
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Empty the product, review and order tables and delete seeded users first',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write('Starting high-volume database seeding...')
-
-        with transaction.atomic():
-            # 1. Create Users
-            self.stdout.write('Creating users...')
-            
-            # Admins
-            admin_user, _ = User.objects.get_or_create(
-                email='admin@tradifoodi.com',
-                defaults={'first_name': 'Admin', 'last_name': 'User', 'role': 'admin', 'is_superuser': True}
+        counts = {
+            'sellers': options['sellers'], 'customers': options['users'], 'products': options['products'],
+            'reviews': options['reviews'], 'orders': options['orders'],
+        }
+        self.validate(counts)
+
+        if options['clear']:
+            self.stdout.write('Clearing existing data...')
+            self.clear()
+        elif User.objects.filter(email__regex=SEEDED_EMAIL_REGEX).exists():
+            raise CommandError('Seeded users already exist; run with --clear to seed again.')
+
+        plan = self.prepare(counts, options)
+        # orders land in their monthly partitions rather than the default one
+        create_partitions(plan['until'] - timedelta(days=plan['days']), plan['until'])
+        tasks = [
+            [(table, start, min(start + CHUNK_SIZE, counts[table]))
+             for table in phase for start in range(0, counts[table], CHUNK_SIZE)]
+            for phase in PHASES
+        ]
+        total_rows = sum(counts.values())
+        workers = max(1, min(options['workers'], sum(map(len, tasks))))
+        self.stdout.write(f'Seeding {total_rows:,} rows with seed {plan["seed"]} and {workers} worker(s)...')
+
+        started = time.perf_counter()
+        if workers == 1:
+            init_worker(plan)
+            for phase in tasks:
+                self.report(map(run_task, phase), counts)
+        else:
+            # forked workers must open their own connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+            with context.Pool(workers, initializer=init_worker, initargs=(plan,)) as pool:
+                for phase in tasks:
+                    self.report(pool.imap_unordered(run_task, phase), counts)
+
+        self.finish()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {total_rows:,} rows (plus order items) in {elapsed:.1f}s, '
+            f'{total_rows / elapsed if elapsed else 0:,.0f} rows/s.'
+        ))
+
+    def validate(self, counts):
+        if any(count < 0 for count in counts.values()):
+            raise CommandError('Counts cannot be negative.')
+        if counts['products'] and not counts['sellers']:
+            raise CommandError('Products need at least one seller.')
+        if counts['products'] >= 1 << 24:
+            raise CommandError('At most 16,777,215 products: product ids have 6 hex digits.')
+        if (counts['reviews'] or counts['orders']) and not (counts['products'] and counts['customers']):
+            raise CommandError('Reviews and orders need at least one product and one customer.')
+        if counts['reviews'] > counts['products'] * counts['customers']:
+            raise CommandError('Each customer reviews a product at most once: use fewer reviews or more users.')
+
+    def prepare(self, counts, options):
+        """Admin, categories, shared password hashes and the first id of each table."""
+        seed = options['seed']
+        admin_user, _ = User.objects.get_or_create(
+            email='admin@tradifoodi.com',
+            defaults={'first_name': 'Admin', 'last_name': 'User', 'role': 'admin', 'is_superuser': True}
+        )
+        admin_user.set_password('admin123')
+        admin_user.save()
+
+        categories = []
+        for i, (name, slug) in enumerate(CATEGORIES):
+            category, _ = Category.objects.get_or_create(
+                slug=slug,
+                defaults={
+                    'cat_id': f'C{scramble(i, table_key(seed, "category", 24), 24):06X}',
+                    'name': name,
+                    'description': f'Premium quality {name.lower()} sourced directly from rural artisans.',
+                    'image': f'https://picsum.photos/seed/{slug}/400/400',
+                }
             )
-            admin_user.set_password('admin123')
-            admin_user.save()
-
-            # Sellers
-            sellers = []
-            for i in range(1, 6):
-                seller, _ = User.objects.get_or_create(
-                    email=f'seller{i}@tradifoodi.com',
-                    defaults={
-                        'first_name': f'Seller',
-                        'last_name': f'Number {i}',
-                        'role': 'seller',
-                        'phone': f'01711111{i:03d}',
-                        'city': random.choice(['Dhaka', 'Chittagong', 'Sylhet', 'Rajshahi', 'Khulna']),
-                        'address': f'Industrial Road {i}',
-                    }
-                )
-                seller.set_password('seller123')
-                seller.save()
-                sellers.append(seller)
-
-            # Customers
-            customers = []
-            for i in range(1, 51):
-                customer, _ = User.objects.get_or_create(
-                    email=f'customer{i}@tradifoodi.com',
-                    defaults={
-                        'first_name': f'Customer',
-                        'last_name': f'User {i}',
-                        'role': 'customer',
-                        'phone': f'01811111{i:03d}',
-                        'city': random.choice(['Dhaka', 'Chittagong', 'Khulna', 'Barisal', 'Comilla', 'Sylhet', 'Noakhali']),
-                        'address': f'House {i}, Road {random.randint(1,50)}, Sector {random.randint(1,15)}',
-                        'postal_code': f'{1000 + i}'
-                    }
-                )
-                customer.set_password('customer123')
-                customer.save()
-                customers.append(customer)
-
-            self.stdout.write(self.style.SUCCESS(f'Created {len(sellers)} sellers and {len(customers)} customers.'))
-
-            # 2. Create Categories
-            self.stdout.write('Creating categories...')
-            categories_data = [
-                ('Organic Honey', 'pure-honey'),
-                ('Traditional Ghee', 'pure-ghee'),
-                ('Pure Spices', 'spices'),
-                ('Homemade Pickles', 'pickles'),
-                ('Nuts & Seeds', 'nuts-seeds'),
-                ('Organic Rice', 'organic-rice'),
-                ('Handmade Snacks', 'snacks'),
-                ('Herbal Tea', 'herbal-tea'),
-                ('Traditional Sweets', 'sweets'),
-                ('Cold Pressed Oil', 'organic-oil')
-            ]
-
-            categories = []
-            for name, slug_base in categories_data:
-                cat, created = Category.objects.get_or_create(
-                    slug=slug_base,
-                    defaults={
-                        'name': name,
-                        'description': f'Premium quality {name.lower()} sourced directly from rural artisans.',
-                        'image': f'https://picsum.photos/seed/{slug_base}/400/400'
-                    }
-                )
-                categories.append(cat)
-            
-            self.stdout.write(self.style.SUCCESS(f'Created {len(categories)} categories.'))
-
-            # 3. Create Products (10 per category)
-            self.stdout.write('Creating products...')
-            products = []
-            for cat in categories:
-                for i in range(1, 11):
-                    price = Decimal(random.randint(150, 2500))
-                    original_price = price + Decimal(random.randint(50, 400))
-                    
-                    prod = Product.objects.create(
-                        name=f'{cat.name} Premium Pack - {i}',
-                        description=f'Experience the authentic taste of {cat.name} with this carefully curated premium selection. Harvested with care and packed for purity.',
-                        price=price,
-                        originalPrice=original_price,
-                        stock=random.randint(20, 1000),
-                        category=cat,
-                        seller=random.choice(sellers),
-                        thumbnail=f'https://picsum.photos/seed/{uuid.uuid4().hex}/400/400',
-                        images=[f'https://picsum.photos/seed/{uuid.uuid4().hex}/800/800'],
-                        ingredients=['Organic Raw Material', 'Natural Preservatives', 'Love'],
-                        preparationTime=f'{random.randint(1, 15)} days',
-                        servingSize=random.choice(['250g', '500g', '1kg', '2kg', '1L', '5L']),
-                        isAvailable=True,
-                        sizes=['Standard', 'Family Pack', 'Trial Size'] if cat.name != 'Organic Honey' else ['500ml', '1L'],
-                        color=['Natural', 'Golden', 'Brown']
-                    )
-                    products.append(prod)
-
-            self.stdout.write(self.style.SUCCESS(f'Created {len(products)} products (10 per category).'))
-
-            # 4. Create Reviews
-            self.stdout.write('Creating random reviews...')
-            for prod in products:
-                num_reviews = random.randint(2, 10) # At least 2 per product
-                reviewers = random.sample(customers, num_reviews)
-                for user in reviewers:
-                    Review.objects.create(
-                        product=prod,
-                        user=user,
-                        rating=random.randint(3, 5),
-                        comment=random.choice([
-                            'Absolutely wonderful!', 'Very authentic and pure.', 'The packaging was excellent.',
-                            'I have been looking for this for a long time.', 'Will definitely order again!',
-                            'Great value for money.', 'Perfect taste!', '100% genuine products.'
-                        ])
-                    )
-
-            self.stdout.write(self.style.SUCCESS('Created exhaustive reviews for all products.'))
-
-            # 5. Create Orders (100 sample orders)
-            self.stdout.write('Creating sample orders...')
-            order_statuses = ['pending', 'confirmed', 'preparing', 'delivered', 'cancelled']
-            payment_statuses = ['pending', 'paid', 'failed']
-            
-            for i in range(100):
-                customer = random.choice(customers)
-                order = Order.objects.create(
-                    user=customer,
-                    payment_method='cod',
-                    status=random.choice(order_statuses),
-                    payment_status=random.choice(payment_statuses),
-                    delivery_note=f'Handle with care. Order {i+1}'
+            categories.append((category.pk, category.cat_id, category.name))
+
+        until = options['until'] or timezone.now().replace(tzinfo=None)
+        until = timezone.make_aware(datetime.combine(until.date(), datetime.min.time()))
+
+        def next_id(model):
+            return (model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+
+        return {
+            'seed': seed,
+            **counts,
+            'keys': {table: table_key(seed, table) for table in
+                     ('user', 'product', 'review', 'order', 'item', 'price', 'seller', 'reviewer')},
+            'categories': categories,
+            # one hash per role instead of one per user; the salt follows the seed
+            'seller_password': make_password('seller123', salt=f'seed{seed}seller'),
+            'customer_password': make_password('customer123', salt=f'seed{seed}customer'),
+            'until': until,
+            'days': max(options['days'], 1),
+            'user_base': next_id(User),
+            'product_base': next_id(Product),
+            'review_base': next_id(Review),
+            'order_base': next_id(Order),
+            'item_base': next_id(OrderItem),
+        }
+
+    def report(self, results, counts):
+        """Print progress and rows per second for each table of a phase."""
+        done, started, last = {}, time.perf_counter(), 0.0
+        for table, rows in results:
+            done[table] = done.get(table, 0) + rows
+            now = time.perf_counter()
+            if now - last >= 2 or done[table] == counts[table]:
+                last = now
+                self.stdout.write(
+                    f'  {table:<10} {done[table]:>12,}/{counts[table]:,}   '
+                    f'{sum(done.values()) / (now - started):>10,.0f} rows/s'
                 )
 
-                # Add random 1-5 items
-                num_items = random.randint(1, 5)
-                order_products = random.sample(products, num_items)
-                total = Decimal('0.00')
-                
-                for prod in order_products:
-                    qty = random.randint(1, 4)
-                    item = OrderItem.objects.create(
-                        order=order,
-                        product=prod,
-                        quantity=qty,
-                        price=prod.price,
-                        size=random.choice(['Standard', 'Family Pack']) if prod.sizes else 'Standard',
-                        color=random.choice(prod.color) if prod.color else 'Natural'
-                    )
-                    total += item.subtotal()
-                
-                order.total_amount = total
-                order.save()
-
-            self.stdout.write(self.style.SUCCESS(f'Created 100 sample orders with diverse items and statuses.'))
-            self.stdout.write(self.style.SUCCESS('Database flushing and re-seeding completed with high volume!'))
+    def clear(self):
+        tables = ', '.join(connection.ops.quote_name(model._meta.db_table)
+                           for model in (OrderItem, Order, ArchivedOrder, OrderEvent, Review, Product, Category))
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {tables} RESTART IDENTITY CASCADE')
+        User.objects.filter(email__regex=SEEDED_EMAIL_REGEX).delete()
+
+    def finish(self):
+        """Move the id sequences past the explicit ids, rebuild the sales rollup and refresh planner statistics."""
+        models = [User, Product, Review, Order, OrderItem]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        # the orders were written without going through checkout
+        rebuild_sales()
+        with connection.cursor() as cursor:
+            for model in models + [DailySales]:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
@@ -1,20 +1,31 @@
 from rest_framework import serializers
+from account.serializers import PublicUserSerializer
+from utils.fast_serializers import FastSerializer
+from utils.fieldsets import SparseFieldsMixin
 from .models import Product, Category, Review
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['cat_id', 'name', 'slug', 'image', 'description']
         read_only_fields = ['cat_id', 'slug']
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
+    expandable_fields = {'user': (PublicUserSerializer, {})}
+
     class Meta:
         model = Review
         fields = ['review_id', 'user', 'rating', 'comment', 'createdAt']
         read_only_fields = ['review_id', 'user', 'createdAt']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['product_id', 'name', 'thumbnail', 'price']
+        read_only_fields = fields
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.SlugRelatedField(
         queryset=Category.objects.all(),
@@ -25,6 +36,7 @@ class ProductSerializer(serializers.ModelSerializer):
     seller = serializers.StringRelatedField(read_only=True)
     rating = serializers.FloatField(source='rating_avg', read_only=True, default=0)
     reviewCount = serializers.IntegerField(source='review_count', read_only=True, default=0)
+    expandable_fields = {'seller': (PublicUserSerializer, {})}
 
     class Meta:
         model = Product
@@ -78,4 +90,16 @@ class ProductSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             validated_data['seller'] = request.user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+# ---------------- Read-only fast paths ----------------
+
+class FastReviewSerializer(FastSerializer):
+    serializer_class = ReviewSerializer
+    lookups = {'user': 'user__email'}
+
+
+class FastProductSerializer(FastSerializer):
+    serializer_class = ProductSerializer
+    lookups = {'seller': 'seller__email'}
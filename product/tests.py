@@ -1,3 +1,132 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db.models import Avg, Count
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from account.models import User
+from utils.fieldsets import parse_fieldset
+from utils.renderers import dumps
+from .models import Category, Product, Review
+from .serializers import FastProductSerializer, FastReviewSerializer, ProductSerializer, ReviewSerializer
+from .views import AsyncCategoryListView, AsyncProductDetailView, AsyncProductListView, AsyncReviewListView
+
+# (?fields=, ?expand=) combinations compared besides the full output
+PRODUCT_FIELDSETS = [
+    ('', ''), ('name,price,thumbnail', ''), ('product_id,category.name,rating', 'seller'), ('', 'seller'),
+    ('category', ''), ('originalPrice,images,sizes', ''),
+]
+REVIEW_FIELDSETS = [('', ''), ('rating,comment', ''), ('', 'user'), ('review_id,user.email', 'user')]
+
+
+class FastSerializerParityTestCase(TestCase):
+    """The fast list serializers return exactly what the DRF serializers do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(email='seller@example.com', role='seller', first_name='Sam', last_name='Seller')
+        cls.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        category = Category.objects.create(name='Honey', slug='honey', image='https://example.com/honey.png')
+        cls.full = Product.objects.create(
+            name='Raw Honey', description='Unfiltered', price=Decimal('12.50'), originalPrice=Decimal('15.00'),
+            stock=10, category=category, seller=cls.seller, thumbnail='https://example.com/t.png',
+            images=['https://example.com/1.png', 'https://example.com/2.png'], ingredients=['honey'],
+            sizes=['500ml', '1L'], color=['Golden'], preparationTime='0', servingSize='1 spoon',
+        )
+        # no category, no images or sizes, no original price, no reviews
+        cls.bare = Product.objects.create(name='Plain', price=Decimal('0.99'), stock=0, seller=cls.seller, isAvailable=False)
+        Review.objects.create(product=cls.full, user=cls.customer, rating=5, comment='Great')
+        Review.objects.create(product=cls.full, user=cls.seller, rating=2, comment='')
+
+    def assertSameOutput(self, expected, actual):
+        self.assertEqual(dumps(expected), dumps(actual))
+
+    def test_products(self):
+        queryset = (Product.objects.annotate(rating_avg=Avg('reviews__rating'), review_count=Count('reviews'))
+                    .select_related('category', 'seller').order_by('pk'))
+        for fields, expand in PRODUCT_FIELDSETS:
+            with self.subTest(fields=fields, expand=expand):
+                fieldset = {'fields': parse_fieldset(fields), 'expand': parse_fieldset(expand)}
+                expected = ProductSerializer(queryset, many=True, **fieldset).data
+                self.assertEqual(len(expected), 2)
+                self.assertSameOutput(expected, FastProductSerializer(queryset, **fieldset).data)
+
+    def test_reviews(self):
+        queryset = Review.objects.select_related('user').order_by('pk')
+        for fields, expand in REVIEW_FIELDSETS:
+            with self.subTest(fields=fields, expand=expand):
+                fieldset = {'fields': parse_fieldset(fields), 'expand': parse_fieldset(expand)}
+                self.assertSameOutput(
+                    ReviewSerializer(queryset, many=True, **fieldset).data, FastReviewSerializer(queryset, **fieldset).data,
+                )
+
+    def test_list_endpoints(self):
+        client = APIClient()
+        paths = [('/api/products/', PRODUCT_FIELDSETS), (f'/api/products/{self.full.product_id}/reviews/', REVIEW_FIELDSETS)]
+        for path, fieldsets in paths:
+            for fields, expand in fieldsets:
+                params = {'fields': fields, 'expand': expand}
+                with self.subTest(path=path, **params):
+                    with override_settings(FAST_SERIALIZERS=False):
+                        expected = client.get(path, params)
+                    with override_settings(FAST_SERIALIZERS=True):
+                        actual = client.get(path, params)
+                    self.assertEqual(expected.status_code, 200)
+                    self.assertEqual(len(expected.json()['data']), 2)
+                    self.assertEqual(expected.json(), actual.json())
+
+
+class AsyncViewParityTestCase(TestCase):
+    """The async read views answer exactly as the sync views at the same URLs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(email='seller@example.com', role='seller', first_name='Sam')
+        customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+        honey = Category.objects.create(name='Honey', slug='honey')
+        jam = Category.objects.create(name='Jam', slug='jam')
+        for index in range(12):
+            Product.objects.create(
+                name=f'Jar {index:02}', description='Raw honey' if index % 3 else 'Berry jam',
+                price=Decimal('2.50') * (index + 1), stock=index, seller=seller,
+                category=honey if index % 3 else jam, isAvailable=index != 4, sizes=['1L'] if index % 2 else [],
+            )
+        cls.product = Product.objects.get(name='Jar 05')
+        Review.objects.create(product=cls.product, user=customer, rating=4, comment='Good')
+        Review.objects.create(product=cls.product, user=seller, rating=2, comment='')
+        Review.objects.create(product=Product.objects.get(name='Jar 07'), user=customer, rating=5, comment='')
+
+    def assertSameResponse(self, path, view, params=None, **kwargs):
+        for fast in (True, False):
+            with self.subTest(path=path, params=params, fast=fast), override_settings(FAST_SERIALIZERS=fast):
+                expected = APIClient().get(path, params)
+                request = AsyncRequestFactory().get(path, params)
+                actual = async_to_sync(view.as_view())(request, **kwargs)
+                self.assertEqual(actual.status_code, expected.status_code)
+                self.assertEqual(json.loads(actual.content), expected.json())
+
+    def test_product_list(self):
+        for params in [
+            {}, {'page': 2}, {'page': 'last', 'limit': 5}, {'limit': 3, 'page': 3}, {'page': 9}, {'limit': 500},
+            {'search': 'jam'}, {'category': 'honey', 'ordering': '-price'}, {'min_price': '10', 'max_price': '20'},
+            {'isAvailable': 'false'}, {'rating': '3', 'ordering': 'rating_avg'}, {'ordering': 'name', 'limit': 4},
+            {'fields': 'name,price', 'ordering': '-created_at'}, {'expand': 'seller', 'limit': 2},
+        ]:
+            self.assertSameResponse('/api/products/', AsyncProductListView, params)
+
+    def test_category_list(self):
+        for params in [{}, {'search': 'ja'}, {'limit': 1, 'page': 2}]:
+            self.assertSameResponse('/api/products/categories/', AsyncCategoryListView, params)
+
+    def test_product_detail(self):
+        product_id = self.product.product_id
+        for params in [{}, {'fields': 'name,rating'}, {'expand': 'seller'}]:
+            self.assertSameResponse(f'/api/products/{product_id}/', AsyncProductDetailView, params, product_id=product_id)
+        self.assertSameResponse('/api/products/P-NOPE/', AsyncProductDetailView, product_id='P-NOPE')
+
+    def test_review_list(self):
+        product_id = self.product.product_id
+        for params in [{}, {'fields': 'rating'}, {'expand': 'user'}]:
+            self.assertSameResponse(f'/api/products/{product_id}/reviews/', AsyncReviewListView, params, product_id=product_id)
@@ -1,21 +1,38 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     CategoryListCreateView,
     CategoryDetailView,
     ProductListCreateView,
     ProductDetailView,
-    ReviewListCreateView
+    ReviewListCreateView,
+    AsyncCategoryListView,
+    AsyncProductListView,
+    AsyncProductDetailView,
+    AsyncReviewListView,
 )
 
+if settings.ASYNC_VIEWS:
+    # async GETs, writes fall through to the sync views
+    category_list_view = AsyncCategoryListView.as_sync_fallback(CategoryListCreateView)
+    product_list_view = AsyncProductListView.as_sync_fallback(ProductListCreateView)
+    product_detail_view = AsyncProductDetailView.as_sync_fallback(ProductDetailView)
+    review_list_view = AsyncReviewListView.as_sync_fallback(ReviewListCreateView)
+else:
+    category_list_view = CategoryListCreateView.as_view()
+    product_list_view = ProductListCreateView.as_view()
+    product_detail_view = ProductDetailView.as_view()
+    review_list_view = ReviewListCreateView.as_view()
+
 urlpatterns = [
     # Category
-    path('categories/', CategoryListCreateView.as_view(), name='category-list-create'),
+    path('categories/', category_list_view, name='category-list-create'),
     path('categories/<str:cat_id>/', CategoryDetailView.as_view(), name='category-detail'),
 
     # Product
-    path('', ProductListCreateView.as_view(), name='product-list-create'),
-    path('<str:product_id>/', ProductDetailView.as_view(), name='product-detail'),
+    path('', product_list_view, name='product-list-create'),
+    path('<str:product_id>/', product_detail_view, name='product-detail'),
 
     # Reviews
-    path('<str:product_id>/reviews/', ReviewListCreateView.as_view(), name='product-reviews'),
+    path('<str:product_id>/reviews/', review_list_view, name='product-reviews'),
 ]
\ No newline at end of file
@@ -1,12 +1,20 @@
 from rest_framework import generics, filters, status
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Product, Category, Review
-from .serializers import ProductSerializer, CategorySerializer, ReviewSerializer
+from .serializers import (
+    ProductSerializer, CategorySerializer, ReviewSerializer, FastProductSerializer, FastReviewSerializer,
+)
 from .filters import ProductFilter
+from django.conf import settings
 from django.utils.text import slugify
 from account.permission import IsAdmin,IsSeller,IsAdminOrSeller,ReadOnlyOrAdmin,ReadOnlyOrAdminOrSeller
 from utils.helpers import Response
-from utils.swagger_helpers import wrapped_response_serializer
+from utils.swagger_helpers import wrapped_response_serializer, FIELDSET_PARAMETERS
+from utils.db_router import ReplicaReadMixin
+from utils.fast_serializers import FastListMixin
+from utils.fieldsets import SparseFieldsMixin, SparseFieldsViewMixin
+from utils.async_views import AsyncAPIView
+from rest_framework.exceptions import NotFound
 from drf_spectacular.utils import extend_schema_view, extend_schema
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from django.db.models import Avg, Count
@@ -28,12 +36,15 @@ from django.db.models import Avg, Count
         responses=wrapped_response_serializer(CategorySerializer)
     )
 )
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(ReplicaReadMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [ReadOnlyOrAdminOrSeller]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'slug']
+    ordering_fields = []
+    # a stable order, so pages do not overlap or skip rows
+    ordering = ['id']
 
     def perform_create(self, serializer):
         validated_data = serializer.validated_data
@@ -99,7 +110,7 @@ class CategoryListCreateView(generics.ListCreateAPIView):
         responses=wrapped_response_serializer()
     )
 )
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(ReplicaReadMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [ReadOnlyOrAdminOrSeller]
@@ -152,6 +163,7 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
         summary="List Products (Public)",
         description="Retrieve all products with filtering, search, and sorting.",
         request=None,
+        parameters=FIELDSET_PARAMETERS,
         responses=wrapped_response_serializer(ProductSerializer, many=True)
     ),
     post=extend_schema(
@@ -161,17 +173,20 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
         responses=wrapped_response_serializer(ProductSerializer)
     )
 )
-class ProductListCreateView(generics.ListCreateAPIView):
-    queryset = Product.objects.annotate(
+class ProductListCreateView(ReplicaReadMixin, FastListMixin, SparseFieldsViewMixin, generics.ListCreateAPIView):
+    queryset = Product.objects.select_related('category', 'seller').annotate(
         rating_avg=Avg('reviews__rating'),
         review_count=Count('reviews')
     ).all()
     serializer_class = ProductSerializer
+    fast_serializer_class = FastProductSerializer
     permission_classes = [ReadOnlyOrAdminOrSeller]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = ProductFilter
     search_fields = ['name', 'description']
     ordering_fields = ['price', 'rating_avg', 'created_at', 'name']
+    # a stable order, so pages do not overlap or skip rows
+    ordering = ['id']
 
     def perform_create(self, serializer):
         serializer.save(seller=self.request.user)
@@ -213,6 +228,7 @@ class ProductListCreateView(generics.ListCreateAPIView):
         summary="Retrieve Product (Public)",
         description="Get details of a specific product.",
         request=None,
+        parameters=FIELDSET_PARAMETERS,
         responses=wrapped_response_serializer(ProductSerializer)
     ),
     put=extend_schema(
@@ -234,7 +250,7 @@ class ProductListCreateView(generics.ListCreateAPIView):
         responses=wrapped_response_serializer()
     )
 )
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetailView(ReplicaReadMixin, SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Product.objects.annotate(
         rating_avg=Avg('reviews__rating'),
         review_count=Count('reviews')
@@ -297,6 +313,7 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     get=extend_schema(
         summary="List Reviews (Public)",
         description="Retrieve all reviews for a specific product.",
+        parameters=FIELDSET_PARAMETERS,
         responses=wrapped_response_serializer(ReviewSerializer, many=True)
     ),
     post=extend_schema(
@@ -306,8 +323,9 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
         responses=wrapped_response_serializer(ReviewSerializer)
     )
 )
-class ReviewListCreateView(generics.ListCreateAPIView):
+class ReviewListCreateView(ReplicaReadMixin, FastListMixin, SparseFieldsViewMixin, generics.ListCreateAPIView):
     serializer_class = ReviewSerializer
+    fast_serializer_class = FastReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
@@ -353,3 +371,99 @@ class ReviewListCreateView(generics.ListCreateAPIView):
             status=status.HTTP_400_BAD_REQUEST,
             errors=serializer.errors
         )
+
+
+# ---------------- Async (ASGI) read views ----------------
+# Native async versions of the public reads, served when ASYNC_VIEWS is on.
+# Filtering, search, ordering and pagination reuse the sync views' backends and
+# settings so the responses are identical; writes are passed to the sync views.
+
+class AsyncListMixin:
+    sync_view_class = None
+
+    def filter_queryset(self, request, queryset):
+        for backend in self.sync_view_class.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, self)
+        return queryset
+
+    async def paginated_list(self, request, queryset, serializer_class):
+        context = {'request': request}
+        fast_serializer_class = getattr(self.sync_view_class, 'fast_serializer_class', None)
+        if fast_serializer_class is not None and settings.FAST_SERIALIZERS:
+            fast_serializer = fast_serializer_class(context=context)
+            queryset, serializer_class = fast_serializer.values(queryset), fast_serializer_class
+        elif issubclass(serializer_class, SparseFieldsMixin):
+            queryset = queryset.defer(*serializer_class(context=context).get_deferred_fields())
+        paginator = self.sync_view_class.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, request)
+        serializer = serializer_class(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class AsyncCategoryListView(AsyncListMixin, AsyncAPIView):
+    sync_view_class = CategoryListCreateView
+    search_fields = CategoryListCreateView.search_fields
+    ordering_fields = CategoryListCreateView.ordering_fields
+    ordering = CategoryListCreateView.ordering
+    replica_reads = True
+
+    async def get(self, request, *args, **kwargs):
+        request = self.get_drf_request(request)
+        queryset = self.filter_queryset(request, Category.objects.all())
+        return await self.paginated_list(request, queryset, CategorySerializer)
+
+
+class AsyncProductListView(AsyncListMixin, AsyncAPIView):
+    sync_view_class = ProductListCreateView
+    filterset_class = ProductListCreateView.filterset_class
+    search_fields = ProductListCreateView.search_fields
+    ordering_fields = ProductListCreateView.ordering_fields
+    ordering = ProductListCreateView.ordering
+    replica_reads = True
+
+    async def get(self, request, *args, **kwargs):
+        request = self.get_drf_request(request)
+        # selects category and seller, which cannot lazy-load in async code
+        queryset = self.filter_queryset(request, ProductListCreateView.queryset.all())
+        return await self.paginated_list(request, queryset, ProductSerializer)
+
+
+class AsyncProductDetailView(AsyncAPIView):
+    replica_reads = True
+
+    async def get(self, request, product_id):
+        context = {'request': request}
+        queryset = ProductDetailView.queryset.select_related('category', 'seller')
+        queryset = queryset.defer(*ProductSerializer(context=context).get_deferred_fields())
+        try:
+            instance = await queryset.aget(product_id=product_id)
+        except Product.DoesNotExist:
+            raise NotFound("No Product matches the given query.")
+        serializer = ProductSerializer(instance, context=context)
+        return Response(
+            success=True,
+            status=status.HTTP_200_OK,
+            message="Product details retrieved.",
+            data=serializer.data
+        )
+
+
+class AsyncReviewListView(AsyncAPIView):
+    replica_reads = True
+
+    async def get(self, request, product_id):
+        context = {'request': request}
+        queryset = Review.objects.filter(product__product_id=product_id)
+        if settings.FAST_SERIALIZERS:
+            rows = FastReviewSerializer(context=context).values(queryset)
+            serializer = FastReviewSerializer([row async for row in rows], context=context)
+        else:
+            queryset = queryset.select_related('user')
+            queryset = queryset.defer(*ReviewSerializer(context=context).get_deferred_fields())
+            serializer = ReviewSerializer([review async for review in queryset], many=True, context=context)
+        return Response(
+            success=True,
+            status=status.HTTP_200_OK,
+            message="Reviews fetched successfully.",
+            data=serializer.data
+        )
@@ -0,0 +1,37 @@
+from django.contrib import admin
+
+from .models import RequestProfile
+
+FUNCTION_SORTS = ('cumtime_ms', 'tottime_ms', 'calls')
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status', 'duration_ms', 'db_ms', 'query_count', 'user')
+    list_filter = ('method', 'status', 'created_at')
+    search_fields = ('path',)
+    ordering = ('-created_at',)
+    list_per_page = 50
+    fields = ('created_at', 'user', 'method', 'path', 'status', 'duration_ms', 'db_ms', 'query_count')
+    readonly_fields = fields
+    change_form_template = 'admin/utils/requestprofile/change_form.html'
+
+    # profiles are written by the middleware only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        profile = self.get_object(request, object_id)
+        sort = request.GET.get('sort')
+        if sort not in FUNCTION_SORTS:
+            sort = FUNCTION_SORTS[0]
+        extra_context = {
+            **(extra_context or {}),
+            'sort': sort,
+            'functions': sorted(profile.functions, key=lambda row: row[sort], reverse=True) if profile else [],
+            'queries': profile.queries if profile else [],
+        }
+        return super().change_view(request, object_id, form_url, extra_context)
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class UtilsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "utils"
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from .instrumentation import install_query_recorder, install_serializer_timing
+
+        if getattr(settings, 'INSTRUMENTATION_ENABLED', True):
+            connection_created.connect(install_query_recorder, dispatch_uid='utils.record_query')
+            install_serializer_timing()
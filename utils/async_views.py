@@ -0,0 +1,113 @@
+# utils/async_views.py
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .db_router import read_from_replica
+from .exceptions import custom_exception_handler
+from .helpers import Response, render_response
+from .throttling import DatabaseStore, get_store
+
+
+class _ThrottleRequest:
+    """
+    The parts of a DRF request the throttle classes read. Async views do not
+    authenticate through DRF, so requests are throttled as anonymous.
+    """
+
+    def __init__(self, request):
+        self.META = request.META
+        self.method = request.method
+        self.user = AnonymousUser()
+
+
+class AsyncAPIView(View):
+    """
+    Base class for native async (ASGI) endpoints. Like APIView it is CSRF
+    exempt, applies the configured throttles and returns the standard response
+    envelope, but it runs on the event loop without a sync_to_async hop per
+    request. Handlers must be `async def` and return a helpers.Response.
+
+    Methods without an async handler are passed to `sync_view` (the regular
+    DRF view for the same URL) when one is set, so an endpoint can serve its
+    reads natively and keep its writes on the sync code path.
+    """
+    throttle_scope = None
+    sync_view = None
+    # serve anonymous requests from a read replica (see utils/db_router.py)
+    replica_reads = False
+
+    @classmethod
+    def as_sync_fallback(cls, sync_view_class, **initkwargs):
+        return cls.as_view(sync_view=sync_view_class.as_view(), **initkwargs)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        return self._dispatch(request, *args, **kwargs)
+
+    async def _dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        if self.sync_view is not None and not hasattr(self, method):
+            # the sync view does its own authentication and throttling
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+        wait = await self.check_throttles(request)
+        if wait is not None:
+            response = Response(
+                success=False,
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                message=str(Throttled(wait).detail),
+                errors={},
+            )
+            response['Retry-After'] = str(int(wait + 0.999))
+            return render_response(response)
+
+        try:
+            if self.replica_reads and not request.headers.get('Authorization'):
+                # anonymous reads cannot have a read-your-writes pin
+                with read_from_replica():
+                    response = await super().dispatch(request, *args, **kwargs)
+            else:
+                response = await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            response = custom_exception_handler(exc, {'view': self})
+        if hasattr(response, 'accepted_renderer') or not hasattr(response, 'render'):
+            return response
+        return render_response(response)
+
+    async def check_throttles(self, request):
+        throttle_request = _ThrottleRequest(request)
+        if isinstance(get_store(), DatabaseStore):
+            return await sync_to_async(self._check_throttles)(throttle_request)
+        return self._check_throttles(throttle_request)
+
+    def _check_throttles(self, request):
+        waits = []
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, self):
+                waits.append(throttle.wait() or 0)
+        return max(waits) if waits else None
+
+    def get_drf_request(self, request):
+        """Wrap the Django request for filter backends and pagination (no authentication)."""
+        return Request(request)
+
+    def get_data(self, request):
+        """Parse the JSON request body. Raises ValueError on malformed input."""
+        if not request.body:
+            return {}
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError("JSON object expected")
+        return data
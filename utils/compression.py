@@ -0,0 +1,149 @@
+# utils/compression.py
+import gzip
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from .metrics import record_cache
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+
+def _gzip(data):
+    # mtime=0 keeps the output stable, so equal bodies compress to equal bytes
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _brotli(data):
+    # quality 4-5 is the usual trade-off for dynamic responses
+    return brotli.compress(data, quality=4)
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+# Content-Encoding token -> compress function, for the encodings available here
+ENCODERS = {'gzip': _gzip}
+if brotli is not None:
+    ENCODERS['br'] = _brotli
+if zstandard is not None:
+    ENCODERS['zstd'] = _zstd
+
+DEFAULT_CONTENT_TYPES = ['application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript']
+
+ACCEPT_ENCODING_RE = _lazy_re_compile(r'\s*([^\s;,]+)\s*(?:;\s*q=([0-9.]+))?')
+
+
+def parse_accept_encoding(header):
+    """{encoding: q} from an Accept-Encoding header; a q of 0 means refused."""
+    accepted = {}
+    for part in header.split(','):
+        match = ACCEPT_ENCODING_RE.match(part)
+        if match:
+            try:
+                accepted[match[1].lower()] = float(match[2]) if match[2] else 1.0
+            except ValueError:
+                continue
+    return accepted
+
+
+def choose_encoding(header, preference):
+    """The first encoding in `preference` the client accepts, or None."""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0)
+    for encoding in preference:
+        if encoding in ENCODERS and accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with zstd, brotli (when installed) or gzip,
+    whichever comes first in COMPRESSION_ENCODINGS and is accepted by the
+    client.
+
+    Only non-streaming responses to GET/HEAD whose content type is in
+    COMPRESSION_CONTENT_TYPES and whose body is at least COMPRESSION_MIN_SIZE
+    bytes are compressed. Token-issuing endpoints are POSTs, so secrets are
+    never compressed next to reflected input (BREACH).
+
+    Compressed bodies are cached by a digest of the uncompressed body, so a
+    body served many times (catalog pages, cached responses) is compressed
+    once and then only hashed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.preference = getattr(settings, 'COMPRESSION_ENCODINGS', ['zstd', 'br', 'gzip'])
+        self.content_types = set(getattr(settings, 'COMPRESSION_CONTENT_TYPES', DEFAULT_CONTENT_TYPES))
+        self.cache_timeout = getattr(settings, 'COMPRESSION_CACHE_TIMEOUT', 300)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not self.should_compress(request, response):
+            return response
+
+        # the representation depends on Accept-Encoding even when not compressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''), self.preference)
+        if encoding is None:
+            return response
+
+        compressed = self.compress(encoding, response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # the compressed bytes differ, so a strong validator no longer holds
+            response.headers['ETag'] = 'W/' + etag
+        return response
+
+    def should_compress(self, request, response):
+        if request.method not in ('GET', 'HEAD') or response.streaming:
+            return False
+        if response.has_header('Content-Encoding') or len(response.content) < self.min_size:
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type in self.content_types
+
+    def compress(self, encoding, content):
+        if not self.cache_timeout:
+            return ENCODERS[encoding](content)
+        cache = caches[getattr(settings, 'COMPRESSION_CACHE_ALIAS', 'default')]
+        key = f'compress:{encoding}:{hashlib.blake2b(content, digest_size=16).hexdigest()}'
+        compressed = cache.get(key)
+        record_cache('compression', compressed is not None)
+        if compressed is None:
+            compressed = ENCODERS[encoding](content)
+            cache.set(key, compressed, self.cache_timeout)
+        return compressed
@@ -0,0 +1,98 @@
+# utils/db_router.py
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# alias of the replica the current request reads from, None means primary
+_read_alias = ContextVar('read_alias', default=None)
+
+PIN_KEY = 'db:pin-primary:{}'
+
+
+def pick_replica():
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    return random.choice(replicas) if replicas else None
+
+
+@contextmanager
+def read_from_replica():
+    """Route reads inside the block to one replica (for exports and reports)."""
+    token = _read_alias.set(pick_replica())
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def pin_to_primary(user):
+    """Send `user`'s reads to the primary for a few seconds after a write."""
+    cache.set(PIN_KEY.format(user.pk), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    if not user or not user.is_authenticated:
+        return False
+    return cache.get(PIN_KEY.format(user.pk)) is not None
+
+
+class ReplicaRouter:
+    """
+    Writes always go to `default`. Reads go to a replica only inside a
+    replica-read context (ReplicaReadMixin or read_from_replica()), so
+    everything else, checkout included, keeps reading from the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaReadMixin:
+    """
+    For DRF views: serve safe-method requests from a replica unless the user
+    wrote something in the last REPLICA_PIN_SECONDS (read-your-writes).
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(request.user):
+            self._replica_token = _read_alias.set(pick_replica())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _read_alias.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaPinMiddleware:
+    """Marks users who just made a successful write so their reads stay on the primary."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and getattr(settings, 'DATABASE_REPLICAS', None)
+        ):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user)
+        return response
@@ -1,10 +1,10 @@
 # utils/exceptions.py
-# import logging
+import logging
 from rest_framework.views import exception_handler
 from utils.helpers import Response
 from django.db import DatabaseError
 
-# logger = logging.getLogger(__name__)
+logger = logging.getLogger(__name__)
 
 def custom_exception_handler(exc, context):
     # Use DRF's default exception handler first
@@ -12,7 +12,7 @@ def custom_exception_handler(exc, context):
     view = context.get('view', None)
 
     if response is not None:
-        # logger.warning(f"Handled Exception in {view}: {exc}")
+        logger.info(f"Handled Exception in {view}: {exc}")
         data = response.data
         if isinstance(data, dict):
             message = data.get('detail', str(exc))
@@ -25,15 +25,20 @@ def custom_exception_handler(exc, context):
             message = str(exc)
             errors = {}
         
-        return Response(
+        custom_response = Response(
             success=False,
             status=response.status_code,
             message=message,
             errors=errors
         )
+        # keep headers DRF attached to the error (Retry-After, WWW-Authenticate)
+        for header in ('Retry-After', 'WWW-Authenticate'):
+            if header in response:
+                custom_response[header] = response[header]
+        return custom_response
 
     # Unhandled exceptions (e.g. DB or configuration errors)
-    # logger.error(f"Unhandled Exception in {view}: {exc}", exc_info=True)
+    logger.error(f"Unhandled Exception in {view}: {exc}", exc_info=True)
     if isinstance(exc, DatabaseError):
         message = "Database error occurred. Please try again later."
     else:
@@ -0,0 +1,223 @@
+# utils/fast_serializers.py
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Prefetch, QuerySet
+from django.db.models.query import ValuesListIterable
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from .fieldsets import ALL, get_request_fieldset
+from .instrumentation import timed
+
+# DRF fields whose to_representation() returns database values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.IntegerField,
+    serializers.ChoiceField,
+    serializers.ListField,
+    serializers.ReadOnlyField,
+)
+
+# plan entry kinds
+VALUE, OPTIONAL, NESTED, COMPUTED, MANY = range(5)
+
+
+class FastSerializer:
+    """
+    Read-only, compiled counterpart of a DRF serializer for list endpoints.
+
+    The field plan is built once from `serializer_class`: model fields, dotted
+    sources, slug related fields and nested serializers become values_list()
+    columns, and rows are turned into dicts without creating model instances
+    or running DRF fields that would return the value unchanged. Fields that
+    cannot be derived from the serializer are declared on the subclass:
+
+    - `lookups`: {field: column} for StringRelatedFields and
+      SerializerMethodFields that just read a (related) column
+    - `computed`: {field: (columns, func)}, func gets the column values
+    - `many`: {field: FastSerializer subclass} for nested many=True
+      serializers, loaded with one extra query per page; a
+      Prefetch(source, queryset=...) on the list queryset narrows them the
+      same way it does for the DRF serializer
+
+    `serializer_class` must use SparseFieldsMixin; `?fields=`/`?expand=` from
+    the request in `context` select the plan, so unrequested columns are
+    never selected. Overrides of the serializer's to_representation() are not
+    applied; `manage.py bench_serializers` asserts the output stays identical.
+    """
+    serializer_class = None
+    lookups = {}
+    computed = {}
+    many = {}
+
+    # compiled plans per (fields, expand) combination
+    max_plans = 256
+
+    def __init__(self, rows=None, many=True, context=None, fields=ALL, expand=ALL, prefetches=None):
+        # `many` only makes it a drop-in for serializer_class(rows, many=True)
+        if fields is ALL and expand is ALL and context:
+            fields, expand = get_request_fieldset(context.get('request'))
+        self.fields, self.expand = fields, expand
+        self.plan, self.columns = self.get_plan(fields, expand)
+        self.prefetches = prefetches or {}
+        if isinstance(rows, QuerySet) and rows._iterable_class is not ValuesListIterable:
+            self.prefetches = prefetch_querysets(rows)
+            rows = self.values(rows)
+        self.rows = rows
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return self.serialize(self.rows)
+
+    @classmethod
+    def get_plan(cls, fields=ALL, expand=ALL):
+        """Returns (plan, columns) for a fieldset, compiled on first use."""
+        plans = cls.__dict__.get('_plans')
+        if plans is None:
+            plans = cls._plans = {}
+        key = (repr(fields), repr(expand))
+        if key not in plans:
+            if len(plans) >= cls.max_plans:
+                plans.clear()
+            columns = []
+            serializer = cls.serializer_class(fields=fields, expand=expand)
+            plan = cls.compile(serializer, '', columns)
+            if any(entry[0] == MANY for entry in plan):
+                columns.append('pk')
+            plans[key] = plan, columns
+        return plans[key]
+
+    @classmethod
+    def compile(cls, serializer, prefix, columns):
+        def column(name):
+            if name not in columns:
+                columns.append(name)
+            return columns.index(name)
+
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = prefix + field.source.replace('.', '__')
+
+            if isinstance(field, serializers.ListSerializer):
+                if prefix or name not in cls.many:
+                    raise ImproperlyConfigured(f"{cls.__name__}.many must declare '{name}'.")
+                child = field.child
+                plan.append((MANY, name, (cls.many[name], child._fieldset, child._expand), field.source))
+            elif isinstance(field, serializers.BaseSerializer):
+                pk = column(f'{source}__{field.Meta.model._meta.pk.name}')
+                plan.append((NESTED, name, pk, cls.compile(field, source + '__', columns)))
+            elif not prefix and name in cls.lookups:
+                plan.append((VALUE, name, column(cls.lookups[name]), None))
+            elif not prefix and name in cls.computed:
+                lookups, func = cls.computed[name]
+                plan.append((COMPUTED, name, [column(lookup) for lookup in lookups], func))
+            elif isinstance(field, serializers.SlugRelatedField):
+                plan.append((VALUE, name, column(f'{source}__{field.slug_field}'), None))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                plan.append((VALUE, name, column(f'{source}__pk'), None))
+            elif isinstance(field, (serializers.RelatedField, serializers.SerializerMethodField)):
+                raise ImproperlyConfigured(f"{cls.__name__}.lookups or .computed must declare '{name}'.")
+            else:
+                convert = None if isinstance(field, PASSTHROUGH_FIELDS) else field.to_representation
+                if '.' in field.source:
+                    # DRF leaves the key out when the related object is missing
+                    guard = column(source.rsplit('__', 1)[0])
+                    plan.append((OPTIONAL, name, (column(source), guard), convert))
+                else:
+                    plan.append((VALUE, name, column(source), convert))
+        return plan
+
+    def values(self, queryset, *extra):
+        """`queryset` reduced to the plan's columns, plus `extra` ones at the end."""
+        return queryset.values_list(*self.columns, *extra)
+
+    def serialize(self, rows):
+        """Turn rows from values() into the same dicts the DRF serializer returns."""
+        rows = list(rows)
+        data = [self.build(self.plan, row) for row in rows]
+        for kind, name, (child_class, fields, expand), source in (e for e in self.plan if e[0] == MANY):
+            pk = len(self.columns) - 1
+            child = child_class(fields=fields, expand=expand)
+            children = child.fetch_for(
+                self.serializer_class.Meta.model, source, [row[pk] for row in rows], self.prefetches.get(source),
+            )
+            for item, row in zip(data, rows):
+                item[name] = children.get(row[pk], [])
+        return data
+
+    def fetch_for(self, parent_model, source, parent_pks, queryset=None):
+        """Serialize the `source` related objects of `parent_pks` (out of `queryset`), grouped by parent pk."""
+        fk = parent_model._meta.get_field(source).field.name
+        if queryset is None:
+            queryset = self.serializer_class.Meta.model.objects.all()
+        rows = list(self.values(queryset.filter(**{f'{fk}__in': parent_pks}).order_by('pk'), fk))
+        grouped = defaultdict(list)
+        for row, item in zip(rows, self.serialize(rows)):
+            grouped[row[-1]].append(item)
+        return grouped
+
+    @staticmethod
+    def build(plan, row):
+        item = {}
+        for kind, name, index, convert in plan:
+            if kind == VALUE:
+                value = row[index]
+                item[name] = value if value is None or convert is None else convert(value)
+            elif kind == OPTIONAL:
+                if row[index[1]] is None:
+                    continue
+                value = row[index[0]]
+                item[name] = value if value is None or convert is None else convert(value)
+            elif kind == NESTED:
+                item[name] = None if row[index] is None else FastSerializer.build(convert, row)
+            elif kind == COMPUTED:
+                item[name] = convert(*(row[i] for i in index))
+            else:
+                item[name] = None  # keeps the key order, filled in by serialize()
+        return item
+
+
+def prefetch_querysets(queryset):
+    """{relation: queryset} of the Prefetch() lookups on `queryset`, which values_list() drops."""
+    return {
+        lookup.prefetch_to: lookup.queryset for lookup in queryset._prefetch_related_lookups
+        if isinstance(lookup, Prefetch) and lookup.queryset is not None
+    }
+
+
+class FastListMixin:
+    """
+    For generic list views: serialize lists with `fast_serializer_class`
+    instead of the DRF serializer on safe methods when FAST_SERIALIZERS is on.
+    """
+    fast_serializer_class = None
+
+    def use_fast_serializer(self):
+        return (
+            self.fast_serializer_class is not None
+            and settings.FAST_SERIALIZERS
+            and self.request.method in SAFE_METHODS
+        )
+
+    def get_fast_serializer(self, rows=None):
+        return self.fast_serializer_class(
+            rows, context=self.get_serializer_context(), prefetches=getattr(self, 'fast_prefetches', None),
+        )
+
+    def paginate_queryset(self, queryset):
+        if self.use_fast_serializer():
+            # the page holds tuples, so keep the Prefetch() querysets for get_serializer()
+            self.fast_prefetches = prefetch_querysets(queryset)
+            queryset = self.get_fast_serializer().values(queryset)
+        return super().paginate_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and self.use_fast_serializer():
+            return self.get_fast_serializer(args[0])
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,126 @@
+# utils/fieldsets.py
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+# parsed parameters that are not a nested {name: subtree} dict
+ALL = None
+
+
+def parse_fieldset(value):
+    """
+    Parse 'name,price,category.name' into {'name': {}, 'price': {}, 'category': {'name': {}}}.
+    An empty subtree means the whole field. Returns None for a missing or blank value.
+    """
+    if not value:
+        return ALL
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree or ALL
+
+
+def get_request_fieldset(request):
+    """(fields, expand) trees from the query string; only read requests are pruned."""
+    if request is None or request.method not in SAFE_METHODS:
+        return ALL, ALL
+    params = getattr(request, 'query_params', request.GET)
+    return parse_fieldset(params.get(FIELDS_PARAM)), parse_fieldset(params.get(EXPAND_PARAM))
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets. `?fields=name,price,category.name`
+    keeps only the listed readable fields, and `?expand=seller` swaps in the
+    nested serializers declared in `expandable_fields`, given as
+    {field: (serializer_class, kwargs)}. Dotted names reach into nested
+    serializers that use the mixin too.
+
+    The top-level serializer reads the parameters from the request in its
+    context. Pass `fields`/`expand` (parsed trees) to set them explicitly.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=ALL, expand=ALL, **kwargs):
+        self._fieldset = fields
+        self._expand = expand
+        super().__init__(*args, **kwargs)
+
+    def is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self._fieldset is ALL and self._expand is ALL and self.is_top_level():
+            self._fieldset, self._expand = get_request_fieldset(self.context.get('request'))
+        sparse, expand = self._fieldset, self._expand or {}
+
+        for name, subtree in expand.items():
+            if name in self.expandable_fields:
+                serializer_class, kwargs = self.expandable_fields[name]
+                fields[name] = serializer_class(read_only=True, **kwargs)
+            elif not isinstance(self.nested_serializer(fields.get(name)), SparseFieldsMixin):
+                raise ValidationError({
+                    'detail': f"Invalid '{EXPAND_PARAM}' parameter.",
+                    EXPAND_PARAM: [f"'{name}' cannot be expanded."],
+                })
+
+        if sparse:
+            readable = {name for name, field in fields.items() if not field.write_only}
+            unknown = sorted(set(sparse) - readable)
+            if unknown:
+                raise ValidationError({
+                    'detail': f"Invalid '{FIELDS_PARAM}' parameter.",
+                    FIELDS_PARAM: [f"Unknown field(s): {', '.join(unknown)}."],
+                })
+            # expanded fields count as requested
+            for name in readable - set(sparse) - set(expand):
+                del fields[name]
+
+        # hand the dotted parts down to nested serializers
+        for name, field in fields.items():
+            nested = self.nested_serializer(field)
+            if isinstance(nested, SparseFieldsMixin):
+                nested._fieldset = (sparse or {}).get(name) or ALL
+                nested._expand = expand.get(name) or ALL
+        return fields
+
+    @staticmethod
+    def nested_serializer(field):
+        return field.child if isinstance(field, serializers.ListSerializer) else field
+
+    def get_deferred_fields(self):
+        """Model columns none of the readable fields use, for queryset.defer()."""
+        # SerializerMethodFields (source '*') are expected to read related objects only
+        used = {
+            field.source.split('.')[0]
+            for field in self.fields.values() if not field.write_only
+        }
+        return [
+            field.name for field in self.Meta.model._meta.concrete_fields
+            if not field.primary_key and not field.is_relation and field.name not in used
+        ]
+
+
+class SparseFieldsViewMixin:
+    """
+    For generic views whose serializer uses SparseFieldsMixin: defers the
+    model columns a read request did not ask for, so they are never fetched.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in SAFE_METHODS:
+            deferred = self.get_serializer().get_deferred_fields()
+            if deferred:
+                queryset = queryset.defer(*deferred)
+        return queryset
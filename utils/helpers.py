@@ -29,3 +29,17 @@ def Response(success=True, status=200, message="Request successful", data=None,
         response["meta"] = meta
 
     return DRFResponse(response, status=status)
+
+
+def render_response(response):
+    """
+    Render a Response built outside DRF's view machinery (plain Django or
+    async views), using the first configured renderer.
+    """
+    from rest_framework.settings import api_settings
+
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    response.accepted_renderer = renderer
+    response.accepted_media_type = renderer.media_type
+    response.renderer_context = {}
+    return response.render()
@@ -0,0 +1,214 @@
+# utils/instrumentation.py
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework import serializers
+
+from . import metrics as prometheus
+
+logger = logging.getLogger(__name__)
+
+# metrics of the request being handled, None outside instrumented requests
+_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings collected while handling one request (all durations in seconds)."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = Counter()
+        self.query_time = Counter()
+        self.timings = {'serialize': 0.0, 'render': 0.0}
+        self._depth = Counter()
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def add_query(self, sql, duration):
+        self.db_time += duration
+        self.queries[sql] += 1
+        self.query_time[sql] += duration
+
+    def duplicate_queries(self, limit=5):
+        """The most repeated statements, the usual sign of an N+1 pattern."""
+        return [
+            {'sql': sql[:300], 'count': count}
+            for sql, count in self.queries.most_common(limit) if count > 1
+        ]
+
+    def slowest_queries(self, limit=50):
+        """Statements by total time spent in them, with their run counts."""
+        return [
+            {'sql': sql, 'count': self.queries[sql], 'ms': round(duration * 1000, 3)}
+            for sql, duration in self.query_time.most_common(limit)
+        ]
+
+
+def get_metrics():
+    return _metrics.get()
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's `name` timing."""
+    metrics = _metrics.get()
+    if metrics is None:
+        yield
+        return
+    # nested blocks (a serializer calling another's .data) are counted once
+    metrics._depth[name] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._depth[name] -= 1
+        if not metrics._depth[name]:
+            metrics.timings[name] += time.perf_counter() - start
+
+
+# ---------------- Hooks ----------------
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper feeding the current request's metrics."""
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver: wrap every connection's queries once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _timed_data(prop):
+    def data(self):
+        with timed('serialize'):
+            return prop.fget(self)
+    return property(data)
+
+
+def install_serializer_timing():
+    """Time `.data` on DRF serializers, where to_representation() runs."""
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, '_timed', False):
+            cls.data = _timed_data(cls.data)
+            cls.data.fget._timed = True
+
+
+# ---------------- Middleware ----------------
+
+def is_staff(user):
+    return bool(
+        user and user.is_authenticated
+        and (getattr(user, 'is_staff', False) or getattr(user, 'role', None) == 'admin')
+    )
+
+
+class InstrumentationMiddleware:
+    """
+    Records wall time, database time and query count, serializer time and
+    render time per request.
+
+    - Staff users (and everyone when DEBUG) get a Server-Timing header.
+    - Requests slower than SLOW_REQUEST_MS are logged as one JSON line with
+      the most repeated SQL statements.
+    - Requests running the same statement DUPLICATE_QUERY_THRESHOLD times or
+      more are logged as a likely N+1, however fast they were.
+    - With METRICS_ENABLED, latency, query counts and requests in flight are
+      recorded for the /metrics endpoint.
+
+    Keep it first in MIDDLEWARE so the wall time covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'SLOW_REQUEST_MS', 500)
+        self.duplicate_threshold = getattr(settings, 'DUPLICATE_QUERY_THRESHOLD', 10)
+        self.export_metrics = getattr(settings, 'METRICS_ENABLED', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        self.request_started()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.request_finished()
+            _metrics.reset(token)
+        return self.process_response(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        self.request_started()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.request_finished()
+            _metrics.reset(token)
+        return self.process_response(request, response, metrics)
+
+    def request_started(self):
+        if self.export_metrics:
+            prometheus.REQUESTS_IN_FLIGHT.inc()
+
+    def request_finished(self):
+        if self.export_metrics:
+            prometheus.REQUESTS_IN_FLIGHT.dec()
+
+    def process_response(self, request, response, metrics):
+        total = time.perf_counter() - metrics.start
+        if self.export_metrics:
+            prometheus.observe_request(request, response, metrics, total)
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or is_staff(user):
+            response['Server-Timing'] = self.server_timing(metrics, total)
+
+        duplicates = metrics.duplicate_queries()
+        is_slow = total * 1000 >= self.slow_ms
+        has_n_plus_one = bool(duplicates) and duplicates[0]['count'] >= self.duplicate_threshold
+        if is_slow or has_n_plus_one:
+            logger.warning(json.dumps({
+                'event': 'slow_request' if is_slow else 'duplicate_queries',
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'user': user.pk if user is not None and user.is_authenticated else None,
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(metrics.db_time * 1000, 1),
+                'queries': metrics.query_count,
+                'serialize_ms': round(metrics.timings['serialize'] * 1000, 1),
+                'render_ms': round(metrics.timings['render'] * 1000, 1),
+                'duplicate_queries': duplicates,
+            }))
+        return response
+
+    @staticmethod
+    def server_timing(metrics, total):
+        return ', '.join([
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.query_count} queries"',
+            f"serialize;dur={metrics.timings['serialize'] * 1000:.1f}",
+            f"render;dur={metrics.timings['render'] * 1000:.1f}",
+        ])
@@ -0,0 +1,56 @@
+# utils/loadgen.py
+import http.client
+import threading
+import time
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[max(int(len(sorted_values) * fraction) - 1, 0)]
+
+
+def run_load(port, path, concurrency, duration, host='localhost', address='127.0.0.1'):
+    """
+    Hammer GET `path` from `concurrency` client threads for `duration`
+    seconds. Returns req/s, p50/p99 latency in ms and the error count.
+    """
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client():
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            conn = http.client.HTTPConnection(address, port, timeout=30)
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path, headers={'Host': host})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    failed += 1
+            except OSError:
+                failed += 1
+            finally:
+                conn.close()
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'errors': sum(errors),
+    }
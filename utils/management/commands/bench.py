@@ -0,0 +1,274 @@
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from rest_framework.test import APIClient
+
+from account.models import User
+from order.models import Order
+from product.models import Product
+from utils.loadgen import percentile
+
+SEED = 42
+# fixed, so every run benchmarks the same rows
+SEED_UNTIL = datetime(2026, 1, 1)
+# per scale unit, as seed_db's defaults
+SCALE_UNIT = {'sellers': 5, 'users': 50, 'products': 100, 'reviews': 600, 'orders': 100}
+
+# latency changes below this are noise, whatever the percentage
+MIN_DELTA_MS = 0.5
+
+
+class Case:
+    def __init__(self, name, method, path, user=None, data=None, rounds=1.0, rollback=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.user = user
+        self.data = data
+        # fraction of --rounds, for cases dominated by password hashing
+        self.rounds = rounds
+        # writes run in a rolled back transaction, so every round sees the same data
+        self.rollback = rollback
+
+
+def build_cases(product, customer, order):
+    products = '/api/products/'
+    cases = [
+        Case('product_list', 'get', products),
+        Case('product_filter_category', 'get', products + '?category=spices'),
+        Case('product_filter_price', 'get', products + '?min_price=500&max_price=1500'),
+        Case('product_filter_rating', 'get', products + '?rating=4'),
+        Case('product_filter_available', 'get', products + '?isAvailable=true'),
+    ]
+    for field in ('price', 'rating_avg', 'created_at', 'name'):
+        cases.append(Case(f'product_order_{field}', 'get', f'{products}?ordering={field}'))
+        cases.append(Case(f'product_order_-{field}', 'get', f'{products}?ordering=-{field}'))
+    cases += [
+        Case('product_search', 'get', products + '?search=honey'),
+        Case('product_detail', 'get', f'{products}{product.product_id}/'),
+        Case('review_list', 'get', f'{products}{product.product_id}/reviews/'),
+        Case('order_list_customer', 'get', '/api/orders/', user='customer'),
+        Case('order_list_admin', 'get', '/api/orders/', user='admin'),
+        Case('order_search_id', 'get', f'/api/orders/?search={order.order_id}', user='admin'),
+        Case('order_search_id_prefix', 'get', f'/api/orders/?search={order.order_id[:8]}', user='admin'),
+        Case('order_search_customer', 'get', f'/api/orders/?search={customer.email}', user='admin'),
+        Case('order_filter_date', 'get',
+             '/api/orders/?created_at__gte=2025-12-01T00:00:00Z&created_at__lte=2025-12-08T00:00:00Z', user='admin'),
+        Case('order_create', 'post', '/api/orders/', user='customer', rollback=True, data={
+            'items': [{'product_id': product.product_id, 'quantity': 1}],
+            'paymentMethod': 'COD',
+            'profile': {
+                'first_name': customer.first_name, 'last_name': customer.last_name, 'email': customer.email,
+                'phone': customer.phone, 'address': customer.address, 'city': customer.city,
+                'postal_code': customer.postal_code,
+            },
+        }),
+        Case('login', 'post', '/api/accounts/login/', rounds=0.1, rollback=True,
+             data={'email': customer.email, 'password': 'customer123'}),
+    ]
+    return cases
+
+
+CASE_NAMES = [case.name for case in build_cases(Product(product_id='x'), User(), Order(order_id='x'))]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the API end to end: seed a test database at a fixed scale, drive the real endpoints '
+        'through APIClient, write latency percentiles, queries and allocations per request to JSON, and '
+        'optionally fail on regressions against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Dataset size in multiples of seed_db defaults')
+        parser.add_argument('--rounds', type=int, default=50, help='Measured requests per case')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per case')
+        parser.add_argument('--alloc-rounds', type=int, default=3, help='Requests per case traced for allocations')
+        parser.add_argument('--cases', nargs='+', choices=CASE_NAMES, help='Run only these cases')
+        parser.add_argument('--output', default='bench-results.json')
+        parser.add_argument('--compare', metavar='BASELINE', help='Fail on regressions against this results file')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed latency/allocation growth before it counts as a regression')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the test database, reseeding only when the scale changed')
+
+    def handle(self, *args, **options):
+        baseline = self.load(options['compare']) if options['compare'] else None
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            with override_settings(DEBUG=False, THROTTLE_ENABLED=False):
+                self.seed(options['scale'])
+                results = self.run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(baseline, results, options['tolerance'])
+            if regressions:
+                raise CommandError(f'{regressions} regression(s) against {options["compare"]}.')
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+
+    def seed(self, scale):
+        counts = {table: count * scale for table, count in SCALE_UNIT.items()}
+        if Product.objects.count() == counts['products'] and User.objects.filter(role='customer').count() == counts['users']:
+            return
+        self.stdout.write(f'Seeding scale {scale}...')
+        call_command('seed_db', clear=True, seed=SEED, until=SEED_UNTIL, stdout=io.StringIO(), **counts)
+
+    def run(self, options):
+        product = Product.objects.order_by('pk').first()
+        customer = User.objects.filter(role='customer').order_by('pk').first()
+        order = Order.objects.order_by('pk').first()
+        clients = {None: APIClient(), 'customer': self.client_for(customer.email, 'customer123'),
+                   'admin': self.client_for('admin@tradifoodi.com', 'admin123')}
+
+        cases = [case for case in build_cases(product, customer, order) if not options['cases'] or case.name in options['cases']]
+        results = {'meta': self.meta(options), 'cases': {}}
+        self.stdout.write(f"{'case':<26} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'queries':>8} {'peak KB':>9}")
+        for case in cases:
+            result = self.measure(case, clients[case.user], options)
+            results['cases'][case.name] = result
+            self.stdout.write(
+                f"{case.name:<26} {result['p50_ms']:8.2f} {result['p90_ms']:8.2f} {result['p99_ms']:8.2f} "
+                f"{result['queries']:8d} {result['alloc_peak_kb']:9.1f}"
+                + ('' if result['ok'] else f"   status {result['status']}")
+            )
+        return results
+
+    def client_for(self, email, password):
+        client = APIClient()
+        response = client.post('/api/accounts/login/', {'email': email, 'password': password}, format='json')
+        if response.status_code != 200:
+            raise CommandError(f'Cannot log in as {email}: {response.status_code}')
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.json()['data']['tokens']['access'])
+        return client
+
+    def request(self, case, client):
+        # compressed like a browser's request would be
+        kwargs = {'HTTP_ACCEPT_ENCODING': 'gzip'}
+        if case.data is not None:
+            kwargs.update(data=case.data, format='json')
+        if not case.rollback:
+            return getattr(client, case.method)(case.path, **kwargs)
+        with transaction.atomic():
+            response = getattr(client, case.method)(case.path, **kwargs)
+            transaction.set_rollback(True)
+        return response
+
+    def measure(self, case, client, options):
+        rounds = max(int(options['rounds'] * case.rounds), 3)
+        for _ in range(options['warmup']):
+            self.request(case, client)
+
+        counter, latencies, statuses = QueryCounter(), [], set()
+        with connection.execute_wrapper(counter):
+            for _ in range(rounds):
+                start = time.perf_counter()
+                response = self.request(case, client)
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses.add(response.status_code)
+
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(options['alloc_rounds']):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                self.request(case, client)
+                peaks.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+        finally:
+            tracemalloc.stop()
+
+        latencies.sort()
+        return {
+            'rounds': rounds,
+            'status': sorted(statuses),
+            'ok': all(status < 400 for status in statuses),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p90_ms': round(percentile(latencies, 0.90), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'queries': round(counter.count / rounds),
+            'alloc_peak_kb': round(statistics.median(peaks), 1) if peaks else 0,
+        }
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+        except OSError:
+            commit = ''
+        return {
+            'created_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit,
+            'scale': options['scale'],
+            'rounds': options['rounds'],
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'machine': platform.machine(),
+        }
+
+    def compare(self, baseline, results, tolerance):
+        """Print the change per case and return the number of regressions."""
+        if baseline.get('meta', {}).get('scale') != results['meta']['scale']:
+            self.stderr.write('Warning: the baseline was recorded at a different scale.')
+        regressions = 0
+        self.stdout.write(f"\n{'case':<26} {'p50 ms':>18} {'queries':>10} {'peak KB':>18}")
+        for name, current in results['cases'].items():
+            previous = baseline.get('cases', {}).get(name)
+            if previous is None:
+                self.stdout.write(f'{name:<26} (not in baseline)')
+                continue
+            problems = []
+            if current['p50_ms'] > previous['p50_ms'] * (1 + tolerance) \
+                    and current['p50_ms'] - previous['p50_ms'] > MIN_DELTA_MS:
+                problems.append('latency')
+            if current['queries'] > previous['queries']:
+                problems.append('queries')
+            if current['alloc_peak_kb'] > previous['alloc_peak_kb'] * (1 + tolerance):
+                problems.append('allocations')
+            if previous['ok'] and not current['ok']:
+                problems.append('errors')
+            regressions += bool(problems)
+            line = (
+                f"{name:<26} {previous['p50_ms']:8.2f} → {current['p50_ms']:7.2f} "
+                f"{previous['queries']:4d} → {current['queries']:3d} "
+                f"{previous['alloc_peak_kb']:8.1f} → {current['alloc_peak_kb']:7.1f}"
+            )
+            self.stdout.write(self.style.ERROR(f"{line}   REGRESSION: {', '.join(problems)}") if problems else line)
+        return regressions
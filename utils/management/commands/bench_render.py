@@ -0,0 +1,56 @@
+import time
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Avg, Count
+from rest_framework.renderers import JSONRenderer
+
+from product.models import Product
+from product.serializers import ProductSerializer
+from utils.helpers import Response
+from utils.renderers import ORJSONRenderer, dump_raw
+
+
+class Command(BaseCommand):
+    help = 'Measure the cost of rendering a page of products with nested categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100, help='Products per page')
+        parser.add_argument('--rounds', type=int, default=200)
+
+    def handle(self, *args, **options):
+        products = list(
+            Product.objects.annotate(rating_avg=Avg('reviews__rating'), review_count=Count('reviews'))
+            .select_related('category', 'seller')[:options['size']]
+        )
+        if not products:
+            raise CommandError('No products found, run seed_db first.')
+        # repeat rows when the database holds fewer products than a page
+        products = list(islice(cycle(products), options['size']))
+        meta = {'total': len(products), 'page': 1, 'limit': len(products), 'totalPages': 1}
+
+        data = self.timed('serialize (ProductSerializer)', options['rounds'],
+                          lambda: ProductSerializer(products, many=True).data)
+        envelope = Response(data=data, meta=meta).data
+
+        drf = JSONRenderer().render(envelope)
+        fast = ORJSONRenderer().render(envelope)
+        raw = dump_raw(data)
+        spliced = ORJSONRenderer().render(Response(data=raw, meta=meta).data)
+        if not drf == fast == spliced:
+            raise CommandError('orjson output differs from JSONRenderer.')
+
+        self.stdout.write(f"{len(products)} products, {len(drf)} bytes, output identical")
+        self.timed('render JSONRenderer', options['rounds'], lambda: JSONRenderer().render(envelope))
+        self.timed('render ORJSONRenderer', options['rounds'], lambda: ORJSONRenderer().render(envelope))
+        # data serialized once up front, e.g. kept in a cache
+        self.timed('render pre-built envelope', options['rounds'],
+                   lambda: ORJSONRenderer().render(Response(data=raw, meta=meta).data))
+
+    def timed(self, label, rounds, func):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            result = func()
+        elapsed = (time.perf_counter() - start) / rounds * 1000
+        self.stdout.write(f"{label:<30} {elapsed:8.3f} ms")
+        return result
@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Avg, Count
+
+from order.models import Order
+from order.serializers import FastOrderSerializer, OrderSerializer
+from product.models import Product, Review
+from product.serializers import FastProductSerializer, FastReviewSerializer, ProductSerializer, ReviewSerializer
+from utils.fieldsets import parse_fieldset
+from utils.renderers import dumps
+
+# (?fields=, ?expand=) combinations checked for each serializer, besides the full output
+FIELDSETS = {
+    'product': [('name,price,thumbnail', ''), ('product_id,category.name,rating', 'seller'), ('', 'seller')],
+    'review': [('rating,comment', ''), ('', 'user')],
+    'order': [('order_id,totalPrice,items.quantity', ''), ('order_id,items.subtotal', 'items.product')],
+}
+
+
+def cases():
+    """(name, queryset as the list view builds it, DRF serializer, fast serializer)"""
+    return [
+        ('product', Product.objects.annotate(rating_avg=Avg('reviews__rating'), review_count=Count('reviews'))
+         .select_related('category', 'seller').order_by('pk'), ProductSerializer, FastProductSerializer),
+        ('review', Review.objects.select_related('user').order_by('pk'), ReviewSerializer, FastReviewSerializer),
+        ('order', Order.objects.select_related('user').prefetch_related('items__product').order_by('pk'),
+         OrderSerializer, FastOrderSerializer),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the fast read-only serializers produce byte-identical output to the DRF '
+        'serializers for every row, then time both on a page of rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100, help='Rows per timed page')
+        parser.add_argument('--rounds', type=int, default=50)
+        parser.add_argument('--check-only', action='store_true', help='Only run the parity check')
+
+    def handle(self, *args, **options):
+        failures = 0
+        for name, queryset, serializer_class, fast_class in cases():
+            for fields, expand in [('', ''), *FIELDSETS[name]]:
+                failures += self.check_parity(name, queryset, serializer_class, fast_class, fields, expand)
+        if failures:
+            raise CommandError(f'{failures} row(s) differ.')
+        if options['check_only']:
+            return
+
+        for name, queryset, serializer_class, fast_class in cases():
+            page = queryset[:options['size']]
+            drf = self.timed(options['rounds'], lambda: serializer_class(page.all(), many=True).data)
+            fast = self.timed(options['rounds'], lambda: fast_class(page.all()).data)
+            self.stdout.write(
+                f"{name:<8} {options['size']} rows   DRF {drf:8.2f} ms   fast {fast:8.2f} ms   "
+                f"{drf / fast:5.1f}x   (queries included)"
+            )
+
+    def check_parity(self, name, queryset, serializer_class, fast_class, fields, expand):
+        fieldset = {'fields': parse_fieldset(fields), 'expand': parse_fieldset(expand)}
+        expected = serializer_class(queryset, many=True, **fieldset).data
+        actual = fast_class(queryset, **fieldset).data
+        if fields or expand:
+            name = f'{name}?fields={fields}&expand={expand}'
+        if len(expected) != len(actual):
+            self.stderr.write(f'{name}: {len(expected)} rows from DRF, {len(actual)} from the fast path')
+            return 1
+        failures = 0
+        for row, fast_row in zip(expected, actual):
+            if dumps(row) != dumps(fast_row):
+                failures += 1
+                self.stderr.write(f'{name} differs:\n  {dumps(row).decode()}\n  {dumps(fast_row).decode()}')
+        self.stdout.write(f'{name} {len(expected)} rows identical' if not failures else f'{name} {failures} differ')
+        return failures
+
+    def timed(self, rounds, func):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        return (time.perf_counter() - start) / rounds * 1000
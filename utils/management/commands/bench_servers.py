@@ -0,0 +1,91 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.loadgen import run_load
+
+DEFAULT_PATHS = [
+    '/api/products/',
+    '/api/products/?category=spices&ordering=-price',
+    '/api/products/categories/',
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Compare gunicorn + sync views against uvicorn + async views on the public catalog reads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200])
+        parser.add_argument('--workers', type=int, default=2, help='Server processes for both servers')
+        parser.add_argument('--threads', type=int, default=8, help='gunicorn gthread threads per worker')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per measurement')
+        parser.add_argument('--pool', action='store_true', help='Run both servers with DB_POOL=True')
+
+    def handle(self, *args, **options):
+        for binary in ('gunicorn', 'uvicorn'):
+            if not shutil.which(binary):
+                raise CommandError(f'{binary} is not installed.')
+
+        servers = {
+            'gunicorn+sync': lambda port: [
+                'gunicorn', 'TFServer.wsgi:application', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['workers']), '--threads', str(options['threads']),
+                '--worker-class', 'gthread', '--log-level', 'warning',
+            ],
+            'uvicorn+async': lambda port: [
+                'uvicorn', 'TFServer.asgi:application', '--port', str(port),
+                '--workers', str(options['workers']), '--log-level', 'warning', '--no-access-log',
+            ],
+        }
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+
+        for name, command in servers.items():
+            port = free_port()
+            env = {
+                **os.environ,
+                'ASYNC_VIEWS': 'True' if name.endswith('async') else 'False',
+                'THROTTLE_ENABLED': 'False',
+                'DEBUG': 'False',
+            }
+            if options['pool']:
+                env['DB_POOL'] = 'True'
+            process = subprocess.Popen(command(port), cwd=settings.BASE_DIR, env=env,
+                                       stdout=sys.stdout, stderr=sys.stderr)
+            try:
+                self.wait_until_ready(port, host)
+                for path in options['paths']:
+                    for concurrency in options['concurrency']:
+                        result = run_load(port, path, concurrency, options['duration'], host=host)
+                        self.stdout.write(
+                            f"{name:<14} c={concurrency:<4} {result['rps']:8.1f} req/s   "
+                            f"p50 {result['p50']:7.1f} ms   p99 {result['p99']:7.1f} ms   "
+                            f"errors {result['errors']:<4} {path}"
+                        )
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    def wait_until_ready(self, port, host, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                result = run_load(port, '/api/products/categories/', 1, 0.01, host=host)
+                if not result['errors']:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'Server on port {port} did not come up.')
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from utils.throttling import ALGORITHMS, STORES, ScopedRateThrottle
+
+
+class BenchView(APIView):
+    throttle_scope = 'bench'
+
+
+class BenchThrottle(ScopedRateThrottle):
+    def get_rate(self, scope):
+        # high enough that every request is allowed: we measure the check itself
+        return '1000000000/h'
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the throttle check for each store and algorithm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+        parser.add_argument('--store', choices=list(STORES), action='append')
+        parser.add_argument('--algorithm', choices=list(ALGORITHMS), action='append')
+        parser.add_argument('--clients', type=int, default=100, help='Distinct client IPs to rotate through')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        view = BenchView()
+        requests = []
+        for i in range(options['clients']):
+            request = view.initialize_request(
+                factory.get('/bench/', REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}')
+            )
+            request.user  # authenticate up front so only the throttle is timed
+            requests.append(request)
+
+        iterations = options['iterations']
+        for store_name in options['store'] or list(STORES):
+            store = STORES[store_name]()
+            for algorithm in options['algorithm'] or list(ALGORITHMS):
+                throttle = BenchThrottle()
+                throttle.store = store
+                throttle.algorithm = algorithm
+
+                timings = []
+                for i in range(iterations):
+                    request = requests[i % len(requests)]
+                    started = time.perf_counter()
+                    throttle.allow_request(request, view)
+                    timings.append(time.perf_counter() - started)
+
+                timings.sort()
+                mean = sum(timings) / iterations
+                p99 = timings[int(iterations * 0.99) - 1]
+                self.stdout.write(
+                    f'{store_name:<9} {algorithm:<15} '
+                    f'mean {mean * 1e6:8.1f} us   p99 {p99 * 1e6:8.1f} us   '
+                    f'{iterations / sum(timings):10.0f} checks/s'
+                )
@@ -0,0 +1,286 @@
+import io
+import logging
+import multiprocessing
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Sum
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from psycopg import IsolationLevel
+from rest_framework.test import APIClient
+
+from account.models import User
+from order.models import DailySales, Order, OrderItem
+from order.rollups import sales_from_orders
+from product.models import Product
+from utils.loadgen import percentile
+from utils.metrics import CHECKOUT_LOCK_WAIT
+
+ISOLATION_LEVELS = {
+    'read-committed': IsolationLevel.READ_COMMITTED,
+    'repeatable-read': IsolationLevel.REPEATABLE_READ,
+    'serializable': IsolationLevel.SERIALIZABLE,
+}
+
+# the exception handler turns database errors into 500s carrying the PostgreSQL message
+DB_FAILURES = {
+    'deadlock detected': 'deadlock',
+    'could not serialize access': 'serialization_failure',
+}
+
+
+def classify(response):
+    if response.status_code == 201 or response.status_code == 200:
+        return 'ok'
+    body = response.json()
+    if response.status_code == 400 and 'Insufficient stock' in str(body.get('errors')):
+        return 'stockout'
+    detail = str((body.get('errors') or {}).get('detail', '')) if isinstance(body.get('errors'), dict) else ''
+    for prefix, outcome in DB_FAILURES.items():
+        if detail.startswith(prefix):
+            return outcome
+    return f'http_{response.status_code}'
+
+
+def buyer_loop(plan, deadline, seed):
+    """One simulated buyer thread: checkouts, and some cancellations by an admin, until the deadline."""
+    rng = random.Random(seed)
+    buyer = APIClient()
+    admin = APIClient()
+    admin.force_authenticate(User.objects.get(pk=plan['admin']))
+    customers = list(User.objects.filter(pk__in=plan['customers']))
+    hot, cold = plan['hot'], plan['cold']
+
+    outcomes, checkout_ms, cancel_ms = Counter(), [], []
+    try:
+        while time.perf_counter() < deadline:
+            size = rng.randint(1, plan['cart_size'])
+            products = set()
+            while len(products) < size:
+                pool = hot if not cold or rng.random() < plan['hot_share'] else cold
+                products.add(rng.choice(pool))
+            customer = rng.choice(customers)
+            buyer.force_authenticate(customer)
+            payload = {
+                'items': [{'product_id': product, 'quantity': rng.randint(1, plan['quantity'])} for product in products],
+                'paymentMethod': 'COD',
+                'profile': {
+                    'first_name': customer.first_name, 'last_name': customer.last_name, 'email': customer.email,
+                    'phone': customer.phone, 'address': customer.address, 'city': customer.city,
+                    'postal_code': customer.postal_code,
+                },
+            }
+            started = time.perf_counter()
+            response = buyer.post('/api/orders/', payload, format='json')
+            checkout_ms.append((time.perf_counter() - started) * 1000)
+            outcome = classify(response)
+            outcomes[outcome] += 1
+
+            if outcome == 'ok' and rng.random() < plan['cancel_rate']:
+                order_id = response.json()['data']['order_id']
+                started = time.perf_counter()
+                response = admin.patch(f'/api/orders/{order_id}/', {'status': 'cancelled'}, format='json')
+                cancel_ms.append((time.perf_counter() - started) * 1000)
+                outcomes[f'cancel_{classify(response)}'] += 1
+    finally:
+        connection.close()
+    return outcomes, checkout_ms, cancel_ms
+
+
+def run_process(args):
+    """A worker process: `threads` buyer threads sharing nothing but the database."""
+    plan, index = args
+    CHECKOUT_LOCK_WAIT.values.clear()
+    deadline = time.perf_counter() + plan['duration']
+    results = []
+
+    def target(seed):
+        results.append(buyer_loop(plan, deadline, seed))
+
+    threads = [threading.Thread(target=target, args=(plan['seed'] * 10_000 + index * 100 + i,))
+               for i in range(plan['threads'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, CHECKOUT_LOCK_WAIT.values.get((), [])
+
+
+def histogram_quantile(buckets, counts, fraction):
+    """Upper bound of the bucket holding the `fraction` quantile (counts include the +Inf bucket)."""
+    total = sum(counts)
+    if not total:
+        return 0
+    cumulative = 0
+    for bound, count in zip((*buckets, float('inf')), counts):
+        cumulative += count
+        if cumulative >= total * fraction:
+            return bound
+    return float('inf')
+
+
+class Command(BaseCommand):
+    help = (
+        'Flash-sale load test of checkout against PostgreSQL: processes x threads of buyers hammer a few '
+        'hot products through the real order endpoints, with some orders cancelled by an admin'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=8, help='Buyer threads per process')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds')
+        parser.add_argument('--hot-products', type=int, default=3, help='Products the sale is about')
+        parser.add_argument('--hot-share', type=float, default=0.9, help='Share of cart lines for hot products')
+        parser.add_argument('--stock', type=int, default=500, help='Starting stock of each hot product')
+        parser.add_argument('--cart-size', type=int, default=3, help='Most distinct products per cart')
+        parser.add_argument('--quantity', type=int, default=2, help='Most units per cart line')
+        parser.add_argument('--cancel-rate', type=float, default=0.1, help='Share of orders cancelled afterwards')
+        parser.add_argument('--buyers', type=int, default=200, help='Distinct customers')
+        parser.add_argument('--isolation', choices=list(ISOLATION_LEVELS), default='read-committed')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'postgresql':
+            raise CommandError('The load test needs the PostgreSQL backend.')
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        db_options = connections.settings['default'].setdefault('OPTIONS', {})
+        db_options['isolation_level'] = ISOLATION_LEVELS[options['isolation']]
+        # every expected failure becomes a counted outcome, not a logged traceback
+        quiet = [logging.getLogger(name) for name in ('utils.exceptions', 'django.request', 'utils.instrumentation')]
+        levels = [logger.level for logger in quiet]
+        try:
+            for logger in quiet:
+                logger.setLevel(logging.CRITICAL)
+            with override_settings(DEBUG=False, THROTTLE_ENABLED=False):
+                plan = self.prepare(options)
+                before = self.snapshot()
+                outcomes, checkout_ms, cancel_ms, lock_wait, elapsed = self.run(plan, options)
+                self.report(options, outcomes, checkout_ms, cancel_ms, lock_wait, elapsed)
+                violations = self.check_stock(before, plan) + self.check_rollup()
+        finally:
+            for logger, level in zip(quiet, levels):
+                logger.setLevel(level)
+            db_options.pop('isolation_level', None)
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        if violations:
+            raise CommandError(f'{violations} stock or sales rollup consistency violation(s).')
+        self.stdout.write(self.style.SUCCESS(
+            'Stock consistent: stock + sold unchanged for every product; sales rollup matches the orders.'
+        ))
+
+    def prepare(self, options):
+        call_command('seed_db', clear=True, seed=options['seed'], users=max(options['buyers'], 1), stdout=io.StringIO())
+        products = list(Product.objects.order_by('pk').values_list('pk', 'product_id'))
+        if options['hot_products'] < 1 or options['hot_products'] > len(products):
+            raise CommandError(f'--hot-products must be between 1 and {len(products)}.')
+        hot = products[:options['hot_products']]
+        Product.objects.filter(pk__in=[pk for pk, _ in hot]).update(stock=options['stock'], sold=0)
+        return {
+            'seed': options['seed'],
+            'duration': options['duration'],
+            'threads': options['threads'],
+            'hot': [product_id for _, product_id in hot],
+            'cold': [product_id for _, product_id in products[options['hot_products']:]],
+            'hot_share': options['hot_share'],
+            'cart_size': options['cart_size'],
+            'quantity': options['quantity'],
+            'cancel_rate': options['cancel_rate'],
+            'admin': User.objects.get(email='admin@tradifoodi.com').pk,
+            'customers': list(User.objects.filter(role='customer').order_by('pk').values_list('pk', flat=True)),
+            'last_order': Order.objects.aggregate(last=Max('pk'))['last'] or 0,
+        }
+
+    def snapshot(self):
+        return {pk: (stock, sold) for pk, stock, sold in Product.objects.values_list('pk', 'stock', 'sold')}
+
+    def run(self, plan, options):
+        self.stdout.write(
+            f"{options['processes']} process(es) x {options['threads']} thread(s), {options['duration']}s, "
+            f"{options['hot_products']} hot product(s) with {options['stock']} in stock, {options['isolation']}"
+        )
+        # forked processes must open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        started = time.perf_counter()
+        with context.Pool(options['processes']) as pool:
+            per_process = pool.map(run_process, [(plan, index) for index in range(options['processes'])])
+        elapsed = time.perf_counter() - started
+
+        outcomes, checkout_ms, cancel_ms = Counter(), [], []
+        lock_wait = [0] * (len(CHECKOUT_LOCK_WAIT.buckets) + 2)
+        for threads, histogram in per_process:
+            for thread_outcomes, thread_checkout, thread_cancel in threads:
+                outcomes.update(thread_outcomes)
+                checkout_ms += thread_checkout
+                cancel_ms += thread_cancel
+            lock_wait = CHECKOUT_LOCK_WAIT.merge(lock_wait, histogram) if histogram else lock_wait
+        return outcomes, sorted(checkout_ms), sorted(cancel_ms), lock_wait, elapsed
+
+    def report(self, options, outcomes, checkout_ms, cancel_ms, lock_wait, elapsed):
+        self.stdout.write(
+            f"checkouts   {len(checkout_ms):>7,}   {outcomes['ok'] / elapsed:8.1f} orders/s   "
+            f"p50 {percentile(checkout_ms, 0.5):7.1f} ms   p99 {percentile(checkout_ms, 0.99):7.1f} ms"
+        )
+        if cancel_ms:
+            self.stdout.write(
+                f"cancels     {len(cancel_ms):>7,}   {len(cancel_ms) / elapsed:8.1f} /s        "
+                f"p50 {percentile(cancel_ms, 0.5):7.1f} ms   p99 {percentile(cancel_ms, 0.99):7.1f} ms"
+            )
+        locks = sum(lock_wait[:-1])
+        if locks:
+            self.stdout.write(
+                f"lock waits  {locks:>7,}   mean {lock_wait[-1] / locks * 1000:7.2f} ms   "
+                f"p99 <= {histogram_quantile(CHECKOUT_LOCK_WAIT.buckets, lock_wait[:-1], 0.99) * 1000:g} ms"
+            )
+        for outcome in ('ok', 'stockout', 'deadlock', 'serialization_failure'):
+            self.stdout.write(f'  {outcome:<30} {outcomes.pop(outcome, 0):>7,}')
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f'  {outcome:<30} {count:>7,}')
+
+    def check_stock(self, before, plan):
+        """stock + sold must not change, and sold must match the items of live orders."""
+        violations = 0
+        after = self.snapshot()
+        sold_in_run = dict(
+            OrderItem.objects.filter(order__pk__gt=plan['last_order']).exclude(order__status='cancelled')
+            .values_list('product').annotate(quantity=Sum('quantity'))
+        )
+        for pk, (stock, sold) in before.items():
+            new_stock, new_sold = after[pk]
+            expected_sold = sold + sold_in_run.get(pk, 0)
+            if new_stock + new_sold != stock + sold or new_sold != expected_sold:
+                violations += 1
+                self.stderr.write(
+                    f'product {pk}: stock {stock} -> {new_stock}, sold {sold} -> {new_sold} '
+                    f'(expected sold {expected_sold})'
+                )
+        return violations
+
+    def check_rollup(self):
+        """DailySales must equal the sales recomputed from the orders."""
+        violations = 0
+        rollup = {
+            (row.date, row.product_id): (row.units, row.revenue, row.order_lines)
+            for row in DailySales.objects.exclude(order_lines=0)
+        }
+        expected = {
+            (row['date'], row['product']): (row['units'], row['revenue'], row['order_lines'])
+            for row in sales_from_orders()
+        }
+        for key in sorted(rollup.keys() | expected.keys()):
+            if rollup.get(key) != expected.get(key):
+                violations += 1
+                self.stderr.write(f'sales of product {key[1]} on {key[0]}: {rollup.get(key)} (expected {expected.get(key)})')
+        return violations
@@ -0,0 +1,100 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test.utils import override_settings
+
+from utils.loadgen import run_load
+
+MODES = {
+    # a new connection per request (the old behaviour)
+    'none': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}},
+    # one long-lived connection per worker thread
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': {}},
+    # psycopg3 pool shared by the worker threads
+    'pool': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {'pool': {'min_size': 2, 'max_size': 8}}},
+}
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    """
+    WSGI server handling requests on a fixed set of threads, like gunicorn's
+    gthread worker, so thread-local database connections are actually reused.
+    """
+    daemon_threads = True
+
+    def __init__(self, *args, workers=8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='wsgi')
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test an endpoint against the configured PostgreSQL database with a new '
+        'connection per request, persistent connections and a psycopg3 pool'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/products/categories/')
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+        parser.add_argument('--workers', type=int, default=8, help='Server worker threads')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mode')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'postgresql':
+            raise CommandError('The load test needs the PostgreSQL backend.')
+
+        self.stdout.write(
+            f"GET {options['path']}  concurrency={options['concurrency']} "
+            f"workers={options['workers']} duration={options['duration']}s"
+        )
+        for mode in options['modes']:
+            with override_settings(THROTTLE_ENABLED=False, DEBUG=False):
+                result = self.run_mode(mode, options)
+            self.stdout.write(
+                f"{mode:<11} {result['rps']:8.1f} req/s   p50 {result['p50']:7.1f} ms   "
+                f"p99 {result['p99']:7.1f} ms   errors {result['errors']}"
+            )
+
+    def run_mode(self, mode, options):
+        db_settings = connections.settings['default']
+        original = {key: db_settings.get(key) for key in MODES[mode]}
+        db_settings.update(MODES[mode])
+        if mode == 'pool':
+            db_settings['OPTIONS']['pool']['max_size'] = options['workers']
+
+        server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(),
+            server_class=lambda *a, **kw: PooledWSGIServer(*a, workers=options['workers'], **kw),
+            handler_class=QuietHandler,
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            return self.drive(server.server_port, options)
+        finally:
+            server.shutdown()
+            server.executor.shutdown(wait=True)
+            server.server_close()
+            if mode == 'pool':
+                connections['default'].close_pool()
+            db_settings.update(original)
+
+    def drive(self, port, options):
+        return run_load(
+            port, options['path'], options['concurrency'], options['duration'],
+            host=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost',
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from utils.throttling import DatabaseStore
+
+
+class Command(BaseCommand):
+    help = 'Delete expired rows from the database throttle store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = DatabaseStore().purge(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired throttle buckets.'))
@@ -0,0 +1,311 @@
+# utils/metrics.py
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    """
+    Metrics of this process, plus the aggregation of every worker's metrics
+    when METRICS_DIR is set.
+
+    Each process keeps its values in memory and writes a snapshot to
+    METRICS_DIR/<pid>.json at most every METRICS_FLUSH_SECONDS. A scrape
+    served by any worker merges all snapshots: counters and histograms are
+    summed over every file, so values from restarted workers are not lost,
+    and gauges are summed over live processes only. Empty the directory
+    before the server starts.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.last_write = 0.0
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered.")
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        """{metric name: {label values: value}} of this process."""
+        for metric in self.metrics.values():
+            metric.refresh()
+        with self.lock:
+            return {
+                name: {key: list(value) if isinstance(value, list) else value
+                       for key, value in metric.values.items()}
+                for name, metric in self.metrics.items()
+            }
+
+    # ---------------- Multiprocess ----------------
+
+    @staticmethod
+    def directory():
+        return getattr(settings, 'METRICS_DIR', '')
+
+    def maybe_write(self):
+        """Write this process's snapshot if the last one is old enough."""
+        if self.directory() and time.monotonic() - self.last_write >= settings.METRICS_FLUSH_SECONDS:
+            self.write()
+
+    def write(self):
+        directory = self.directory()
+        if not directory:
+            return
+        self.last_write = time.monotonic()
+        data = {
+            name: [[list(key), value] for key, value in values.items()]
+            for name, values in self.snapshot().items()
+        }
+        os.makedirs(directory, exist_ok=True)
+        # write then rename, so a scrape never reads half a file
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, os.path.join(directory, f'{os.getpid()}.json'))
+
+    def collect(self):
+        """Values of all processes, merged as described on the class."""
+        merged = self.snapshot()
+        directory = self.directory()
+        if not directory or not os.path.isdir(directory):
+            return merged
+
+        for filename in os.listdir(directory):
+            pid, ext = os.path.splitext(filename)
+            if ext != '.json' or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = pid_alive(int(pid))
+            for name, samples in data.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.type == 'gauge' and not alive):
+                    continue
+                values = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    values[key] = metric.merge(values.get(key), value)
+        return merged
+
+    # ---------------- Exposition ----------------
+
+    def exposition(self):
+        """All metrics in the Prometheus text format."""
+        values = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(values[name].items()):
+                lines.extend(metric.samples(dict(zip(metric.labelnames, key)), value))
+        return '\n'.join(lines) + '\n'
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.write)
+
+
+# ---------------- Metric types ----------------
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = registry.lock
+        registry.register(self)
+
+    def key(self, labels):
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError:
+            raise ValueError(f"'{self.name}' needs the labels {', '.join(self.labelnames)}.") from None
+
+    def refresh(self):
+        """Hook to update values right before a snapshot."""
+
+    def merge(self, current, other):
+        return (current or 0) + other
+
+    def samples(self, labels, value):
+        return [f'{self.name}{format_labels(labels)} {format_value(value)}']
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down. `function` computes it at snapshot time."""
+    type = 'gauge'
+
+    def __init__(self, *args, function=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.function = function
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def refresh(self):
+        if self.function is not None:
+            self.set(self.function())
+
+
+class Histogram(Metric):
+    """Per label set: [count per bucket..., count above the last bucket, sum]."""
+    type = 'histogram'
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def merge(self, current, other):
+        if current is None:
+            return list(other)
+        return [a + b for a, b in zip(current, other)]
+
+    def samples(self, labels, value):
+        lines, cumulative = [], 0
+        for bound, count in zip((*self.buckets, float('inf')), value[:-1]):
+            cumulative += count
+            le = format_labels({**labels, 'le': format_value(bound)})
+            lines.append(f'{self.name}_bucket{le} {cumulative}')
+        lines.append(f'{self.name}_sum{format_labels(labels)} {format_value(value[-1])}')
+        lines.append(f'{self.name}_count{format_labels(labels)} {cumulative}')
+        return lines
+
+
+# ---------------- Application metrics ----------------
+
+def _hash_queue_depth():
+    from account.hashers import hash_queue_depth
+    return hash_queue_depth()
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request.', ('view', 'method'),
+)
+REQUESTS = Counter(
+    'http_requests_total', 'Requests handled.', ('view', 'method', 'status'),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests being handled, summed over workers.',
+)
+DB_QUERIES = Counter(
+    'db_queries_total', 'Database queries run while handling requests.', ('view',),
+)
+DB_QUERY_TIME = Counter(
+    'db_query_duration_seconds_total', 'Time spent in database queries while handling requests.', ('view',),
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by result (hit or miss).', ('cache', 'result'),
+)
+CHECKOUT_LOCK_WAIT = Histogram(
+    'checkout_lock_wait_seconds', 'Time spent acquiring product row locks at checkout.',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+STOCKOUT_REJECTIONS = Counter(
+    'checkout_stockout_rejections_total', 'Checkouts rejected for insufficient stock.',
+)
+HASH_QUEUE_DEPTH = Gauge(
+    'password_hash_queue_depth', 'Password hashing jobs waiting for a pool thread.',
+    function=_hash_queue_depth,
+)
+
+
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def observe_request(request, response, metrics, total):
+    """Record a finished request from its instrumentation RequestMetrics."""
+    match = getattr(request, 'resolver_match', None)
+    # unresolved paths share one label, so scanners cannot blow up the series count
+    view = match.view_name if match is not None else 'unmatched'
+    method = request.method if request.method in HTTP_METHODS else 'other'
+    REQUEST_LATENCY.observe(total, view=view, method=method)
+    REQUESTS.inc(view=view, method=method, status=response.status_code)
+    DB_QUERIES.inc(metrics.query_count, view=view)
+    DB_QUERY_TIME.inc(metrics.db_time, view=view)
+    REGISTRY.maybe_write()
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('value', models.FloatField()),
+                ('expires_at', models.FloatField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import models
+
+
+# Shared throttle state for utils.throttling.DatabaseStore
+class ThrottleBucket(models.Model):
+    key = models.CharField(max_length=255, primary_key=True)
+    value = models.FloatField()
+    expires_at = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+# Stored by utils.profiling.ProfilingMiddleware, browsed in the admin
+class RequestProfile(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    status = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    db_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    # [{function, calls, primitive_calls, tottime_ms, cumtime_ms}]
+    functions = models.JSONField(default=list)
+    # [{sql, count, ms}], slowest first
+    queries = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -1,3 +1,6 @@
+import math
+from types import SimpleNamespace
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from .helpers import Response
 
@@ -19,3 +22,35 @@ class CustomPagination(PageNumberPagination):
                 "totalPages": self.page.paginator.num_pages
             }
         )
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Async counterpart of paginate_queryset for AsyncAPIView: counts with
+        acount() and fetches the page with async iteration. `request` must be
+        a DRF Request (for query_params). Sets self.page so
+        get_paginated_response() produces the same envelope.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        count = await queryset.acount()
+        num_pages = max(math.ceil(count / page_size), 1)
+
+        page_number = request.query_params.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            page_number = num_pages
+        try:
+            page_number = int(page_number)
+            if page_number < 1 or page_number > num_pages:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message="Invalid page."
+            ))
+
+        bottom = (page_number - 1) * page_size
+        objects = [obj async for obj in queryset[bottom:bottom + page_size]]
+        self.page = SimpleNamespace(
+            number=page_number,
+            paginator=SimpleNamespace(count=count, num_pages=num_pages),
+        )
+        return objects
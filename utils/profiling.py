@@ -0,0 +1,194 @@
+# utils/profiling.py
+import cProfile
+import os
+import pstats
+import sysconfig
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from account.permission import IsSuperAdmin
+from .instrumentation import get_metrics
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+
+# rows kept per profile: the top functions by own time and by cumulative time
+TOP_FUNCTIONS = 40
+TOP_QUERIES = 50
+
+# cProfile hooks the interpreter, so only one request per process is profiled at a time
+_profiling = threading.Lock()
+
+# shown relative to site-packages, the standard library or the project
+_PATH_PREFIXES = sorted(
+    {str(settings.BASE_DIR), *(sysconfig.get_paths()[name] for name in ('purelib', 'platlib', 'stdlib'))},
+    key=len, reverse=True,
+)
+
+
+def wants_profile(request):
+    return request.GET.get(PROFILE_PARAM) == '1' or request.headers.get(PROFILE_HEADER) == '1'
+
+
+def authorize(request):
+    """
+    The superuser asking for a profile, or None. API clients authenticate
+    with JWT, which Django's middleware does not see, so DRF's authenticators
+    run here; only profiling requests pay for it.
+    """
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        allowed = IsSuperAdmin().has_permission(drf_request, None)
+    except APIException:
+        return None
+    return drf_request.user if allowed else None
+
+
+def take_budget():
+    """Count a profile against PROFILE_RATE_LIMIT per minute, shared through the cache."""
+    key = f'profile:budget:{int(time.time() // 60)}'
+    cache.add(key, 0, 90)
+    try:
+        return cache.incr(key) <= settings.PROFILE_RATE_LIMIT
+    except ValueError:  # the key expired in between
+        return False
+
+
+def short_path(filename):
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def hot_functions(profiler):
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, callers) in pstats.Stats(profiler).stats.items():
+        rows.append({
+            'function': f'{short_path(filename)}:{line}({name})' if line else name,
+            'calls': nc,
+            'primitive_calls': cc,
+            'tottime_ms': round(tt * 1000, 3),
+            'cumtime_ms': round(ct * 1000, 3),
+        })
+    by_own = sorted(rows, key=lambda row: row['tottime_ms'], reverse=True)[:TOP_FUNCTIONS]
+    by_cumulative = sorted(rows, key=lambda row: row['cumtime_ms'], reverse=True)[:TOP_FUNCTIONS]
+    kept = {row['function']: row for row in by_own + by_cumulative}
+    return sorted(kept.values(), key=lambda row: row['cumtime_ms'], reverse=True)
+
+
+def save_profile(request, user, response, profiler, duration):
+    from .models import RequestProfile
+
+    metrics = get_metrics()
+    profile = RequestProfile.objects.create(
+        user=user,
+        method=request.method,
+        path=request.get_full_path()[:2048],
+        status=response.status_code,
+        duration_ms=round(duration * 1000, 3),
+        db_ms=round(metrics.db_time * 1000, 3) if metrics else 0,
+        query_count=metrics.query_count if metrics else 0,
+        functions=hot_functions(profiler),
+        queries=metrics.slowest_queries(TOP_QUERIES) if metrics else [],
+    )
+    stale = RequestProfile.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)[settings.PROFILE_KEEP:]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+    return profile
+
+
+class ProfilingMiddleware:
+    """
+    Runs a request under cProfile when a superuser adds `?_profile=1` or an
+    `X-Profile: 1` header, and stores the hot functions and the SQL log as a
+    RequestProfile, listed in the admin. Everyone else is served normally.
+
+    Safe to leave on: at most PROFILE_RATE_LIMIT profiles a minute across
+    workers (through the cache), one at a time per process, and only the
+    latest PROFILE_KEEP are kept. Profiled responses get an `X-Profile`
+    header with the profile id or the reason it was skipped.
+
+    Under ASGI only code on the event loop thread is profiled, which
+    includes other requests served meanwhile; sync views run in a thread
+    pool, so profile them under WSGI. The SQL log is complete either way.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not wants_profile(request):
+            return self.get_response(request)
+        user = authorize(request)
+        if user is None:
+            return self.get_response(request)
+        skipped = self.skip_reason()
+        if skipped:
+            response = self.get_response(request)
+            response[PROFILE_HEADER] = f'skipped; reason={skipped}'
+            return response
+
+        profiler = cProfile.Profile()
+        try:
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+        finally:
+            _profiling.release()
+        profile = save_profile(request, user, response, profiler, duration)
+        response[PROFILE_HEADER] = str(profile.pk)
+        return response
+
+    async def __acall__(self, request):
+        if not wants_profile(request):
+            return await self.get_response(request)
+        user = await sync_to_async(authorize)(request)
+        if user is None:
+            return await self.get_response(request)
+        skipped = await sync_to_async(self.skip_reason)()
+        if skipped:
+            response = await self.get_response(request)
+            response[PROFILE_HEADER] = f'skipped; reason={skipped}'
+            return response
+
+        profiler = cProfile.Profile()
+        try:
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+        finally:
+            _profiling.release()
+        profile = await sync_to_async(save_profile)(request, user, response, profiler, duration)
+        response[PROFILE_HEADER] = str(profile.pk)
+        return response
+
+    @staticmethod
+    def skip_reason():
+        """None after taking the profiling lock, otherwise why the request is not profiled."""
+        if not _profiling.acquire(blocking=False):
+            return 'busy'
+        if not take_budget():
+            _profiling.release()
+            return 'rate-limit'
+        return None
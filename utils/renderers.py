@@ -0,0 +1,102 @@
+# utils/renderers.py
+import datetime
+import decimal
+
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+from .instrumentation import timed
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+
+ENVELOPE_KEYS = ('success', 'status', 'message', 'data', 'errors', 'meta')
+
+
+class RawJSON(bytes):
+    """
+    Already serialized JSON. Pass it as `data` to helpers.Response and the
+    renderer splices the bytes into the envelope instead of re-encoding them.
+    """
+
+
+def default(obj):
+    """Types orjson does not handle natively, encoded like DRF's JSONEncoder."""
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, decimal.Decimal):
+        # serializers already coerce decimals to strings; raw values match DRF
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__'):
+        return (list if isinstance(obj, (list, tuple)) else dict)(obj)
+    if hasattr(obj, '__iter__'):
+        return tuple(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _escape_separators(content):
+    # keep DRF's guarantee that output is a strict JavaScript subset
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+def dumps(data):
+    """Serialize with the renderer's encoding rules."""
+    return _escape_separators(orjson.dumps(data, default=default, option=OPTIONS))
+
+
+def dump_raw(data):
+    """Serialize `data` once so it can be reused as a RawJSON payload."""
+    return RawJSON(dumps(data))
+
+
+def render_envelope(envelope):
+    """
+    Write the response envelope around pre-serialized `data` bytes, producing
+    the same bytes as rendering the whole dict.
+    """
+    parts = []
+    for key in ENVELOPE_KEYS:
+        if key not in envelope:
+            continue
+        value = envelope[key]
+        parts.append(b'"' + key.encode() + b'":' + (value if key == 'data' else dumps(value)))
+    return b'{' + b','.join(parts) + b'}'
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer using orjson. Decimals,
+    datetimes (UTC as 'Z') and UUIDs are encoded the way DRF encodes them, so
+    the output is byte-identical for compact JSON.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b''
+
+        raw = isinstance(data, dict) and isinstance(data.get('data'), RawJSON)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # pretty printing is for humans; let DRF honour the exact indent
+            if raw:
+                data = {**data, 'data': orjson.loads(bytes(data['data']))}
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if raw:
+            return render_envelope(data)
+        return dumps(data)
@@ -1,3 +1,4 @@
+from drf_spectacular.utils import OpenApiParameter
 from rest_framework import serializers
 
 class MetaSerializer(serializers.Serializer):
@@ -6,6 +7,16 @@ class MetaSerializer(serializers.Serializer):
     limit = serializers.IntegerField(help_text="Items per page")
     totalPages = serializers.IntegerField(help_text="Total number of pages")
 
+# ?fields= / ?expand= on reads whose serializer uses utils.fieldsets.SparseFieldsMixin
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        'fields', str, description="Comma-separated fields to return; dotted names select nested fields (e.g. `name,price,category.name`)."
+    ),
+    OpenApiParameter(
+        'expand', str, description="Comma-separated relations to return as nested objects."
+    ),
+]
+
 def wrapped_response_serializer(data_serializer=None, many=False, name=None):
     """
     Dynamically creates a serializer that wraps the data_serializer 
@@ -0,0 +1,610 @@
+import copy
+import datetime
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from account.models import User
+from account.views import get_tokens_for_user
+from product.models import Category
+from .compression import ENCODERS, CompressionMiddleware
+from .db_router import read_from_replica
+from .helpers import Response
+from .metrics import CONTENT_TYPE, Counter, Gauge, Histogram, Registry
+from .instrumentation import InstrumentationMiddleware, RequestMetrics, _metrics, get_metrics, timed
+from .renderers import ORJSONRenderer, dump_raw
+from .models import RequestProfile, ThrottleBucket
+from .profiling import _profiling
+from .throttling import CacheStore, DatabaseStore, LocMemStore, parse_rate, sliding_window, token_bucket
+from .trigram import create_trigram_indexes, drop_trigram_indexes, trigram_available
+
+# 3 requests per 3 seconds: one token refills every second
+LIMIT, PERIOD = 3, 3.0
+NOW = 1_000_000.0
+
+
+class ParseRateTestCase(SimpleTestCase):
+    def test_rates(self):
+        self.assertEqual(parse_rate('10/min'), (10, 60))
+        self.assertEqual(parse_rate('1000/day'), (1000, 86400))
+        self.assertEqual(parse_rate('5/10s'), (5, 10))
+        self.assertEqual(parse_rate('100/15m'), (100, 900))
+        self.assertEqual(parse_rate(None), (None, None))
+
+
+class TokenBucketMixin:
+    """GCRA checks run against every store; subclasses set up `self.store`."""
+
+    def take(self, now, key='bucket'):
+        return token_bucket(self.store, key, LIMIT, PERIOD, now)
+
+    def test_allows_a_full_bucket_then_denies(self):
+        for _ in range(LIMIT):
+            self.assertEqual(self.take(NOW), (True, 0))
+        allowed, wait = self.take(NOW)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+
+    def test_refills_one_token_per_interval(self):
+        for _ in range(LIMIT):
+            self.take(NOW)
+        allowed, wait = self.take(NOW + 0.5)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 0.5)
+
+        self.assertEqual(self.take(NOW + 1), (True, 0))
+        self.assertFalse(self.take(NOW + 1)[0])
+
+    def test_refills_completely_after_a_period(self):
+        for _ in range(LIMIT):
+            self.take(NOW)
+        for _ in range(LIMIT):
+            self.assertEqual(self.take(NOW + PERIOD), (True, 0))
+        self.assertFalse(self.take(NOW + PERIOD)[0])
+
+    def test_keys_are_independent(self):
+        for _ in range(LIMIT):
+            self.take(NOW, key='one')
+        self.assertFalse(self.take(NOW, key='one')[0])
+        self.assertEqual(self.take(NOW, key='two'), (True, 0))
+
+    def test_acquire_returns_theoretical_arrival_time(self):
+        self.assertEqual(self.store.acquire('tat', NOW, 1.0, PERIOD), (True, NOW + 1))
+        self.assertEqual(self.store.acquire('tat', NOW, 1.0, PERIOD), (True, NOW + 2))
+        self.assertEqual(self.store.acquire('tat', NOW, 1.0, PERIOD), (True, NOW + 3))
+        # denied: the arrival time does not move
+        self.assertEqual(self.store.acquire('tat', NOW, 1.0, PERIOD), (False, NOW + 3))
+
+
+class LocMemStoreTestCase(TokenBucketMixin, SimpleTestCase):
+    def setUp(self):
+        self.store = LocMemStore()
+
+    def test_sliding_window(self):
+        # 2 requests per 10 seconds
+        self.assertEqual(sliding_window(self.store, 'window', 2, 10, 100.0), (True, 0))
+        self.assertEqual(sliding_window(self.store, 'window', 2, 10, 104.0), (True, 0))
+        allowed, wait = sliding_window(self.store, 'window', 2, 10, 105.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 5.0)  # until the next window
+
+        # next window, with 3 counted in the previous one: weighted 3 * 0.5 + 1 > 2
+        allowed, wait = sliding_window(self.store, 'window', 2, 10, 115.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, (1 - (2 - 1) / 3 - 0.5) * 10)
+        # a window later only the one request at 115 weighs in: 1 * 0.1 + 1 <= 2
+        self.assertTrue(sliding_window(self.store, 'window', 2, 10, 129.0)[0])
+
+
+class CacheStoreTestCase(TokenBucketMixin, SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.store = CacheStore()
+
+
+class DatabaseStoreTestCase(TokenBucketMixin, TestCase):
+    def setUp(self):
+        self.store = DatabaseStore()
+
+    def test_acquire_keeps_one_row_per_key(self):
+        for _ in range(LIMIT + 2):
+            self.take(NOW, key='row')
+        bucket = ThrottleBucket.objects.get(key='row')
+        self.assertAlmostEqual(bucket.value, NOW + LIMIT)
+        self.assertAlmostEqual(bucket.expires_at, NOW + LIMIT)
+
+    def test_incr_counts_until_the_window_expires(self):
+        self.assertEqual(self.store.incr('counter', ttl=60), 1)
+        self.assertEqual(self.store.incr('counter', ttl=60), 2)
+        self.assertEqual(self.store.get('counter'), 2)
+
+        ThrottleBucket.objects.filter(key='counter').update(expires_at=0)
+        self.assertEqual(self.store.get('counter'), 0)
+        # an expired counter starts over
+        self.assertEqual(self.store.incr('counter', ttl=60), 1)
+
+    def test_purge_removes_expired_buckets(self):
+        ThrottleBucket.objects.create(key='old', value=1, expires_at=0)
+        ThrottleBucket.objects.create(key='live', value=1, expires_at=time.time() + 3600)
+        self.assertEqual(self.store.purge(batch_size=1), 1)
+        self.assertEqual(list(ThrottleBucket.objects.values_list('key', flat=True)), ['live'])
+
+
+class TrigramIndexTestCase(TestCase):
+    INDEXES = {'account_user_email_test_trgm': ('account_user', 'email')}
+
+    def index_exists(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', ['account_user_email_test_trgm'])
+            return cursor.fetchone()[0] is not None
+
+    def test_skipped_with_a_warning_without_pg_trgm(self):
+        with mock.patch('utils.trigram.trigram_available', return_value=False), \
+                connection.schema_editor() as schema_editor, \
+                self.assertWarnsRegex(RuntimeWarning, r'customer emails.*`migrate account 0010`'):
+            create_trigram_indexes(schema_editor, self.INDEXES, 'customer emails', 'account 0010')
+        self.assertFalse(self.index_exists())
+
+    def test_created_and_dropped_with_pg_trgm(self):
+        if not trigram_available(connection):
+            self.skipTest('pg_trgm is not available on this server')
+        with connection.schema_editor() as schema_editor:
+            create_trigram_indexes(schema_editor, self.INDEXES, 'customer emails', 'account 0010')
+        self.assertTrue(self.index_exists())
+        with connection.schema_editor() as schema_editor:
+            drop_trigram_indexes(schema_editor, self.INDEXES)
+        self.assertFalse(self.index_exists())
+
+
+class ORJSONRendererTestCase(SimpleTestCase):
+    data = [{
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'), 'price': Decimal('12.50'), 'ratio': 0.1,
+        'at': datetime.datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc), 'day': datetime.date(2026, 1, 2),
+        'name': 'Ünïcode \u2028 "quoted" </script>', 'tags': ('a', 'b'), 'none': None, 'empty': {}, 'n': 10 ** 12,
+    }]
+
+    def assertIdentical(self, envelope, **context):
+        self.assertEqual(ORJSONRenderer().render(envelope, **context), JSONRenderer().render(envelope, **context))
+
+    def test_output_matches_drf(self):
+        self.assertIdentical(Response(data=self.data, meta={'total': 1}).data)
+        self.assertIdentical(Response(success=False, status=400, message='No', errors={'x': ['bad']}).data)
+
+    def test_pre_serialized_data_is_spliced_in(self):
+        envelope = Response(data=self.data, meta={'total': 1}).data
+        raw = Response(data=dump_raw(self.data), meta={'total': 1}).data
+        self.assertEqual(ORJSONRenderer().render(raw), JSONRenderer().render(envelope))
+        # pretty printing parses it back
+        self.assertEqual(
+            ORJSONRenderer().render(raw, 'application/json; indent=2'),
+            JSONRenderer().render(envelope, 'application/json; indent=2'),
+        )
+
+
+BODY = b'{"data": "' + b'honey ' * 400 + b'"}'
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024, COMPRESSION_ENCODINGS=['zstd', 'br', 'gzip'], COMPRESSION_CACHE_TIMEOUT=300)
+class CompressionMiddlewareTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def respond(self, content=BODY, method='get', accept='gzip', content_type='application/json', **headers):
+        def get_response(request):
+            response = HttpResponse(content, content_type=content_type)
+            for name, value in headers.items():
+                response[name.replace('_', '-')] = value
+            return response
+
+        request = getattr(RequestFactory(), method)('/api/products/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(get_response)(request)
+
+    def test_compresses_with_the_preferred_available_encoding(self):
+        response = self.respond(accept='gzip;q=0.5, br, zstd')
+        encoding = next(name for name in ('zstd', 'br', 'gzip') if name in ENCODERS)
+        self.assertEqual(response['Content-Encoding'], encoding)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self.respond(accept='gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_refused_and_missing_encodings(self):
+        for accept in ('', 'identity', 'gzip;q=0', '*;q=0', 'compress'):
+            with self.subTest(accept=accept):
+                response = self.respond(accept=accept)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(response.content, BODY)
+                # the representation still depends on the header
+                self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn(self.respond(accept='*')['Content-Encoding'], ENCODERS)
+
+    def test_skipped_responses(self):
+        cases = {
+            'below the size threshold': {'content': BODY[:1023]},
+            'content type not listed': {'content_type': 'image/png'},
+            'already encoded': {'Content_Encoding': 'br'},
+            'not a read': {'method': 'post'},
+        }
+        for case, kwargs in cases.items():
+            with self.subTest(case):
+                response = self.respond(**kwargs)
+                self.assertNotEqual(response.get('Content-Encoding'), 'gzip')
+                self.assertFalse(response.has_header('Vary'))
+        self.assertEqual(self.respond(content=BODY[:1024])['Content-Encoding'], 'gzip')
+
+    def test_incompressible_bodies_are_sent_as_they_are(self):
+        content = os.urandom(4096)
+        response = self.respond(content=content)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, content)
+
+    def test_strong_etags_are_weakened(self):
+        self.assertEqual(self.respond(ETag='"abc"')['ETag'], 'W/"abc"')
+        self.assertEqual(self.respond(ETag='W/"abc"')['ETag'], 'W/"abc"')
+        # not compressed: the validator still holds
+        self.assertEqual(self.respond(accept='', ETag='"abc"')['ETag'], '"abc"')
+
+    def test_compressed_bodies_are_reused(self):
+        calls = []
+
+        def counting_gzip(data):
+            calls.append(data)
+            return gzip.compress(data, mtime=0)
+
+        with mock.patch.dict(ENCODERS, {'gzip': counting_gzip}):
+            first, second = self.respond(), self.respond()
+            self.assertEqual(first.content, second.content)
+            self.assertEqual(len(calls), 1)
+            self.respond(content=BODY + b' ')
+            self.assertEqual(len(calls), 2)
+            with override_settings(COMPRESSION_CACHE_TIMEOUT=0):
+                self.respond()
+                self.assertEqual(len(calls), 3)
+
+    def test_async_responses(self):
+        async def get_response(request):
+            return HttpResponse(BODY, content_type='application/json')
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = async_to_sync(CompressionMiddleware(get_response))(request)
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+
+@override_settings(SLOW_REQUEST_MS=60_000, DUPLICATE_QUERY_THRESHOLD=3)
+class InstrumentationTestCase(TestCase):
+    path = '/api/products/categories/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+        cls.customer = User.objects.create_user(email='customer@example.com', role='customer', first_name='Cam')
+
+    def get(self, user=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(self.path)
+
+    def test_server_timing_is_for_staff_only(self):
+        response = self.get(self.admin)
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[0-9.]+, db;dur=[0-9.]+;desc="\d+ queries", serialize;dur=')
+        self.assertFalse(self.get(self.customer).has_header('Server-Timing'))
+        self.assertFalse(self.get().has_header('Server-Timing'))
+        with override_settings(DEBUG=True):
+            self.assertTrue(self.get().has_header('Server-Timing'))
+
+    def test_slow_requests_are_logged(self):
+        with override_settings(SLOW_REQUEST_MS=0), self.assertLogs('utils.instrumentation', 'WARNING') as logs:
+            self.get(self.customer)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['event'], 'slow_request')
+        self.assertEqual((line['method'], line['path'], line['status'], line['user']), ('GET', self.path, 200, self.customer.pk))
+        self.assertGreater(line['queries'], 0)
+
+    def test_fast_requests_are_not_logged(self):
+        with self.assertNoLogs('utils.instrumentation', 'WARNING'):
+            self.get()
+
+    def test_repeated_queries_are_logged(self):
+        def n_plus_one(request, times):
+            for _ in range(times):
+                Category.objects.filter(slug='honey').exists()
+            return HttpResponse()
+
+        with self.assertNoLogs('utils.instrumentation', 'WARNING'):
+            InstrumentationMiddleware(lambda request: n_plus_one(request, 2))(RequestFactory().get('/'))
+        with self.assertLogs('utils.instrumentation', 'WARNING') as logs:
+            InstrumentationMiddleware(lambda request: n_plus_one(request, 3))(RequestFactory().get('/'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['event'], 'duplicate_queries')
+        self.assertEqual(line['queries'], 3)
+        self.assertEqual(line['duplicate_queries'][0]['count'], 3)
+        self.assertIn('product_category', line['duplicate_queries'][0]['sql'])
+
+    def test_nested_timed_blocks_are_counted_once(self):
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        self.addCleanup(_metrics.reset, token)
+        self.assertIs(get_metrics(), metrics)
+        # outer block 0 -> 5, the inner one starts at 1 and is not timed on its own
+        with mock.patch('utils.instrumentation.time.perf_counter', side_effect=[0.0, 1.0, 5.0]):
+            with timed('serialize'):
+                with timed('serialize'):
+                    pass
+        self.assertEqual(metrics.timings['serialize'], 5.0)
+        with mock.patch('utils.instrumentation.time.perf_counter', side_effect=[10.0, 11.0]):
+            with timed('serialize'):
+                pass
+        self.assertEqual(metrics.timings['serialize'], 6.0)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='', METRICS_ALLOWED_IPS=['127.0.0.1'], METRICS_DIR='')
+class MetricsEndpointTestCase(TestCase):
+    def scrape(self, **extra):
+        return self.client.get('/metrics', **extra)
+
+    def test_exposition(self):
+        APIClient().get('/api/products/categories/')
+        response = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE)
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', lines)
+        self.assertIn('# TYPE http_requests_total counter', lines)
+        self.assertIn('# TYPE http_requests_in_flight gauge', lines)
+        self.assertTrue(any(line.startswith('http_requests_total{view="category-list-create",method="GET",status="200"} ')
+                            for line in lines))
+
+        labels = 'view="category-list-create",method="GET"'
+        buckets = [line for line in lines if line.startswith(f'http_request_duration_seconds_bucket{{{labels},')]
+        self.assertEqual([line.split('le="')[1].split('"')[0] for line in buckets][-3:], ['5', '10', '+Inf'])
+        counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+        self.assertEqual(counts, sorted(counts))
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} {counts[-1]}', lines)
+        self.assertTrue(any(line.startswith(f'http_request_duration_seconds_sum{{{labels}}} ') for line in lines))
+
+    def test_allowed_addresses(self):
+        self.assertEqual(self.scrape(REMOTE_ADDR='10.0.0.1').status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.1']):
+            self.assertEqual(self.scrape(REMOTE_ADDR='10.0.0.1').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token(self):
+        # a token replaces the address check
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer s3cret', REMOTE_ADDR='10.0.0.1').status_code, 200)
+
+    def test_disabled(self):
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(self.scrape().status_code, 404)
+        self.assertEqual(self.client.post('/metrics').status_code, 405)
+
+
+class MultiprocessMetricsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.registry = Registry()
+        self.requests = Counter('requests_total', 'Requests.', ('method',), registry=self.registry)
+        self.in_flight = Gauge('in_flight', 'In flight.', registry=self.registry)
+        self.latency = Histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0), registry=self.registry)
+
+    def worker(self, pid, requests, in_flight, latency):
+        """Write the snapshot of another worker, as its Registry.write() would."""
+        with open(os.path.join(self.directory, f'{pid}.json'), 'w') as f:
+            json.dump({
+                'requests_total': [[['GET'], requests]],
+                'in_flight': [[[], in_flight]],
+                'latency_seconds': [[[], latency]],
+            }, f)
+
+    def test_snapshots_of_all_workers_are_merged(self):
+        dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+        dead.wait()
+        live = os.getppid()
+        self.requests.inc(method='GET')
+        self.in_flight.inc()
+        self.latency.observe(0.05)
+        self.worker(live, requests=2, in_flight=3, latency=[1, 1, 0, 0.6])
+        self.worker(dead.pid, requests=4, in_flight=5, latency=[0, 0, 1, 2.0])
+
+        with override_settings(METRICS_DIR=self.directory):
+            merged = self.registry.collect()
+            exposition = self.registry.exposition()
+
+        # counters and histograms keep what dead workers counted, gauges only count live ones
+        self.assertEqual(merged['requests_total'], {('GET',): 7})
+        self.assertEqual(merged['in_flight'], {(): 4})
+        self.assertEqual(merged['latency_seconds'], {(): [2, 1, 1, 2.65]})
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2\nlatency_seconds_bucket{le="1"} 3\n'
+                      'latency_seconds_bucket{le="+Inf"} 4\nlatency_seconds_sum 2.65\nlatency_seconds_count 4\n', exposition)
+
+    def test_own_snapshot_and_unreadable_files_are_skipped(self):
+        self.requests.inc(method='GET')
+        with override_settings(METRICS_DIR=self.directory, METRICS_FLUSH_SECONDS=0):
+            self.registry.write()
+            with open(os.path.join(self.directory, '999999999.json'), 'w') as f:
+                f.write('{not json')
+            self.assertEqual(self.registry.collect()['requests_total'], {('GET',): 1})
+
+
+@override_settings(PROFILE_RATE_LIMIT=10, PROFILE_KEEP=100)
+class ProfilingTestCase(TestCase):
+    path = '/api/products/categories/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(email='root@example.com', first_name='Root', password='pw')
+        cls.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Ada')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def get(self, user=None, **extra):
+        if user is not None:
+            extra['HTTP_AUTHORIZATION'] = f"Bearer {get_tokens_for_user(user)['access']}"
+        response = self.client.get(self.path, {'_profile': '1'}, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_only_superusers_are_profiled(self):
+        for user in (None, self.admin):
+            self.assertFalse(self.get(user).has_header('X-Profile'))
+        # a bad token is left for the view to reject
+        response = self.client.get(self.path, {'_profile': '1'}, HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(response.has_header('X-Profile'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_superuser_requests_are_stored(self):
+        response = self.get(self.superuser)
+        profile = RequestProfile.objects.get(pk=response['X-Profile'])
+        self.assertEqual((profile.user, profile.method, profile.status), (self.superuser, 'GET', 200))
+        self.assertEqual(profile.path, f'{self.path}?_profile=1')
+        self.assertTrue(profile.functions)
+        self.assertTrue(any('product_category' in query['sql'] for query in profile.queries))
+
+        # the header works too, and nothing is profiled without asking
+        response = self.client.get(self.path, HTTP_X_PROFILE='1',
+                                   HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.superuser)['access']}")
+        self.assertTrue(response.has_header('X-Profile'))
+        response = self.client.get(self.path, HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.superuser)['access']}")
+        self.assertFalse(response.has_header('X-Profile'))
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+    @override_settings(PROFILE_RATE_LIMIT=1)
+    def test_rate_limit(self):
+        self.assertTrue(self.get(self.superuser)['X-Profile'].isdigit())
+        self.assertEqual(self.get(self.superuser)['X-Profile'], 'skipped; reason=rate-limit')
+        self.assertEqual(RequestProfile.objects.count(), 1)
+
+    def test_one_profile_at_a_time(self):
+        self.assertTrue(_profiling.acquire(blocking=False))
+        try:
+            self.assertEqual(self.get(self.superuser)['X-Profile'], 'skipped; reason=busy')
+        finally:
+            _profiling.release()
+        self.assertTrue(self.get(self.superuser)['X-Profile'].isdigit())
+        # released after the profiled request
+        self.assertTrue(_profiling.acquire(blocking=False))
+        _profiling.release()
+
+    @override_settings(PROFILE_KEEP=2)
+    def test_only_the_latest_profiles_are_kept(self):
+        ids = [int(self.get(self.superuser)['X-Profile']) for _ in range(3)]
+        self.assertEqual(sorted(RequestProfile.objects.values_list('pk', flat=True)), ids[1:])
+
+
+# A replica alias mirroring the test database, as DB_REPLICAS would configure
+# it. Registered on import so the test runner sets the mirror up.
+REPLICA = 'replica_test'
+connections.settings[REPLICA] = connections.configure_settings({
+    'default': copy.deepcopy(settings.DATABASES['default']),
+    REPLICA: {**copy.deepcopy(settings.DATABASES['default']), 'TEST': {'MIRROR': 'default'}},
+})[REPLICA]
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTestCase(TransactionTestCase):
+    """
+    Mirrors use their own connection, so only committed data is visible on
+    them: hence TransactionTestCase.
+    """
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.category = Category.objects.create(name='Honey', slug='honey')
+        self.admin = User.objects.create_user(email='admin@example.com', role='admin', first_name='Admin')
+        self.client = APIClient()
+
+    def queries(self, method, path, user=None, **kwargs):
+        """Send a request, returning the response and the SQL run on (default, replica)."""
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = getattr(self.client, method)(path, **kwargs)
+        return response, [q['sql'] for q in primary], [q['sql'] for q in replica]
+
+    def detail(self):
+        return f'/api/products/categories/{self.category.cat_id}/'
+
+    def test_reads_in_a_replica_view_go_to_the_replica(self):
+        response, primary, replica = self.queries('get', self.detail())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['name'], 'Honey')
+        self.assertTrue(any('product_category' in sql for sql in replica))
+        self.assertEqual(primary, [])
+
+    def test_writes_go_to_default(self):
+        response, primary, replica = self.queries('patch', self.detail(), self.admin, data={'name': 'Raw Honey'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any(sql.startswith('UPDATE') for sql in primary))
+        self.assertEqual(replica, [])
+
+    def test_reads_after_a_write_are_pinned_to_the_primary(self):
+        self.queries('patch', self.detail(), self.admin, data={'name': 'Raw Honey'}, format='json')
+
+        response, primary, replica = self.queries('get', self.detail(), self.admin)
+        self.assertEqual(response.json()['data']['name'], 'Raw Honey')
+        self.assertTrue(any('product_category' in sql for sql in primary))
+        self.assertEqual(replica, [])
+
+        # other users still read from the replica
+        _, primary, replica = self.queries('get', self.detail())
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_failed_writes_do_not_pin(self):
+        response, _, _ = self.queries('patch', self.detail(), self.admin, data={'name': ''}, format='json')
+        self.assertEqual(response.status_code, 400)
+        _, primary, replica = self.queries('get', self.detail(), self.admin)
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_sales_analytics_read_from_the_replica(self):
+        response, primary, replica = self.queries('get', '/api/orders/analytics/sales/', self.admin)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('dailysales' in sql for sql in replica))
+        self.assertFalse(any('dailysales' in sql for sql in primary))
+
+    def test_read_from_replica(self):
+        self.assertEqual(Category.objects.all().db, 'default')
+        with read_from_replica():
+            self.assertEqual(Category.objects.all().db, REPLICA)
+            self.assertEqual(Category.objects.get(pk=self.category.pk), self.category)
+            # writes inside the block still go to the primary
+            with CaptureQueriesContext(connections['default']) as primary:
+                Category.objects.filter(pk=self.category.pk).update(name='Raw Honey')
+            self.assertEqual(len(primary), 1)
+        self.assertEqual(Category.objects.all().db, 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_reads_from_default(self):
+        _, primary, replica = self.queries('get', self.detail())
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
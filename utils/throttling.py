@@ -0,0 +1,326 @@
+# utils/throttling.py
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .models import ThrottleBucket
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse a rate string into (limit, period_seconds).
+
+    Accepts DRF style rates ('10/min', '1000/day') and an optional period
+    multiplier ('5/10s', '100/15m').
+    """
+    if rate is None:
+        return None, None
+    num, period = rate.split('/')
+    multiplier = ''.join(ch for ch in period if ch.isdigit()) or '1'
+    unit = period.lstrip('0123456789')[0]
+    return int(num), int(multiplier) * PERIODS[unit]
+
+
+# ---------------- Stores ----------------
+
+class BaseStore:
+    """
+    Storage backend for throttle state. Every store implements two atomic
+    primitives: a windowed counter (`incr`/`get`) for the sliding window
+    algorithm and a GCRA step (`acquire`) for the token bucket algorithm.
+    """
+
+    def incr(self, key, ttl):
+        raise NotImplementedError
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def acquire(self, key, now, interval, period):
+        """
+        Try to take one token. `interval` is the time one token takes to refill
+        and `period` the full bucket (limit * interval). Returns
+        (allowed, theoretical_arrival_time).
+        """
+        raise NotImplementedError
+
+
+class LocMemStore(BaseStore):
+    """Per-process store. Fast, but each gunicorn worker throttles on its own."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}  # key -> (value, expires_at)
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry[0]
+
+    def incr(self, key, ttl):
+        now = time.time()
+        with self._lock:
+            value = (self._live(key, now) or 0) + 1
+            expires_at = self._data[key][1] if value > 1 else now + ttl
+            self._data[key] = (value, expires_at)
+            if len(self._data) > 10000:
+                self._cull(now)
+            return value
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, time.time()) or 0
+
+    def acquire(self, key, now, interval, period):
+        with self._lock:
+            tat = max(self._live(key, now) or now, now)
+            new_tat = tat + interval
+            if new_tat - now > period:
+                return False, tat
+            self._data[key] = (new_tat, new_tat)
+            return True, new_tat
+
+    def _cull(self, now):
+        self._data = {k: v for k, v in self._data.items() if v[1] > now}
+
+
+class CacheStore(BaseStore):
+    """
+    Store backed by any configured Django cache. Counters use add()/incr(),
+    which are atomic on Redis and Memcached. The token bucket step is a
+    get-then-set and can let a few extra requests through under contention.
+    """
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    def incr(self, key, ttl):
+        self.cache.add(key, 0, ttl)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # evicted between add() and incr()
+            self.cache.set(key, 1, ttl)
+            return 1
+
+    def get(self, key):
+        return self.cache.get(key, 0)
+
+    def acquire(self, key, now, interval, period):
+        tat = max(self.cache.get(key) or now, now)
+        new_tat = tat + interval
+        if new_tat - now > period:
+            return False, tat
+        self.cache.set(key, new_tat, int(new_tat - now) + 1)
+        return True, new_tat
+
+
+class DatabaseStore(BaseStore):
+    """
+    Store backed by the ThrottleBucket table. Shared by all workers; each
+    check is a single INSERT ... ON CONFLICT DO UPDATE statement (PostgreSQL).
+    """
+
+    def __init__(self):
+        self.table = connections['default'].ops.quote_name(ThrottleBucket._meta.db_table)
+
+    def _cursor(self):
+        return connections[router.db_for_write(ThrottleBucket)].cursor()
+
+    def incr(self, key, ttl):
+        now = time.time()
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {self.table} AS b (key, value, expires_at) VALUES (%s, 1, %s)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = CASE WHEN b.expires_at <= %s THEN 1 ELSE b.value + 1 END,
+                    expires_at = CASE WHEN b.expires_at <= %s THEN EXCLUDED.expires_at ELSE b.expires_at END
+                RETURNING value
+                """,
+                [key, now + ttl, now, now],
+            )
+            return int(cursor.fetchone()[0])
+
+    def get(self, key):
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"SELECT value FROM {self.table} WHERE key = %s AND expires_at > %s",
+                [key, time.time()],
+            )
+            row = cursor.fetchone()
+            return int(row[0]) if row else 0
+
+    def acquire(self, key, now, interval, period):
+        with self._cursor() as cursor:
+            # the conditional DO UPDATE returns no row when the bucket is empty
+            cursor.execute(
+                f"""
+                INSERT INTO {self.table} AS b (key, value, expires_at) VALUES (%s, %s, %s)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = GREATEST(b.value, %s) + %s,
+                    expires_at = GREATEST(b.value, %s) + %s
+                WHERE GREATEST(b.value, %s) + %s - %s <= %s
+                RETURNING value
+                """,
+                [key, now + interval, now + interval,
+                 now, interval, now, interval, now, interval, now, period],
+            )
+            row = cursor.fetchone()
+            if row is not None:
+                return True, row[0]
+            cursor.execute(f"SELECT value FROM {self.table} WHERE key = %s", [key])
+            row = cursor.fetchone()
+            return False, row[0] if row else now
+
+    def purge(self, batch_size=1000):
+        """Delete expired buckets in batches. Returns the number deleted."""
+        deleted = 0
+        while True:
+            keys = list(
+                ThrottleBucket.objects.filter(expires_at__lte=time.time())
+                .values_list('key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            count, _ = ThrottleBucket.objects.filter(key__in=keys).delete()
+            deleted += count
+
+
+STORES = {
+    'locmem': LocMemStore,
+    'cache': CacheStore,
+    'database': DatabaseStore,
+}
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        name = getattr(settings, 'THROTTLE_STORE', 'locmem')
+        _store = (STORES.get(name) or import_string(name))()
+    return _store
+
+
+# ---------------- Algorithms ----------------
+
+def token_bucket(store, key, limit, period, now):
+    """GCRA formulation of a token bucket holding `limit` tokens per `period`."""
+    interval = period / limit
+    allowed, tat = store.acquire(key, now, interval, period)
+    if allowed:
+        return True, 0
+    return False, tat + interval - period - now
+
+
+def sliding_window(store, key, limit, period, now):
+    """Sliding window approximated from the current and previous fixed windows."""
+    window = int(now // period)
+    current = store.incr(f'{key}:{window}', ttl=period * 2)
+    previous = store.get(f'{key}:{window - 1}')
+    elapsed = (now % period) / period
+    if previous * (1 - elapsed) + current <= limit:
+        return True, 0
+    if current >= limit or not previous:
+        return False, period * (1 - elapsed)
+    # wait until the previous window's weight has decayed enough
+    needed = 1 - (limit - current) / previous
+    return False, max(needed - elapsed, 0) * period
+
+
+ALGORITHMS = {
+    'token_bucket': token_bucket,
+    'sliding_window': sliding_window,
+}
+
+
+# ---------------- DRF throttle classes ----------------
+
+class RateThrottle(BaseThrottle):
+    """
+    Base throttle. Subclasses define `get_scope()` and `get_ident_key()`;
+    rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope].
+    """
+    scope = None
+    algorithm = None
+    store = None
+
+    def __init__(self):
+        self._wait = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+    def get_rate(self, scope):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def allow_request(self, request, view):
+        if not getattr(settings, 'THROTTLE_ENABLED', True):
+            return True
+        scope = self.get_scope(request, view)
+        if scope is None:
+            return True
+        limit, period = parse_rate(self.get_rate(scope))
+        if limit is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+
+        algorithm = self.algorithm or getattr(settings, 'THROTTLE_ALGORITHM', 'token_bucket')
+        allowed, wait = ALGORITHMS[algorithm](
+            self.store or get_store(), f'throttle:{scope}:{ident}', limit, period, time.time()
+        )
+        self._wait = None if allowed else wait
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class IPRateThrottle(RateThrottle):
+    """Limits every request by client IP."""
+    scope = 'ip'
+
+
+class UserRateThrottle(RateThrottle):
+    """Limits authenticated requests by user."""
+    scope = 'user'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class ScopedRateThrottle(RateThrottle):
+    """
+    Limits endpoint groups. Views opt in with `throttle_scope`, either a scope
+    name or a {method: scope} dict so only some methods are limited. Requests
+    are keyed by user when authenticated and by IP otherwise.
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if isinstance(scope, dict):
+            return scope.get(request.method)
+        return scope
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return f'ip-{self.get_ident(request)}'
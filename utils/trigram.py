@@ -0,0 +1,50 @@
+# utils/trigram.py
+"""
+Trigram indexes for case-insensitive substring searches.
+
+icontains compiles to UPPER(column::text) LIKE UPPER('%term%') on
+PostgreSQL, which only a GIN index with pg_trgm's gin_trgm_ops on that
+expression can serve. pg_trgm ships in the PostgreSQL contrib package, which
+some servers lack, so the migrations creating these indexes skip them there
+with a warning: searches still work, scanning the table.
+"""
+import warnings
+
+
+def trigram_available(connection):
+    """Whether pg_trgm can be installed on `connection`'s PostgreSQL server."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')")
+        return cursor.fetchone()[0]
+
+
+def create_trigram_indexes(schema_editor, indexes, searched, previous_migration):
+    """
+    Create the trigram indexes `indexes`, {name: (table, column)}, installing
+    pg_trgm first. Where it is not available, warn instead, naming what is
+    `searched` unindexed and the migration (e.g. 'order 0013') to migrate
+    back to once it is installed.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    if not trigram_available(connection):
+        warnings.warn(
+            f"pg_trgm is not available on this PostgreSQL server: skipped the trigram indexes on {searched}, so "
+            f"order search scans the table. Install the PostgreSQL contrib package, then run "
+            f"`migrate {previous_migration}` and `migrate` to add them.",
+            RuntimeWarning,
+        )
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, (table, column) in indexes.items():
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)')
+
+
+def drop_trigram_indexes(schema_editor, indexes):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name in indexes:
+            cursor.execute(f'DROP INDEX IF EXISTS {name}')
@@ -0,0 +1,26 @@
+# utils/views.py
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.views.decorators.http import require_GET
+
+from .metrics import CONTENT_TYPE, REGISTRY
+
+
+def metrics_allowed(request):
+    """A bearer METRICS_TOKEN when one is set, otherwise a METRICS_ALLOWED_IPS address."""
+    if settings.METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        return hmac.compare_digest(header.encode(), f'Bearer {settings.METRICS_TOKEN}'.encode())
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+@require_GET
+def metrics_view(request):
+    """Prometheus scrape target; served as plain text, outside the API envelope."""
+    if not settings.METRICS_ENABLED:
+        return HttpResponseNotFound()
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.exposition(), content_type=CONTENT_TYPE)